@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Cycle-count model of the Ascon variants.
+
+The formulas of docs/cycles_ascon128v12.py and docs/cycles_ascon128av12.py,
+evaluated with NumPy over arrays of AD and message lengths (in bytes), so
+millions of message shapes are predicted at once. The settings of each
+variant (CCW, UROL, algorithms) are read from
+docs/variants.txt.
+
+Example:
+    import numpy as np
+    from cycle_model import load_variants
+
+    v1 = load_variants()['v1']
+    ad_len, msg_len = np.meshgrid(np.arange(64), np.arange(1536))
+    cycles = v1.enc(ad_len, msg_len)
+
+    cryptotvgen ... --cycle_model cycle_model.py v1   # expected_timing.csv
+
+    ./cycle_model.py v1 v3 --ad 0 16 --msg 0 64 1536
+    ./cycle_model.py --check    # large-N throughputs vs docs/variants.txt
+'''
+
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VARIANTS_TXT = os.path.join(HERE, 'docs', 'variants.txt')
+
+# Rounds of the initialization/finalization (PA) and of the data processing
+# (PB) permutations, and rate (R) in bits
+ALGORITHMS = {
+    'ascon128v12': {'pa': 12, 'pb': 6, 'rate': 64},
+    'ascon128av12': {'pa': 12, 'pb': 8, 'rate': 128},
+    'asconhashv12': {'pa': 12, 'pb': 12, 'rate': 64},
+    'asconhashav12': {'pa': 12, 'pb': 8, 'rate': 64},
+}
+CCWS = (8, 16, 32)
+KEY_BITS = 128
+NPUB_BITS = 128
+TAG_BITS = 128
+HASH_BITS = 256
+
+
+class CycleModel(object):
+    '''
+    Cycles of the CryptoCore of an Ascon variant with CCW-bit data paths
+    and urol permutation rounds per cycle. The methods take AD and message
+    lengths in bytes (ints or arrays, broadcast together) and return
+    int64 arrays.
+    '''
+    def __init__(self, ccw=32, urol=1, aead='ascon128v12', hash='asconhashv12',
+                 name=None):
+        if ccw not in CCWS:
+            raise ValueError('CCW must be one of {}'.format(CCWS))
+        for algorithm in (aead, hash):
+            if algorithm not in ALGORITHMS:
+                raise ValueError('Unknown algorithm {}'.format(algorithm))
+            if ALGORITHMS[algorithm]['pa'] % urol or ALGORITHMS[algorithm]['pb'] % urol:
+                raise ValueError('UROL={} does not evenly divide the rounds of {}'
+                                 .format(urol, algorithm))
+        self.name = name
+        self.ccw = ccw
+        self.urol = urol
+        self.aead = aead
+        self.hash_algorithm = hash
+
+    def __repr__(self):
+        return 'CycleModel(ccw={}, urol={}, aead={!r}, hash={!r}, name={!r})'.format(
+            self.ccw, self.urol, self.aead, self.hash_algorithm, self.name)
+
+    @property
+    def ad_block_bytes(self):
+        return ALGORITHMS[self.aead]['rate']//8
+
+    @property
+    def hash_block_bytes(self):
+        return ALGORITHMS[self.hash_algorithm]['rate']//8
+
+    def _params(self, algorithm):
+        alg = ALGORITHMS[algorithm]
+        return self.ccw, self.urol, alg['pa'], alg['pb'], alg['rate']
+
+    def enc(self, ad_len, msg_len):
+        ''' Cycles of authenticated encryptions '''
+        return enc_cycles(*lengths(ad_len, msg_len), *self._params(self.aead))
+
+    def dec(self, ad_len, msg_len):
+        ''' Cycles of authenticated decryptions (msg_len: ciphertext bytes) '''
+        return self.enc(ad_len, msg_len) + 1        # wait ack
+
+    def hash(self, msg_len):
+        ''' Cycles of hashes '''
+        return hash_cycles(*lengths(msg_len), *self._params(self.hash_algorithm))
+
+    def cycles(self, ad_len, msg_len, decrypt=False, hashop=False):
+        '''
+        Cycles of mixed operations: hash of msg_len where hashop,
+        decryption where decrypt, encryption otherwise
+        '''
+        ad_len, msg_len, decrypt, hashop = np.broadcast_arrays(
+            ad_len, msg_len, np.asarray(decrypt, dtype=bool), np.asarray(hashop, dtype=bool))
+        aead = self.enc(ad_len, msg_len) + decrypt
+        return np.where(hashop, self.hash(msg_len), aead)
+
+    def cycles_per_byte(self):
+        '''
+        Throughput for large Na, Nm (same as Nc) and Nh, in cycles/byte:
+        {'ad': ..., 'msg': ..., 'hash': ...}
+        '''
+        aead = ALGORITHMS[self.aead]
+        hash_ = ALGORITHMS[self.hash_algorithm]
+        block = (aead['pb']//self.urol + aead['rate']//self.ccw)/(aead['rate']//8)
+        return {
+            'ad': block,
+            'msg': block,
+            'hash': (hash_['pb']//self.urol + hash_['rate']//self.ccw)/(hash_['rate']//8),
+        }
+
+
+# The parameters of the formulas broadcast like the lengths, so several
+# configurations can be evaluated at once (see dse.py)
+def absorb_cycles(length, ccw, urol, pb, rate):
+    ''' Absorb and process the complete blocks and the incomplete last block '''
+    n, bl = np.divmod(length, rate//8)
+    incomplete = bl > 0
+    cycles = (pb//urol + rate//ccw)*n
+    cycles = cycles + incomplete*((bl*8 + ccw - 8)//ccw + pb//urol)
+    return cycles, n, incomplete
+
+def enc_cycles(ad_len, msg_len, ccw, urol, pa, pb, rate):
+    ''' Cycles of authenticated encryptions '''
+    cycles = KEY_BITS//ccw + NPUB_BITS//ccw     # store key, store nonce
+    cycles = cycles + 1                         # init state setup
+    cycles = cycles + pa//urol                  # init process
+    cycles = cycles + 1                         # init key add
+    ad, na, ina = absorb_cycles(ad_len, ccw, urol, pb, rate)
+    msg, nm, inm = absorb_cycles(msg_len, ccw, urol, pb, rate)
+    cycles = cycles + ad
+    cycles = cycles + (((na > 0) | (nm > 0) | inm) & ~ina)   # empty AD block with padding
+    cycles = cycles + 1                         # domain separation
+    cycles = cycles + msg
+    cycles = cycles + ~inm                      # empty message block with padding
+    cycles = cycles + 1 + pa//urol + 1          # finalization
+    cycles = cycles + TAG_BITS//ccw             # extract tag / verify tag
+    return np.asarray(cycles, dtype=np.int64)
+
+def hash_cycles(msg_len, ccw, urol, pa, pb, rate):
+    ''' Cycles of hashes '''
+    nh, blh = np.divmod(msg_len, rate//8)
+    inh = blh > 0
+    cycles = pa//urol                           # initialization
+    cycles = cycles + nh*pb//urol + nh*(rate//ccw)
+    cycles = cycles + inh*((blh*8 + ccw - 8)//ccw + pb//urol)
+    cycles = cycles + ~inh*pa//urol             # empty block with padding
+    cycles = cycles + inh*(pa - pb)//urol       # last process before squeeze
+    cycles = cycles + HASH_BITS//ccw + (HASH_BITS//rate - 1)*(pb//urol)    # squeeze
+    return np.asarray(cycles, dtype=np.int64)
+
+def lengths(*arrays):
+    ''' Broadcast int64 arrays of lengths '''
+    arrays = np.broadcast_arrays(*(np.asarray(a, dtype=np.int64) for a in arrays))
+    if any((a < 0).any() for a in arrays):
+        raise ValueError('Negative length')
+    return arrays
+
+def read_variants(path=VARIANTS_TXT):
+    '''
+    Settings of the variants of path: {name: {'ccw', 'urol', 'aead', 'hash',
+    'cycles_per_byte': {'ad', 'msg', 'hash'}}}
+    '''
+    with open(path) as f:
+        text = f.read()
+    variants = {}
+    for section in re.split(r'^-{10,}\s*$', text, flags=re.M):
+        header = re.search(r'^(\w+) with CCW=CCSW=(\d+):', section, re.M)
+        if not header:
+            continue
+
+        def field(regex, convert=str):
+            match = re.search(regex, section)
+            return convert(match.group(1)) if match else None
+
+        variants[header.group(1)] = {
+            'ccw': int(header.group(2)),
+            'urol': field(r"UROL=(\d+)", int) or 1,
+            'aead': field(r'aead:\s*(\w+)'),
+            'hash': field(r'hash:\s*(\w+)'),
+            'cycles_per_byte': {
+                'ad': field(r'large Na = ([\d.]+)', float),
+                'msg': field(r'large Nm = ([\d.]+)', float),
+                'hash': field(r'large Nh = ([\d.]+)', float),
+            },
+        }
+    return variants
+
+def load_variants(path=VARIANTS_TXT):
+    ''' {name: CycleModel} of the variants of path '''
+    return {name: CycleModel(v['ccw'], v['urol'], v['aead'], v['hash'], name)
+            for name, v in read_variants(path).items()}
+
+def load_model(variant, path=VARIANTS_TXT):
+    ''' CycleModel of a variant of path (the cryptotvgen --cycle_model interface) '''
+    models = load_variants(path)
+    if variant not in models:
+        raise ValueError('Unknown variant {} (variants: {})'.format(
+            variant, ', '.join(models)))
+    return models[variant]
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('variants', nargs='*', help='Variants (default: all).')
+    parser.add_argument('--ad', type=int, nargs='+', default=[0],
+                        help='AD lengths in bytes.')
+    parser.add_argument('--msg', type=int, nargs='+', default=[0],
+                        help='Message lengths in bytes.')
+    parser.add_argument('--check', action='store_true',
+                        help='Compare the large-N throughputs with docs/variants.txt.')
+    parser.add_argument('--variants_file', default=VARIANTS_TXT,
+                        help='Settings of the variants.')
+    return parser
+
+def main(args=sys.argv[1:]):
+    args = get_parser().parse_args(args)
+    settings = read_variants(args.variants_file)
+    models = load_variants(args.variants_file)
+    status = 0
+    for name in args.variants or list(models):
+        model = models[name]
+        if args.check:
+            model_cpb = model.cycles_per_byte()
+            for kind, documented in sorted(settings[name]['cycles_per_byte'].items()):
+                # variants.txt truncates to two decimals
+                ok = documented is not None and abs(model_cpb[kind] - documented) < 0.01
+                status |= not ok
+                print('{:9} {:5} model {:.3f}  documented {}  {}'.format(
+                    name, kind, model_cpb[kind], documented, 'ok' if ok else 'MISMATCH'))
+            continue
+        print('{} ({})'.format(name, model))
+        ad_len, msg_len = np.meshgrid(args.ad, args.msg, indexing='ij')
+        enc, dec = model.enc(ad_len, msg_len), model.dec(ad_len, msg_len)
+        for i, ad in enumerate(args.ad):
+            for j, msg in enumerate(args.msg):
+                print('    ad {:6} msg {:6}: enc {:6} dec {:6}'.format(
+                    ad, msg, enc[i, j], dec[i, j]))
+        for msg, cycles in zip(args.msg, model.hash(args.msg)):
+            print('    hash {:6}: {:6}'.format(msg, cycles))
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
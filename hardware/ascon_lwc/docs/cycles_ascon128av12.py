@@ -19,68 +19,24 @@ Bla = 0
 Blm = 0
 Blc = 0
 
-# do not touch
-Ina = 1 if Bla > 0 else 0
-Inm = 1 if Blm > 0 else 0
-Inc = 1 if Blc > 0 else 0
+# The formulas are in ../cycle_model.py, which evaluates them over arrays of
+# lengths for all the variants of variants.txt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from cycle_model import CycleModel
+
+model = CycleModel(CCW, UROL, 'ascon128av12', 'asconhashav12')
 
 # ascon128av12
-PA = 12
-PB = 8
 R = 128
-
-# encryption:
-cycles_enc = 128//CCW                                       # store key
-cycles_enc += 128//CCW                                      # store nonce
-cycles_enc += 1                                             # init state setup
-cycles_enc += PA//UROL                                      # init process
-cycles_enc += 1                                             # init key add
-cycles_enc += (PB//UROL+R//CCW)*Na                          # absorb + process complete AD blocks
-cycles_enc += Ina*(int(((Bla*8+CCW-8)/CCW)) + PB//UROL)     # absorb + process incomplete AD blocks
-cycles_enc += ((Na>0)|(Nm>0)|(Inm>0))*(Ina==0)              # absorb empty AD block with padding if required
-cycles_enc += 1                                             # domain seperation
-cycles_enc += (PB//UROL+R//CCW)*Nm                          # absorb + process complete MSG blocks
-cycles_enc += Inm*(int(((Blm*8+CCW-8)/CCW)) + PB//UROL)     # absorb + process incomplete MSG blocks
-cycles_enc += (Inm==0)                                      # absorb empty MSG block with pad
-cycles_enc += 1                                             # final key add 1
-cycles_enc += PA//UROL                                      # final process
-cycles_enc += 1                                             # final key add 2
-cycles_enc += 128//CCW                                      # extract tag / verify tag
-
+cycles_enc = int(model.enc(Na*R//8 + Bla, Nm*R//8 + Blm))
 print('encryption cycles: ' + str(cycles_enc))
 
-# decryption:
-cycles_dec = 128//CCW                                       # store key
-cycles_dec += 128//CCW                                      # store nonce
-cycles_dec += 1                                             # init state setup
-cycles_dec += PA//UROL                                      # init process
-cycles_dec += 1                                             # init key add
-cycles_dec += (PB//UROL+R//CCW)*Na                          # absorb + process complete AD blocks
-cycles_dec += Ina*(int(((Bla*8+CCW-8)/CCW)) + PB//UROL)     # absorb + process incomplete AD blocks
-cycles_dec += ((Na>0)|(Nc>0)|(Inc>0))*(Ina==0)              # absorb empty AD block with padding if required
-cycles_dec += 1                                             # domain seperation
-cycles_dec += (PB//UROL+R//CCW)*Nc                          # absorb + process complete MSG blocks
-cycles_dec += Inc*(int(((Blm*8+CCW-8)/CCW)) + PB//UROL)     # absorb + process incomplete MSG blocks
-cycles_dec += (Inc==0)                                      # absorb empty MSG block with pad
-cycles_dec += 1                                             # final key add 1
-cycles_dec += PA//UROL                                      # final process
-cycles_dec += 1                                             # final key add 2
-cycles_dec += 128//CCW                                      # extract tag / verify tag
-cycles_dec += 1                                             # wait ack (only decryption)
-
+cycles_dec = int(model.dec(Na*R//8 + Bla, Nc*R//8 + Blc))
 print('decryption cycles: ' + str(cycles_dec))
 
-# asconhashav12
-PA = 12
-PB = 8
+# asconhashav12: Na and Bla are the blocks of the hash message
 R = 64
-
-cycles_hash = PA//UROL                                      # initialization
-cycles_hash += Na*PB//UROL + Na*(R//CCW)                    # absorb + process complete AD blocks  
-cycles_hash += Ina*(int(((Bla*8+CCW-8)/CCW)) + PB//UROL)    # absorb + process incomplete AD blocks
-cycles_hash += (Ina==0)*PA//UROL                            # absorb empty AD block with padding
-cycles_hash += (Ina==1)*(PA-PB)//UROL                       # last process before squeeze has PA rounds
-cycles_hash += 64//CCW*4                                    # Squeeze Hash
-cycles_hash += PB//UROL*3
-
+cycles_hash = int(model.hash(Na*R//8 + Bla))
 print('cycles_hash: ' + str(cycles_hash))
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Design-space exploration of the Ascon CryptoCore configurations.
+
+Sweeps the CCW, UROL and AEAD rate (Ascon-128 with its 64-bit rate and
+Asconhash, Ascon-128a with its 128-bit rate and Asconhasha) of the cycle
+model (cycle_model.py) over traffic profiles, and reports for each
+configuration the throughput on the profile (cycles/byte), the large-N
+throughputs of the AEAD and of the hash, the latency percentiles and
+whether the configuration is on the Pareto frontier of the objectives
+(by default throughput, p99 latency, UROL and CCW, UROL and CCW standing
+for the area).
+
+All configurations and all messages of a profile are evaluated at once
+as NumPy arrays.
+
+A traffic profile is either
+    FILE.csv                ad_len, msg_len and optionally operation
+                            (enc/dec/hash) and weight columns; the
+                            expected_timing.csv of cryptotvgen fits
+    uniform:AD_MAX:MSG_MAX  uniform lengths (both bounds included)
+    lognormal:AD:MSG        log-normal lengths of medians AD and MSG
+    fixed:AD:MSG            a single message shape
+
+Example:
+    ./dse.py uniform:64:1536 traffic.csv --percentiles 50 99
+    ./dse.py lognormal:16:256 --ccw 32 --objectives cpb p50 urol --pareto
+'''
+
+import argparse
+import csv
+import math
+import sys
+
+import numpy as np
+
+from cycle_model import ALGORITHMS, CCWS, enc_cycles, hash_cycles, load_variants
+
+# Hash of the same family as each AEAD
+HASH_OF = {'ascon128v12': 'asconhashv12', 'ascon128av12': 'asconhashav12'}
+OPERATIONS = ('enc', 'dec', 'hash')
+OBJECTIVES = ('cpb', 'urol', 'ccw')
+# Cycles computed at once: configurations x messages
+BUDGET = 1 << 23
+
+
+def divisors(n):
+    return [d for d in range(1, n + 1) if n % d == 0]
+
+def configurations(ccws=CCWS, urols=None, aeads=tuple(HASH_OF)):
+    '''
+    Configurations as a dict of arrays (one entry per configuration):
+    name, aead, ccw, urol and the pa/pb/rate of the AEAD and of the hash.
+    UROL takes the values of urols (default: all) that evenly divide the
+    rounds of both algorithms.
+    '''
+    known = {(m.aead, m.ccw, m.urol): name for name, m in load_variants().items()}
+    rows = []
+    for aead in aeads:
+        alg, hash_ = ALGORITHMS[aead], ALGORITHMS[HASH_OF[aead]]
+        rounds = math.gcd(math.gcd(alg['pa'], alg['pb']), math.gcd(hash_['pa'], hash_['pb']))
+        for ccw in ccws:
+            for urol in divisors(rounds):
+                if urols and urol not in urols:
+                    continue
+                name = '{} CCW={} UROL={}'.format(aead, ccw, urol)
+                if (aead, ccw, urol) in known:
+                    name += ' ({})'.format(known[(aead, ccw, urol)])
+                rows.append((name, aead, ccw, urol, alg['pa'], alg['pb'], alg['rate'],
+                             hash_['pa'], hash_['pb'], hash_['rate']))
+    if not rows:
+        raise ValueError('No configuration')
+    keys = ('name', 'aead', 'ccw', 'urol', 'pa', 'pb', 'rate', 'hash_pa', 'hash_pb', 'hash_rate')
+    columns = list(zip(*rows))
+    return {k: (list(col) if k in ('name', 'aead') else np.array(col, dtype=np.int64))
+            for k, col in zip(keys, columns)}
+
+
+class Profile(object):
+    ''' Message shapes: AD and message lengths, operations and weights '''
+    def __init__(self, name, ad_len, msg_len, op=None, weight=None):
+        self.name = name
+        self.ad_len = np.asarray(ad_len, dtype=np.int64)
+        self.msg_len = np.asarray(msg_len, dtype=np.int64)
+        self.op = np.zeros(len(self.ad_len), dtype=np.int64) if op is None else np.asarray(op)
+        self.weight = (np.ones(len(self.ad_len)) if weight is None
+                       else np.asarray(weight, dtype=float))
+        # Hash messages have no AD
+        self.ad_len = np.where(self.op == OPERATIONS.index('hash'), 0, self.ad_len)
+
+    def __len__(self):
+        return len(self.ad_len)
+
+def read_profile(path):
+    ad_len, msg_len, op, weight = [], [], [], []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            ad_len.append(int(row.get('ad_len') or 0))
+            msg_len.append(int(row['msg_len']))
+            op.append(OPERATIONS.index(row.get('operation') or 'enc'))
+            weight.append(float(row.get('weight') or row.get('count') or 1))
+    return Profile(path, ad_len, msg_len, op, weight)
+
+def make_profile(spec, samples=100000, rng=None):
+    ''' Profile of a specification (see the module documentation) '''
+    rng = rng if rng is not None else np.random.default_rng(0)
+    kind, _, args = spec.partition(':')
+    if kind not in ('uniform', 'lognormal', 'fixed'):
+        return read_profile(spec)
+    try:
+        ad, msg = (int(a) for a in args.split(':'))
+    except ValueError:
+        raise ValueError('Profile {} must be {}:AD:MSG'.format(spec, kind))
+    if kind == 'fixed':
+        return Profile(spec, [ad], [msg])
+    if kind == 'uniform':
+        return Profile(spec, rng.integers(0, ad + 1, samples), rng.integers(0, msg + 1, samples))
+    # Log-normal of the given medians (and sigma 1), rounded down
+    return Profile(spec, np.floor(rng.lognormal(math.log(max(ad, 1)), 1, samples))*(ad > 0),
+                   np.floor(rng.lognormal(math.log(max(msg, 1)), 1, samples))*(msg > 0))
+
+
+def weighted_percentiles(values, weight, percentiles):
+    ''' Percentiles of each row of values, the columns weighted by weight '''
+    order = np.argsort(values, axis=1)
+    ordered = np.take_along_axis(values, order, axis=1)
+    cumulative = np.cumsum(weight[order], axis=1)
+    total = cumulative[:, -1:]
+    result = []
+    for p in percentiles:
+        index = (cumulative < total*p/100).sum(axis=1)
+        index = np.minimum(index, values.shape[1] - 1)
+        result.append(ordered[np.arange(len(values)), index])
+    return np.stack(result, axis=1)
+
+def evaluate(configs, profile, percentiles=(50, 90, 99)):
+    '''
+    Metrics of the configurations on profile: {'cpb', 'latency'
+    (configurations x percentiles), 'cpb_aead', 'cpb_hash'}, the throughputs
+    in cycles/byte and the latencies in cycles
+    '''
+    n = len(configs['ccw'])
+    hashop = profile.op == OPERATIONS.index('hash')
+    decrypt = profile.op == OPERATIONS.index('dec')
+    nbytes = (profile.weight*(profile.ad_len + profile.msg_len)).sum()
+    cpb = np.empty(n)
+    latency = np.empty((n, len(percentiles)))
+    step = max(1, BUDGET//max(len(profile), 1))
+    for start in range(0, n, step):
+        sel = slice(start, start + step)
+        column = {k: v[sel, None] for k, v in configs.items() if isinstance(v, np.ndarray)}
+        cycles = enc_cycles(profile.ad_len[None, :], profile.msg_len[None, :],
+                            column['ccw'], column['urol'], column['pa'], column['pb'],
+                            column['rate']) + decrypt
+        if hashop.any():
+            cycles = np.where(hashop, hash_cycles(profile.msg_len[None, :], column['ccw'],
+                                                  column['urol'], column['hash_pa'],
+                                                  column['hash_pb'], column['hash_rate']),
+                              cycles)
+        cpb[sel] = (cycles*profile.weight).sum(axis=1)/max(nbytes, 1)
+        latency[sel] = weighted_percentiles(cycles, profile.weight, percentiles)
+
+    ccw, urol = configs['ccw'], configs['urol']
+    # Large Na and Nm (same throughput) and large Nh
+    aead = (configs['pb']//urol + configs['rate']//ccw)/(configs['rate']//8)
+    hash_ = ((configs['hash_pb']//urol + configs['hash_rate']//ccw)
+             / (configs['hash_rate']//8))
+    return {'cpb': cpb, 'latency': latency, 'cpb_aead': aead, 'cpb_hash': hash_}
+
+def pareto(objectives):
+    '''
+    Mask of the rows of objectives (configurations x objectives, all
+    minimized) that no other row dominates
+    '''
+    a = objectives[:, None, :]
+    b = objectives[None, :, :]
+    dominates = (b <= a).all(axis=2) & (b < a).any(axis=2)
+    return ~dominates.any(axis=1)
+
+def objective_values(configs, metrics, objectives, percentiles):
+    columns = []
+    for objective in objectives:
+        if objective in ('urol', 'ccw'):
+            columns.append(configs[objective])
+        elif objective == 'cpb':
+            columns.append(metrics['cpb'])
+        else:
+            columns.append(metrics['latency'][:, percentiles.index(int(objective[1:]))])
+    return np.stack(columns, axis=1).astype(float)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('profiles', nargs='*', default=['uniform:64:1536'],
+                        help='Traffic profiles (default: %(default)s).')
+    parser.add_argument('--ccw', type=int, nargs='+', default=list(CCWS), choices=CCWS,
+                        help='CCW values (default: all).')
+    parser.add_argument('--urol', type=int, nargs='+',
+                        help='UROL values (default: all the divisors of the rounds).')
+    parser.add_argument('--aead', nargs='+', default=list(HASH_OF), choices=list(HASH_OF),
+                        help='AEAD algorithms, i.e. rates (default: both).')
+    parser.add_argument('--percentiles', type=int, nargs='+', default=[50, 90, 99],
+                        help='Latency percentiles (default: %(default)s).')
+    parser.add_argument('--objectives', nargs='+', default=None,
+                        help='Minimized objectives of the Pareto frontier among cpb, '
+                             'p<percentile>, urol and ccw (default: cpb, the last '
+                             'percentile, urol and ccw).')
+    parser.add_argument('--pareto', action='store_true',
+                        help='Only list the configurations of the Pareto frontier.')
+    parser.add_argument('--samples', type=int, default=100000,
+                        help='Messages drawn for the synthetic profiles.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--csv', metavar='FILE', help='Write all the results to FILE.')
+    return parser
+
+def main(args=sys.argv[1:]):
+    args = get_parser().parse_args(args)
+    objectives = args.objectives or ['cpb', 'p{}'.format(args.percentiles[-1]), 'urol', 'ccw']
+    for objective in objectives:
+        if objective not in OBJECTIVES and not (
+                objective[:1] == 'p' and objective[1:].isdigit()
+                and int(objective[1:]) in args.percentiles):
+            sys.exit('Unknown objective {} (percentiles must be in --percentiles)'
+                     .format(objective))
+    try:
+        configs = configurations(args.ccw, args.urol, args.aead)
+    except ValueError as e:
+        sys.exit(str(e))
+    rng = np.random.default_rng(args.seed)
+
+    rows = []
+    for spec in args.profiles:
+        try:
+            profile = make_profile(spec, args.samples, rng)
+        except (OSError, ValueError, KeyError) as e:
+            sys.exit('Cannot use the profile {}: {}\nProfiles are FILE.csv (with a msg_len '
+                     'column), uniform:AD_MAX:MSG_MAX, lognormal:AD:MSG or fixed:AD:MSG'
+                     .format(spec, e))
+        metrics = evaluate(configs, profile, args.percentiles)
+        frontier = pareto(objective_values(configs, metrics, objectives, args.percentiles))
+        print('Profile {}: {} messages, {} configurations, Pareto frontier of {}'.format(
+            profile.name, len(profile), len(configs['ccw']), ', '.join(objectives)))
+        print('  {:36} {:>7} {:>7} {:>7} {}'.format(
+            'configuration', 'c/B', 'AEAD', 'hash',
+            ' '.join('{:>7}'.format('p{}'.format(p)) for p in args.percentiles)))
+        for i in np.argsort(metrics['cpb'], kind='stable'):
+            row = {
+                'profile': profile.name, 'configuration': configs['name'][i],
+                'aead': configs['aead'][i], 'ccw': int(configs['ccw'][i]),
+                'urol': int(configs['urol'][i]), 'cpb': metrics['cpb'][i],
+                'cpb_aead': metrics['cpb_aead'][i], 'cpb_hash': metrics['cpb_hash'][i],
+                'pareto': bool(frontier[i])}
+            row.update(('p{}'.format(p), int(v))
+                       for p, v in zip(args.percentiles, metrics['latency'][i]))
+            rows.append(row)
+            if args.pareto and not frontier[i]:
+                continue
+            print('{} {:36} {:7.3f} {:7.3f} {:7.3f} {}'.format(
+                '*' if frontier[i] else ' ', row['configuration'], row['cpb'],
+                row['cpb_aead'], row['cpb_hash'],
+                ' '.join('{:7}'.format(row['p{}'.format(p)]) for p in args.percentiles)))
+        print()
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Run the testbench of every Ascon variant, concurrently.
+
+Each variant (ascon_<variant>.toml) is analyzed, elaborated and simulated
+with GHDL in its own directory build/<variant>, so variants never share a
+work library and several can run at once. The testbench outputs
+(log.txt, failed_testvectors.txt, timing.txt, result.txt) and the GHDL
+output (ghdl.log) stay in that directory.
+
+The sources are the `[rtl] sources` list of the variant's TOML file; the
+KAT files are the G_FNAME_* `[tb.generics]`. GHDL options are the ones of
+the Makefile.
+
+The sources are analyzed incrementally (see vhdl_build.py): the work
+library of a variant is kept in build/lib/<variant> and analyzed libraries
+are shared between variants and runs in build/cache, so only the sources
+that changed (or whose dependencies changed) are analyzed again. With
+--no_cache all sources are analyzed in the variant's directory, in the
+order of the TOML file.
+
+Example:
+    ./test_all.py                   # all variants, one job per CPU
+    ./test_all.py v1 v2 --jobs 2
+'''
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from vhdl_build import AnalysisCache
+
+# Same order as test_all.sh
+VARIANTS = ('v1', 'v1_8bit', 'v1_16bit', 'v2', 'v3', 'v4', 'v5', 'v6')
+
+TB_OUTPUTS = ('log.txt', 'failed_testvectors.txt', 'timing.txt', 'result.txt')
+GHDL_LOG = 'ghdl.log'
+# Below the build directory: work libraries of the variants, cached libraries
+LIB_DIR = 'lib'
+CACHE_DIR = 'cache'
+
+RED = '\033[0;31m'
+GREEN = '\033[0;32m'
+NC = '\033[0m'
+
+
+def load_toml(path):
+    try:
+        import tomllib
+    except ImportError:
+        import tomli as tomllib
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def variant_names(root=HERE):
+    ''' Names of the variants with an ascon_<name>.toml in root, VARIANTS first '''
+    names = [f[len('ascon_'):-len('.toml')] for f in sorted(os.listdir(root))
+             if f.startswith('ascon_') and f.endswith('.toml')]
+    return [n for n in VARIANTS if n in names] + [n for n in names if n not in VARIANTS]
+
+def check_variants(parser, names, root=HERE):
+    ''' Exit through parser.error() if a name is not a variant of root '''
+    known = variant_names(root)
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        parser.error('unknown variant {} (variants: {})'.format(
+            ', '.join(unknown), ', '.join(known)))
+
+
+class Variant(object):
+    ''' Sources and testbench generics of ascon_<name>.toml '''
+    def __init__(self, name, root=HERE):
+        self.name = name
+        self.root = root
+        desc = load_toml(os.path.join(root, 'ascon_{}.toml'.format(name)))
+        self.sources = [os.path.join(root, src) for src in desc['rtl']['sources']]
+        self.tb_top = desc.get('tb', {}).get('top', 'LWC_TB')
+        # File generics are relative to the TOML file
+        self.generics = {}
+        for generic, value in desc.get('tb', {}).get('generics', {}).items():
+            if isinstance(value, dict) and 'file' in value:
+                self.generics[generic] = os.path.join(root, value['file'])
+
+
+class Ghdl(object):
+    '''
+    GHDL invocation. Every command goes through call(), which can be
+    replaced (e.g. by a stub in tests, or to use another simulator).
+    '''
+    FLAGS = ['--std=08']
+    OPT = ['-frelaxed-rules', '--warn-no-vital-generic', '-frelaxed', '-O3']
+    WARNS = ['-Wbinding', '-Wreserved', '-Wlibrary', '-Wvital-generic',
+             '-Wdelayed-checks', '-Wbody', '-Wspecs', '-Wunused',
+             '--warn-no-runtime-error']
+    ELAB_OPTS = ['--mb-comments']
+
+    def __init__(self, ghdl='ghdl'):
+        self.ghdl = ghdl
+
+    def options(self, workdir=None):
+        options = self.FLAGS + self.OPT + self.WARNS + self.ELAB_OPTS
+        if workdir:
+            options = options + ['--workdir={}'.format(workdir)]
+        return options
+
+    def version(self):
+        ''' Version string of GHDL, part of the keys of analyzed sources '''
+        try:
+            return subprocess.run([self.ghdl, '--version'], stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+        except OSError:
+            return ''
+
+    def call(self, args, cwd, log):
+        ''' Run a command in cwd, appending its output to log. Returns its exit code. '''
+        log.write('$ {}\n'.format(' '.join(args)))
+        log.flush()
+        return subprocess.call(args, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+
+    def analyze(self, sources, cwd, log, workdir=None):
+        for src in sources:
+            if self.call([self.ghdl, '-a'] + self.options(workdir) + [src], cwd, log):
+                return False
+        return True
+
+    def elaborate(self, top, cwd, log, workdir=None):
+        return self.call([self.ghdl, '-e'] + self.options(workdir) + [top], cwd, log) == 0
+
+    def run(self, top, generics, cwd, log, workdir=None):
+        gen = ['-g{}={}'.format(k, v) for k, v in generics.items()]
+        return self.call([self.ghdl, '-r'] + self.options(workdir) + [top] + gen,
+                         cwd, log) == 0
+
+
+def passed(ghdl_log):
+    ''' Verdict of the testbench, as test_all.sh: a [PASS] line '''
+    with open(ghdl_log, errors='replace') as f:
+        return any('[PASS]' in line for line in f)
+
+def run_variant(variant, build_dir, ghdl, generics=None, cache=None):
+    '''
+    Build and simulate a Variant in build_dir/<name>. The sources are
+    analyzed with the AnalysisCache cache into build_dir/lib/<name> if
+    given. Returns a result dict with the verdict, the failing step (if
+    any), the number of sources analyzed, the time and the output files.
+    '''
+    cwd = os.path.join(build_dir, variant.name)
+    shutil.rmtree(cwd, ignore_errors=True)
+    os.makedirs(cwd)
+    gen = dict(variant.generics)
+    gen.update(generics or {})
+
+    start = time.perf_counter()
+    step = None
+    with open(os.path.join(cwd, GHDL_LOG), 'w') as log:
+        if cache:
+            workdir = os.path.join(build_dir, LIB_DIR, variant.name)
+            analyzed = cache.build(variant.sources, workdir, log)
+        else:
+            workdir = None
+            analyzed = len(variant.sources) if ghdl.analyze(variant.sources, cwd, log) else None
+        if analyzed is None:
+            step = 'analyze'
+        elif not ghdl.elaborate(variant.tb_top, cwd, log, workdir):
+            step = 'elaborate'
+        elif not ghdl.run(variant.tb_top, gen, cwd, log, workdir):
+            step = 'simulate'
+    ok = step is None and passed(os.path.join(cwd, GHDL_LOG))
+    if step is None and not ok:
+        step = 'simulate'
+    return {
+        'variant': variant.name,
+        'status': 'PASS' if ok else 'FAIL',
+        'failed_step': step,
+        'analyzed': analyzed,
+        'seconds': time.perf_counter() - start,
+        'dir': cwd,
+        'files': {name: os.path.join(cwd, name)
+                  for name in TB_OUTPUTS + (GHDL_LOG,)
+                  if os.path.exists(os.path.join(cwd, name))},
+    }
+
+def run_all(variants, build_dir, jobs=None, ghdl=None, generics=None, report=print,
+            cache=True):
+    '''
+    Run Variants with jobs threads (each waiting on GHDL), analyzing the
+    sources incrementally unless cache is False. Returns the results.
+    '''
+    ghdl = ghdl if ghdl else Ghdl()
+    jobs = jobs if jobs else os.cpu_count()
+    if cache:
+        # Sources common to the variants are found among all of them, so the
+        # cached libraries do not depend on which variants are run
+        root = variants[0].root if variants else HERE
+        known = [Variant(name, root) for name in VARIANTS]
+        known += [v for v in variants if v.name not in VARIANTS]
+        cache = AnalysisCache(os.path.join(build_dir, CACHE_DIR), ghdl,
+                              [v.sources for v in known])
+
+    def task(variant):
+        result = run_variant(variant, build_dir, ghdl, generics, cache)
+        report_result(result, report)
+        return result
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(task, variants))
+
+def report_result(result, report=print):
+    color = GREEN if result['status'] == 'PASS' else RED
+    txt = '{:10} {}{}!{} ({:.1f} s'.format(result['variant'], color, result['status'],
+                                           NC, result['seconds'])
+    if result['analyzed'] is not None:
+        txt += ', {} sources analyzed'.format(result['analyzed'])
+    txt += ')'
+    if result['failed_step']:
+        txt += ' {} failed, see {}'.format(result['failed_step'],
+                                           os.path.join(result['dir'], GHDL_LOG))
+    report(txt)
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('variants', nargs='*', default=list(VARIANTS),
+                        help='Variants to run (default: all).')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of variants simulated at once (default: number of CPUs).')
+    parser.add_argument('--build_dir', default=os.path.join(HERE, 'build'),
+                        help='Directory of the per-variant work directories.')
+    parser.add_argument('--ghdl', default=shutil.which('ghdl') or 'ghdl',
+                        help='GHDL executable.')
+    parser.add_argument('-g', dest='generics', action='append', default=[],
+                        metavar='NAME=VALUE', help='Additional testbench generic.')
+    parser.add_argument('--no_cache', dest='cache', action='store_false',
+                        help='Analyze all sources of each variant from scratch.')
+    parser.add_argument('--json', metavar='FILE',
+                        help='Write the results to FILE.')
+    return parser
+
+def main(args=sys.argv[1:]):
+    parser = get_parser()
+    args = parser.parse_args(args)
+    check_variants(parser, args.variants)
+    generics = dict(g.split('=', 1) for g in args.generics)
+    variants = [Variant(name) for name in args.variants]
+    results = run_all(variants, os.path.abspath(args.build_dir), args.jobs,
+                      Ghdl(args.ghdl), generics, cache=args.cache)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    failed = [r['variant'] for r in results if r['status'] != 'PASS']
+    print('{}/{} variants passed'.format(len(results) - len(failed), len(results)))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
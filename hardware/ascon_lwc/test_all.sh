@@ -1,30 +1,5 @@
 #!/bin/bash
 
-declare -a arr=(
-"v1"
-"v1_8bit"
-"v1_16bit"
-"v2"
-"v3"
-"v4"
-"v5"
-"v6"
-)
-
-RED='\033[0;31m'
-GREEN='\033[0;32m'
-NC='\033[0m' # No Color
-
-make clean
-for i in "${arr[@]}"
-do
-	echo "Running testbench for $i..."
-	res=$(make $i | grep "\[")
-	if [[ $res == *"PASS"* ]]; then
-		printf "${GREEN}PASS!${NC}\n"
-	else
-    		printf "${RED}FAIL!${NC}\n"
-	fi
-	make clean
-done
-
+# Builds every variant in its own directory (build/<variant>) and runs them
+# concurrently, see ./test_all.py -h
+exec python3 "$(dirname "$0")/test_all.py" "$@"
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Compare the cycles measured by the testbench with the cycle model.
+
+LWC_TB with G_TEST_MODE = 4 writes one `MsgID,cycles` line per test
+vector to G_FNAME_TIMING (timing.txt). The AD and message lengths of the
+test vectors, and the cycles expected by the model, are the
+expected_timing.csv written by `cryptotvgen --cycle_model`. Both files
+are read as streams, in MsgID order, and processed in chunks, so
+timing files of any size are summarized in bounded memory.
+
+The report gives:
+- the deviations (measured - expected) per class of test vectors:
+  operation, key activation and the number of complete AD and message
+  blocks (0, 1, 2+) with a complete or incomplete last block;
+- least-squares fits of cycles = c0 + a*AD bytes + m*message bytes over
+  the large test vectors, next to the cycles/byte of the model;
+- regressions against a baseline saved by a previous run.
+
+Example:
+    cryptotvgen ... --dest KAT/v1 --cycle_model cycle_model.py v1
+    ./test_all.py v1 -g G_TEST_MODE=4
+    ./timing_report.py build/v1/timing.txt KAT/v1/expected_timing.csv \\
+        --variant v1 --baseline timing_v1.json
+'''
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+
+import numpy as np
+
+OPERATIONS = ('enc', 'dec', 'hash')
+N_BINS = ('0', '1', '2+')
+TAIL_BINS = ('full', 'part')
+CHUNK = 65536
+# Test vectors with at least this many blocks of AD + message are fitted
+LARGE_BLOCKS = 4
+
+
+def read_timing(path):
+    ''' (MsgID, cycles) of the lines of a timing file '''
+    with open(path) as f:
+        for line in f:
+            fields = line.replace(',', ' ').split()
+            if len(fields) < 2 or not fields[0].isdigit():
+                continue    # header, comment or empty line
+            yield int(fields[0]), int(fields[1])
+
+def read_vectors(path):
+    ''' Rows of expected_timing.csv, with int fields '''
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield {k: v if k == 'operation' else int(v) for k, v in row.items()}
+
+def join(measured, vectors):
+    '''
+    Merge two streams in MsgID order: yields (vector row, measured
+    cycles). LWC_TB writes the MsgID modulo 256, so each measurement is
+    matched to the next vector, their MsgIDs being compared modulo 256.
+    The vectors after the last measurement are skipped (e.g. a simulation
+    stopped early), measurements left without vector are an error.
+    '''
+    vectors = iter(vectors)
+    for msg_id, cycles in measured:
+        row = next(vectors, None)
+        if row is None:
+            raise ValueError('No test vector left for MsgID {}'.format(msg_id))
+        if row['msg_id'] % 256 != msg_id % 256:
+            raise ValueError('Timing of MsgID {} where MsgID {} ({} modulo 256) '
+                             'was expected'.format(msg_id, row['msg_id'], row['msg_id'] % 256))
+        yield row, cycles
+
+def chunks(iterable, size=CHUNK):
+    iterable = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterable, size))
+        if not chunk:
+            return
+        yield chunk
+
+def size_bins(length, block):
+    ''' Indexes of N_BINS and TAIL_BINS of lengths '''
+    n, bl = np.divmod(length, block)
+    return np.minimum(n, 2), (bl > 0).astype(np.int64)
+
+def class_name(code):
+    ''' Name of a class code of TimingReport '''
+    code, msg_tail = divmod(code, 2)
+    code, msg_n = divmod(code, 3)
+    code, ad_tail = divmod(code, 2)
+    code, ad_n = divmod(code, 3)
+    op, new_key = divmod(code, 2)
+    if OPERATIONS[op] == 'hash':
+        return 'hash msg={}/{}'.format(N_BINS[msg_n], TAIL_BINS[msg_tail])
+    return '{} {} ad={}/{} msg={}/{}'.format(
+        OPERATIONS[op], 'new_key' if new_key else 'key_reuse',
+        N_BINS[ad_n], TAIL_BINS[ad_tail], N_BINS[msg_n], TAIL_BINS[msg_tail])
+
+
+class TimingReport(object):
+    '''
+    Running statistics of measured and expected cycles. ad_block and
+    msg_block are the AEAD and hash block sizes in bytes, used for the
+    classes and to select the large test vectors.
+    '''
+    N_CLASSES = len(OPERATIONS)*2*3*2*3*2
+
+    def __init__(self, ad_block=8, hash_block=8, model=None):
+        self.ad_block = ad_block
+        self.hash_block = hash_block
+        self.model = model
+        self.count = np.zeros(self.N_CLASSES, dtype=np.int64)
+        self.measured = np.zeros(self.N_CLASSES)
+        self.deviation = np.zeros(self.N_CLASSES)
+        self.deviation_sq = np.zeros(self.N_CLASSES)
+        self.min_dev = np.full(self.N_CLASSES, np.inf)
+        self.max_dev = np.full(self.N_CLASSES, -np.inf)
+        # Normal equations of the fits, per operation
+        self.xtx = np.zeros((len(OPERATIONS), 3, 3))
+        self.xty = np.zeros((len(OPERATIONS), 3))
+
+    def add(self, rows):
+        ''' Add a chunk of (vector row, measured cycles) '''
+        op = np.array([OPERATIONS.index(row['operation']) for row, _ in rows])
+        new_key = np.array([row['new_key'] for row, _ in rows])
+        ad_len = np.array([row['ad_len'] for row, _ in rows], dtype=np.int64)
+        msg_len = np.array([row['msg_len'] for row, _ in rows], dtype=np.int64)
+        measured = np.array([cycles for _, cycles in rows], dtype=np.int64)
+        hashop = op == OPERATIONS.index('hash')
+        if self.model:
+            expected = self.model.cycles(ad_len, msg_len, op == OPERATIONS.index('dec'), hashop)
+        else:
+            expected = np.array([row['cycles'] for row, _ in rows], dtype=np.int64)
+
+        block = np.where(hashop, self.hash_block, self.ad_block)
+        ad_n, ad_tail = size_bins(ad_len, block)
+        msg_n, msg_tail = size_bins(msg_len, block)
+        new_key = np.where(hashop, 0, new_key)
+        code = ((((op*2 + new_key)*3 + ad_n)*2 + ad_tail)*3 + msg_n)*2 + msg_tail
+
+        dev = measured - expected
+        n = self.N_CLASSES
+        self.count += np.bincount(code, minlength=n)
+        self.measured += np.bincount(code, measured, minlength=n)
+        self.deviation += np.bincount(code, dev, minlength=n)
+        self.deviation_sq += np.bincount(code, dev.astype(float)**2, minlength=n)
+        np.minimum.at(self.min_dev, code, dev)
+        np.maximum.at(self.max_dev, code, dev)
+
+        large = (ad_len + msg_len) >= LARGE_BLOCKS*block
+        x = np.stack([np.ones(len(rows)), ad_len, msg_len], axis=1)
+        for i in range(len(OPERATIONS)):
+            sel = large & (op == i)
+            self.xtx[i] += x[sel].T @ x[sel]
+            self.xty[i] += x[sel].T @ measured[sel]
+
+    def classes(self):
+        ''' {class name: statistics} of the classes with test vectors '''
+        result = {}
+        for code in np.nonzero(self.count)[0]:
+            count = self.count[code]
+            mean = self.deviation[code]/count
+            result[class_name(code)] = {
+                'count': int(count),
+                'mean_measured': self.measured[code]/count,
+                'mean_deviation': mean,
+                'std_deviation': float(np.sqrt(max(self.deviation_sq[code]/count - mean**2, 0))),
+                'min_deviation': int(self.min_dev[code]),
+                'max_deviation': int(self.max_dev[code]),
+            }
+        return result
+
+    def fits(self):
+        '''
+        {operation: {'c0', 'ad', 'msg'}} least-squares cycles and
+        cycles/byte of the large test vectors
+        '''
+        result = {}
+        for i, op in enumerate(OPERATIONS):
+            if self.xtx[i, 0, 0] < 3:
+                continue
+            # Hash has no AD: its column is all zero
+            cols = [0, 2] if op == 'hash' else [0, 1, 2]
+            xtx = self.xtx[i][np.ix_(cols, cols)]
+            coef, _, rank, _ = np.linalg.lstsq(xtx, self.xty[i][cols], rcond=None)
+            if rank < len(cols):
+                continue
+            fit = dict(zip(['c0', 'ad', 'msg'] if op != 'hash' else ['c0', 'msg'], coef))
+            result[op] = {k: float(v) for k, v in fit.items()}
+        return result
+
+    def summary(self):
+        return {'vectors': int(self.count.sum()), 'classes': self.classes(), 'fits': self.fits()}
+
+
+def regressions(summary, baseline, tolerance):
+    '''
+    Classes whose mean measured cycles exceed the baseline by more than
+    tolerance percent: [(class, baseline, current)]
+    '''
+    result = []
+    for name, stats in summary['classes'].items():
+        base = baseline['classes'].get(name)
+        if base and stats['mean_measured'] > base['mean_measured']*(1 + tolerance/100):
+            result.append((name, base['mean_measured'], stats['mean_measured']))
+    return result
+
+def print_summary(summary, model=None, out=sys.stdout):
+    out.write('{} test vectors\n\n'.format(summary['vectors']))
+    out.write('{:40} {:>7} {:>10} {:>9} {:>7} {:>7} {:>7}\n'.format(
+        'class', 'count', 'measured', 'mean dev', 'std', 'min', 'max'))
+    for name, s in sorted(summary['classes'].items()):
+        out.write('{:40} {:7} {:10.1f} {:9.2f} {:7.2f} {:7} {:7}\n'.format(
+            name, s['count'], s['mean_measured'], s['mean_deviation'],
+            s['std_deviation'], s['min_deviation'], s['max_deviation']))
+    if summary['fits']:
+        cpb = model.cycles_per_byte() if model else {}
+        out.write('\nLarge test vectors: cycles = c0 + cycles/byte * bytes\n')
+        for op, fit in summary['fits'].items():
+            model_msg = cpb.get('hash' if op == 'hash' else 'msg')
+            txt = '    {:4} c0 {:8.1f}'.format(op, fit['c0'])
+            if 'ad' in fit:
+                txt += '  AD {:.3f} c/B'.format(fit['ad'])
+                if model:
+                    txt += ' (model {:.3f})'.format(cpb['ad'])
+            txt += '  msg {:.3f} c/B'.format(fit['msg'])
+            if model_msg is not None:
+                txt += ' (model {:.3f})'.format(model_msg)
+            out.write(txt + '\n')
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('timing', help='Timing file of the testbench (G_FNAME_TIMING).')
+    parser.add_argument('vectors', help='expected_timing.csv of the test vectors.')
+    parser.add_argument('--variant',
+                        help='Compare with the cycle model of this variant instead of '
+                             'the cycles of expected_timing.csv.')
+    parser.add_argument('--block', type=int, default=8, metavar='BYTES',
+                        help='Block size of the classes without --variant '
+                             '(default: %(default)s).')
+    parser.add_argument('--baseline', metavar='FILE',
+                        help='Report regressions against the baseline FILE.')
+    parser.add_argument('--save_baseline', metavar='FILE',
+                        help='Save this run as baseline FILE.')
+    parser.add_argument('--tolerance', type=float, default=1.0, metavar='PERCENT',
+                        help='Increase of the mean cycles of a class reported as a '
+                             'regression (default: %(default)s).')
+    parser.add_argument('--json', metavar='FILE', help='Write the summary to FILE.')
+    return parser
+
+def main(args=sys.argv[1:]):
+    args = get_parser().parse_args(args)
+    model = None
+    if args.variant:
+        from cycle_model import load_model
+        model = load_model(args.variant)
+        report = TimingReport(model.ad_block_bytes, model.hash_block_bytes, model)
+    else:
+        report = TimingReport(args.block, args.block)
+
+    try:
+        for chunk in chunks(join(read_timing(args.timing), read_vectors(args.vectors))):
+            report.add(chunk)
+    except ValueError as e:
+        sys.exit('{}: {}'.format(args.timing, e))
+    summary = report.summary()
+    print_summary(summary, model)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(summary, f, indent=2)
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        found = regressions(summary, baseline, args.tolerance)
+        print('\n{} regression(s) against {}'.format(len(found), args.baseline))
+        for name, base, current in found:
+            print('    {:40} {:10.1f} -> {:10.1f}'.format(name, base, current))
+        status = 1 if found else 0
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Extract the failing test vectors of a testbench run into a small KAT.
+
+The failures are read from failed_testvectors.txt (or log.txt) of a
+variant's build directory (see test_all.py): `Test #N` is the N-th test
+vector of do.txt, the 8-bit MsgID and the do.txt line are used to check
+that the failures belong to the KAT files. The pdi.txt, sdi.txt and do.txt
+files are indexed by test vector (see cryptotvgen-kat) and only the failing
+test vectors are copied, with the key they use: when a test vector relies
+on a key activated by an earlier one, the key activation (pdi.txt) and the
+loading of the key (sdi.txt) are added to it. The reproducer is written to
+<output>/KAT/<variant>, with triage.txt mapping its test vectors to the
+original ones, and is simulated with --run in <output>/<variant>.
+
+Example:
+    ./test_all.py v1                # build/v1/failed_testvectors.txt
+    ./triage.py v1 --run            # build/triage/KAT/v1, build/triage/v1
+    ./triage.py v1 --tests 90000 --kat big/ --run
+'''
+
+import argparse
+import mmap
+import os
+import re
+import shutil
+import sys
+from bisect import bisect_left
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+try:
+    from cryptotvgen.kat import ACTKEY, TITLES, index_vectors, read_io
+except ImportError:
+    sys.path.insert(1, os.path.join(HERE, '..', '..', 'software', 'cryptotvgen'))
+    from cryptotvgen.kat import ACTKEY, TITLES, index_vectors, read_io
+from cryptotvgen.generator import Opcode
+
+from test_all import (CACHE_DIR, VARIANTS, Ghdl, Variant, check_variants, report_result,
+                      run_variant)
+from vhdl_build import AnalysisCache
+
+KAT_FILES = (('pdi', 'G_FNAME_PDI'), ('sdi', 'G_FNAME_SDI'), ('do', 'G_FNAME_DO'))
+FAILURES = 'failed_testvectors.txt'
+TRIAGE_TXT = 'triage.txt'
+EOF = b'###EOF'
+# Operations using the active key
+KEYED = (Opcode.encrypt.value, Opcode.decrypt.value)
+
+# Failure lines of the testbench, in failed_testvectors.txt and log.txt
+_FAILURE = re.compile(r'Test #(\d+) MsgID: (\d+) Line: (\d+) Word: (\d+)')
+_ACTKEY = re.compile(rb'^INS = ' + '{:X}'.format(ACTKEY).encode(), re.M)
+_TITLE = re.compile(rb'#### (.*)')
+
+
+def read_failures(path):
+    ''' {Test #: (MsgID, line, word)} of the first failing word of each test vector '''
+    failures = {}
+    with open(path, errors='replace') as f:
+        for match in _FAILURE.finditer(f.read()):
+            test, msg_id, line, word = (int(g) for g in match.groups())
+            failures.setdefault(test, (msg_id, line, word))
+    return failures
+
+
+class Kat(object):
+    '''
+    Test vectors of the pdi.txt, sdi.txt and do.txt of a KAT, memory-mapped:
+    bounds[kind][i] is (start, end) of the i-th test vector in kind.txt
+    '''
+    def __init__(self, paths):
+        self.paths = paths
+        self.files, self.buffers, self.bounds, self.index = {}, {}, {}, {}
+        for kind in ('pdi', 'sdi', 'do'):
+            f = self.files[kind] = open(paths[kind], 'rb')
+            buf = self.buffers[kind] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            index = self.index[kind] = index_vectors(buf)
+            eof = buf.rfind(EOF)
+            starts = [i[0] for i in index] + [eof if eof >= 0 else len(buf)]
+            self.bounds[kind] = list(zip(starts[:-1], starts[1:]))
+        # Positions of the key activations in pdi.txt
+        self.activations = [m.start() for m in _ACTKEY.finditer(self.buffers['pdi'])]
+        width = (read_io(paths['pdi']) or (32, 32))[0]
+        self.actkey = '{:X}'.format(ACTKEY).ljust(width//4, '0').encode()
+
+    def close(self):
+        for kind in self.files:
+            self.buffers[kind].close()
+            self.files[kind].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.bounds['do'])
+
+    def header(self, kind):
+        ''' Parameters of kind.txt, before the first test vector '''
+        return self.buffers[kind][:self.bounds[kind][0][0] if self.bounds[kind]
+                                  else self.buffers[kind].rfind(EOF)]
+
+    def vector(self, kind, i):
+        start, end = self.bounds[kind][i]
+        return self.buffers[kind][start:end]
+
+    def key(self, i):
+        '''
+        (index of the sdi.txt test vector loading the key active during the
+        i-th test vector or None, whether the i-th test vector activates it)
+        '''
+        start, end = self.bounds['pdi'][i]
+        activated = bisect_left(self.activations, end)
+        return (activated - 1 if activated else None,
+                activated > bisect_left(self.activations, start))
+
+    def operation(self, i):
+        ''' Opcode of the title of the i-th test vector of pdi.txt '''
+        match = _TITLE.match(self.vector('pdi', i))
+        return TITLES.get(match.group(1).strip()) if match else None
+
+    def lines(self, tests):
+        ''' {Test #: first line in do.txt} of sorted tests '''
+        lines, pos, line = {}, 0, 1
+        for test in tests:
+            start = self.bounds['do'][test - 1][0]
+            line += self.buffers['do'][pos:start].count(b'\n')
+            lines[test], pos = line, start
+        return lines
+
+    def check(self, failures):
+        ''' Messages on the failures not matching the test vectors of do.txt '''
+        tests = sorted(failures)
+        if tests and not 1 <= tests[0] <= tests[-1] <= len(self):
+            return ['Test #{} is not in {} ({} test vectors)'.format(
+                tests[0] if tests[0] < 1 else tests[-1], self.paths['do'], len(self))]
+        lines, ends = self.lines(tests), self.lines([t + 1 for t in tests if t < len(self)])
+        messages = []
+        for test in tests:
+            msg_id, line, _ = failures[test]
+            expected = self.index['do'][test - 1][1]
+            if self.index['pdi'][test - 1][1] != expected:
+                messages.append('Test #{}: MsgID {} in pdi.txt and {} in do.txt'.format(
+                    test, self.index['pdi'][test - 1][1], expected))
+            if msg_id is not None and msg_id != expected % 256:
+                messages.append('Test #{}: MsgID {} reported, {} in do.txt'.format(
+                    test, msg_id, expected))
+            if line is not None and not lines[test] <= line < ends.get(test + 1, float('inf')):
+                messages.append('Test #{}: line {} reported, not in the test vector '
+                                '(do.txt line {})'.format(test, line, lines[test]))
+        return messages
+
+    def extract(self, tests):
+        '''
+        pdi.txt, sdi.txt and do.txt (bytes) of the test vectors tests (Test #,
+        sorted), each with the key activation and key loading it needs
+        '''
+        out = {kind: [self.header(kind)] for kind in ('pdi', 'sdi', 'do')}
+        active = None
+        for test in tests:
+            pdi = self.vector('pdi', test - 1)
+            key, activates = self.key(test - 1)
+            if key is not None and key >= len(self.bounds['sdi']):
+                raise ValueError('Test #{}: no key left in {}'.format(test, self.paths['sdi']))
+            if activates:
+                out['sdi'].append(self.vector('sdi', key))
+                active = key
+            elif key is not None and key != active and self.operation(test - 1) in KEYED:
+                pos = pdi.find(b'# Instruction:')
+                pos = pdi.find(b'INS = ') if pos < 0 else pos
+                pdi = b''.join((pdi[:pos], b'# Instruction: Opcode=Activate Key\n',
+                                b'INS = ', self.actkey, b'\n', pdi[pos:]))
+                out['sdi'].append(self.vector('sdi', key))
+                active = key
+            out['pdi'].append(pdi)
+            out['do'].append(self.vector('do', test - 1))
+        return {kind: b''.join(parts) + EOF + b'\n' for kind, parts in out.items()}
+
+
+def triage(paths, failures, dest):
+    '''
+    Write the failing test vectors of the KAT files paths ({kind: path})
+    to dest, with triage.txt. Returns the tests (sorted) and {Test #: do.txt
+    line} in the KAT files.
+    '''
+    tests = sorted(failures)
+    with Kat(paths) as kat:
+        messages = kat.check(failures)
+        if messages:
+            raise ValueError('\n'.join(['The failures do not match {}:'.format(paths['do'])]
+                                       + messages))
+        files = kat.extract(tests)
+        lines = kat.lines(tests)
+        msg_ids = {test: kat.index['do'][test - 1][1] for test in tests}
+    os.makedirs(dest, exist_ok=True)
+    for kind, data in files.items():
+        with open(os.path.join(dest, kind + '.txt'), 'wb') as f:
+            f.write(data)
+    with open(os.path.join(dest, TRIAGE_TXT), 'w') as f:
+        f.write('# Test vectors of {}\n'.format(os.path.dirname(os.path.abspath(paths['do']))))
+        for new, test in enumerate(tests, 1):
+            _, line, word = failures[test]
+            f.write('Test #{} = Test #{} MsgID: {} do.txt line {}'.format(
+                new, test, msg_ids[test], lines[test]))
+            if line is not None:
+                f.write(', failed at line {} word {}'.format(line, word))
+            f.write('\n')
+    return tests, lines
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('variant', help='Variant (ascon_<variant>.toml).')
+    parser.add_argument('--failed', nargs='+', metavar='FILE',
+                        help='failed_testvectors.txt or log.txt of the run '
+                             '(default: <build_dir>/<variant>/{}).'.format(FAILURES))
+    parser.add_argument('--tests', nargs='+', type=int, metavar='N',
+                        help='Test vectors to extract (Test #), instead of the failures.')
+    parser.add_argument('--first', type=int, metavar='N',
+                        help='Extract only the first N failing test vectors.')
+    parser.add_argument('--kat', metavar='DIR',
+                        help='Directory of the KAT files of the run '
+                             '(default: the G_FNAME_* generics of the variant).')
+    parser.add_argument('--build_dir', default=os.path.join(HERE, 'build'),
+                        help='Build directory of test_all.py.')
+    parser.add_argument('-o', '--output', metavar='DIR',
+                        help='Directory of the reproducer (default: <build_dir>/triage).')
+    parser.add_argument('--run', action='store_true',
+                        help='Simulate the reproducer.')
+    parser.add_argument('--ghdl', default=shutil.which('ghdl') or 'ghdl',
+                        help='GHDL executable.')
+    parser.add_argument('-g', dest='generics', action='append', default=[],
+                        metavar='NAME=VALUE', help='Additional testbench generic.')
+    return parser
+
+def main(args=sys.argv[1:]):
+    parser = get_parser()
+    args = parser.parse_args(args)
+    check_variants(parser, [args.variant])
+    build_dir = os.path.abspath(args.build_dir)
+    output = os.path.abspath(args.output or os.path.join(build_dir, 'triage'))
+    variant = Variant(args.variant)
+    if args.kat:
+        paths = {kind: os.path.join(args.kat, kind + '.txt') for kind, _ in KAT_FILES}
+    else:
+        paths = {kind: variant.generics[generic] for kind, generic in KAT_FILES}
+
+    if args.tests:
+        failures = {test: (None, None, None) for test in args.tests}
+    else:
+        failures = {}
+        for path in args.failed or [os.path.join(build_dir, variant.name, FAILURES)]:
+            if not os.path.exists(path):
+                sys.exit('{} not found, run ./test_all.py {} first'.format(path, variant.name))
+            for test, failure in read_failures(path).items():
+                failures.setdefault(test, failure)
+        if not failures:
+            print('No failures in {}'.format(', '.join(args.failed or [FAILURES])))
+            return 0
+    if args.first:
+        failures = {test: failures[test] for test in sorted(failures)[:args.first]}
+
+    dest = os.path.join(output, 'KAT', variant.name)
+    try:
+        tests, lines = triage(paths, failures, dest)
+    except ValueError as e:
+        sys.exit(str(e))
+    print('{} test vectors of {} written to {}:'.format(
+        len(tests), os.path.dirname(os.path.abspath(paths['do'])), dest))
+    for new, test in enumerate(tests, 1):
+        print('    Test #{:<4} = Test #{} (do.txt line {})'.format(new, test, lines[test]))
+    if not args.run:
+        return 0
+
+    # As test_all.py, with the analyzed sources shared with its runs
+    ghdl = Ghdl(args.ghdl)
+    generics = dict(g.split('=', 1) for g in args.generics)
+    generics.update({generic: os.path.join(dest, kind + '.txt') for kind, generic in KAT_FILES})
+    known = [Variant(name) for name in VARIANTS]
+    known += [variant] if variant.name not in VARIANTS else []
+    cache = AnalysisCache(os.path.join(build_dir, CACHE_DIR), ghdl,
+                          [v.sources for v in known])
+    result = run_variant(variant, output, ghdl, generics, cache)
+    report_result(result)
+    if FAILURES in result['files']:
+        reproduced = sorted(read_failures(result['files'][FAILURES]))
+        print('{} of {} test vectors fail again{}'.format(
+            len(reproduced), len(tests), ': ' if reproduced else ''))
+        for new in reproduced:
+            print('    Test #{:<4} = Test #{}'.format(
+                new, tests[new - 1] if new <= len(tests) else '?'))
+    return 1 if result['status'] != 'PASS' else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+'''
+Incremental GHDL analysis of the sources of the variants.
+
+The Makefile analyzes every source of every variant from scratch. Here,
+each source gets a key, the hash of its content, of the GHDL version and
+options and of the keys of its analysis dependencies (the packages it
+uses and the entities it instantiates, see vhdl_deps.py), so the key of a
+source changes exactly when the source or one of its dependencies
+changes.
+
+A variant is analyzed in its own work library (build/lib/<variant>),
+which records the keys of the sources analyzed in it. A later build only
+re-analyzes the sources whose key is not in the library.
+
+Analyzed libraries are also shared in a cache (build/cache): the sources
+are analyzed in a dependency order putting first the sources that most
+variants have in common (e.g. LWC_config_32.vhd, NIST_LWAPI_pkg.vhd, ...
+of v1-v6), and the library is saved after the common part and at the
+end. A variant starts from the longest saved part, which may have been
+analyzed for another variant or by a previous run.
+'''
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from vhdl_deps import ScanCache, SourceGraph
+
+LIBRARY_MANIFEST = 'analyzed.json'
+SCAN_CACHE = 'deps.json'
+
+def digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else part.encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class Plan(object):
+    '''
+    Analysis of a list of sources: the key of each source and the order
+    in which the sources are analyzed.
+    '''
+    def __init__(self, sources, salt='', scans=None):
+        self.graph = SourceGraph(sources, scans)
+        self.sources = self.graph.sources
+        self.units = [s['declares'] for s in self.graph.scans]
+        self.keys = [None]*len(self.sources)
+        self.order = self.graph.topological()
+        for i in self.order:
+            self.keys[i] = digest(salt, self.graph.scans[i]['sha256'],
+                                  *(self.keys[d] for d in self.graph.deps[i]))
+
+    def share(self, shared):
+        '''
+        Analyze first the sources whose key is in most plans. shared is
+        the number of plans having each key.
+        '''
+        count = [shared.get(key, 1) for key in self.keys]
+        self.order = self.graph.topological(sorted(range(len(self.sources)),
+                                                   key=lambda i: (-count[i], i)))
+        # Library keys after each source of order, and where to save them
+        self.prefix_keys = []
+        key = ''
+        for i in self.order:
+            key = digest(key, self.keys[i])
+            self.prefix_keys.append(key)
+        ordered = [count[i] for i in self.order]
+        self.checkpoints = [n for n in range(1, len(self.order) + 1)
+                            if n == len(self.order) or ordered[n] < ordered[n - 1]]
+
+
+class AnalysisCache(object):
+    '''
+    Analysis of sources with a Ghdl into reusable work libraries, cached
+    in cache_dir. source_sets are the source lists of all known variants,
+    to find the sources they have in common.
+    '''
+    def __init__(self, cache_dir, ghdl, source_sets=()):
+        self.cache_dir = cache_dir
+        self.ghdl = ghdl
+        self.salt = digest(ghdl.version(), *ghdl.options())
+        os.makedirs(cache_dir, exist_ok=True)
+        self.scans = ScanCache(os.path.join(cache_dir, SCAN_CACHE))
+        self.shared = {}
+        for sources in source_sets:
+            for key in set(Plan(sources, self.salt, self.scans).keys):
+                self.shared[key] = self.shared.get(key, 0) + 1
+        self.scans.save()
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def plan(self, sources):
+        plan = Plan(sources, self.salt, self.scans)
+        plan.share(self.shared)
+        return plan
+
+    def lock(self, key):
+        ''' Lock of a cache entry, so concurrent builds analyze it once '''
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def entry(self, key):
+        return os.path.join(self.cache_dir, key[:32])
+
+    def save(self, lib_dir, key):
+        if os.path.isdir(self.entry(key)):
+            return
+        tmp = tempfile.mkdtemp(dir=self.cache_dir)
+        shutil.rmtree(tmp)
+        shutil.copytree(lib_dir, tmp)
+        try:
+            os.rename(tmp, self.entry(key))
+        except OSError:
+            # Saved meanwhile by another process
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def restore(self, lib_dir, key):
+        shutil.rmtree(lib_dir, ignore_errors=True)
+        if key is None:
+            os.makedirs(lib_dir)
+        else:
+            shutil.copytree(self.entry(key), lib_dir)
+
+    def build(self, sources, lib_dir, log):
+        '''
+        Analyze sources into the work library lib_dir. Returns the number
+        of sources analyzed, or None if the analysis failed.
+        '''
+        plan = self.plan(sources)
+        analyzed = read_manifest(lib_dir)
+
+        # Sources missing from the library of a previous build
+        stale = None
+        if analyzed is not None:
+            stale = [i for i in plan.order if plan.keys[i] not in analyzed]
+            # Units of removed sources would stay in the library
+            units = {u for i in stale for u in plan.units[i]}
+            if any(not set(u) <= units for key, u in analyzed.items()
+                   if key not in plan.keys):
+                stale = None
+        # Longest analyzed part in the cache
+        start = max([n for n in plan.checkpoints
+                     if os.path.isdir(self.entry(plan.prefix_keys[n - 1]))], default=0)
+
+        if stale is not None and len(stale) <= len(plan.order) - start:
+            if not self.analyze(plan, stale, lib_dir, analyzed, log):
+                return None
+            self.save(lib_dir, plan.prefix_keys[-1])
+            return len(stale)
+
+        self.restore(lib_dir, plan.prefix_keys[start - 1] if start else None)
+        count = 0
+        for n in plan.checkpoints:
+            if n <= start:
+                continue
+            key = plan.prefix_keys[n - 1]
+            with self.lock(key):
+                if os.path.isdir(self.entry(key)):
+                    # Analyzed meanwhile for another variant
+                    self.restore(lib_dir, key)
+                else:
+                    analyzed = {plan.keys[i]: plan.units[i] for i in plan.order[:start]}
+                    if not self.analyze(plan, plan.order[start:n], lib_dir, analyzed, log):
+                        return None
+                    count += n - start
+                    self.save(lib_dir, key)
+            start = n
+        return count
+
+    def analyze(self, plan, indexes, lib_dir, analyzed, log):
+        ''' Analyze plan.sources[indexes] in lib_dir, updating its manifest '''
+        write_manifest(lib_dir, None)
+        for i in indexes:
+            if not self.ghdl.analyze([plan.sources[i]], lib_dir, log, workdir=lib_dir):
+                return False
+        # Replaced sources (same units, new key)
+        units = {u for i in indexes for u in plan.units[i]}
+        analyzed = {key: u for key, u in analyzed.items() if not set(u) & units}
+        analyzed.update((plan.keys[i], plan.units[i]) for i in indexes)
+        write_manifest(lib_dir, analyzed)
+        return True
+
+
+def read_manifest(lib_dir):
+    ''' {source key: units} of the sources analyzed in lib_dir, None if unknown '''
+    try:
+        with open(os.path.join(lib_dir, LIBRARY_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_manifest(lib_dir, analyzed):
+    ''' Record the sources of lib_dir (None while it is being modified) '''
+    path = os.path.join(lib_dir, LIBRARY_MANIFEST)
+    if analyzed is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, 'w') as f:
+        json.dump(analyzed, f, indent=1, sort_keys=True)
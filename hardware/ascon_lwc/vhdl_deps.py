@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Dependencies between the VHDL sources of a variant.
+
+Each source is scanned for the packages and entities it declares, the
+work packages it uses (`use work.<pkg>`), the entities it instantiates
+directly (`entity work.<entity>`) and the components it instantiates
+(`<label> : [component] <name> port map`). A source depends on the
+sources declaring those units:
+
+- uses and entity instantiations are analysis dependencies: the source
+  must be analyzed after them, and again when they change;
+- component instantiations are bound at elaboration, so they only order
+  the analysis (as the Makefile does, for -Wbinding).
+
+Scans are cached by file (path, size and modification time) in a JSON
+file, so the graph of the sources is only built once.
+
+Example:
+    ./vhdl_deps.py v1               # analysis order of ascon_v1.toml
+    ./vhdl_deps.py --levels         # sources that can be analyzed together
+    ./vhdl_deps.py --check          # check the order of the TOML files
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+
+_COMMENT = re.compile(r'--.*')
+_UNIT = re.compile(r'^\s*(?:package|entity)\s+(\w+)\s+is\b', re.I | re.M)
+_USE = re.compile(r'\buse\s+work\s*\.\s*(\w+)', re.I)
+_ENTITY = re.compile(r'\bentity\s+work\s*\.\s*(\w+)', re.I)
+_COMPONENT = re.compile(r'\b\w+\s*:\s*(?:component\s+)?(\w+)\s+(?:generic|port)\s+map\b',
+                        re.I)
+
+
+def scan(path):
+    '''
+    Design units of a VHDL file: {'sha256', 'declares', 'uses', 'entities',
+    'components'}, the names being lowercase
+    '''
+    with open(path, 'rb') as f:
+        content = f.read()
+    text = _COMMENT.sub('', content.decode('latin-1'))
+    declares = {name.lower() for name in _UNIT.findall(text)}
+
+    def names(regex):
+        return sorted({name.lower() for name in regex.findall(text)} - declares)
+
+    return {
+        'sha256': hashlib.sha256(content).hexdigest(),
+        'declares': sorted(declares),
+        'uses': names(_USE),
+        'entities': names(_ENTITY),
+        'components': names(_COMPONENT),
+    }
+
+
+class ScanCache(object):
+    ''' Scans of files, saved in the JSON file path (if not None) '''
+    def __init__(self, path=None):
+        self.path = path
+        self.scans = {}
+        self.modified = False
+        self.lock = threading.Lock()
+        if path:
+            try:
+                with open(path) as f:
+                    self.scans = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+    def get(self, path):
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns]
+        with self.lock:
+            cached = self.scans.get(path)
+            if cached and cached['stamp'] == stamp:
+                return cached
+        result = scan(path)
+        result['stamp'] = stamp
+        with self.lock:
+            self.scans[path] = result
+            self.modified = True
+        return result
+
+    def save(self):
+        with self.lock:
+            if not self.path or not self.modified:
+                return
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path))
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.scans, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self.modified = False
+
+
+class SourceGraph(object):
+    '''
+    Dependency graph of a list of sources. Sources are designated by
+    their index in sources.
+    '''
+    def __init__(self, sources, scans=None):
+        self.sources = list(sources)
+        scans = scans if scans else ScanCache()
+        self.scans = [scans.get(src) for src in self.sources]
+        provider = {}
+        for i, s in enumerate(self.scans):
+            for name in s['declares']:
+                provider[name] = i
+
+        def providers(i, names):
+            # Names of other libraries or not in the sources are not dependencies
+            return sorted({provider[name] for name in names if name in provider} - {i})
+
+        self.deps = [providers(i, s['uses'] + s['entities'])
+                     for i, s in enumerate(self.scans)]
+        self.binds = [providers(i, s['components']) for i, s in enumerate(self.scans)]
+
+    def __len__(self):
+        return len(self.sources)
+
+    def requires(self, i):
+        ''' Sources analyzed before source i '''
+        return sorted(set(self.deps[i]) | set(self.binds[i]))
+
+    def topological(self, priority=None):
+        '''
+        Indexes of the sources in analysis order. Among the sources whose
+        requirements are analyzed, the first one of priority (by default
+        the order of sources) comes first.
+        '''
+        rank = {i: r for r, i in enumerate(priority if priority else range(len(self)))}
+        done, order = set(), []
+        while len(order) < len(self):
+            ready = [i for i in range(len(self))
+                     if i not in done and all(d in done for d in self.requires(i))]
+            if not ready:
+                raise ValueError('Circular dependency between {}'.format(
+                    ', '.join(self.sources[i] for i in range(len(self)) if i not in done)))
+            i = min(ready, key=rank.get)
+            done.add(i)
+            order.append(i)
+        return order
+
+    def levels(self):
+        '''
+        Sources grouped by level: the sources of a level only require
+        sources of the previous levels, so they can be analyzed in any
+        order, or concurrently into separate libraries.
+        '''
+        level = {}
+        for i in self.topological():
+            level[i] = 1 + max((level[d] for d in self.requires(i)), default=-1)
+        return [[i for i in range(len(self)) if level[i] == n]
+                for n in range(1 + max(level.values(), default=-1))]
+
+    def affected(self, changed):
+        ''' Sources to analyze again when the sources changed change '''
+        affected = set(changed)
+        for i in self.topological():
+            if any(d in affected for d in self.deps[i]):
+                affected.add(i)
+        return sorted(affected)
+
+    def misordered(self):
+        ''' (source, requirement) pairs where sources lists source first '''
+        return [(i, d) for i in range(len(self)) for d in self.requires(i) if d > i]
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('variants', nargs='*', help='Variants (default: all).')
+    parser.add_argument('--levels', action='store_true',
+                        help='Print the sources by analysis level.')
+    parser.add_argument('--check', action='store_true',
+                        help='Check that the sources of the TOML files are in analysis order.')
+    return parser
+
+def main(args=sys.argv[1:]):
+    from test_all import VARIANTS, Variant, check_variants
+
+    parser = get_parser()
+    args = parser.parse_args(args)
+    check_variants(parser, args.variants)
+    status = 0
+    for name in args.variants or VARIANTS:
+        variant = Variant(name)
+        graph = SourceGraph(variant.sources)
+        rel = [os.path.relpath(src, variant.root) for src in graph.sources]
+        if args.check:
+            misordered = graph.misordered()
+            print('{}: {}'.format(name, 'sources out of order' if misordered else 'ok'))
+            for i, d in misordered:
+                print('    {} is before {}'.format(rel[i], rel[d]))
+                status = 1
+            continue
+        print('{}:'.format(name))
+        if args.levels:
+            for n, level in enumerate(graph.levels()):
+                print('  {:2} {}'.format(n, ' '.join(rel[i] for i in level)))
+        else:
+            for i in graph.topological():
+                print('    {}'.format(rel[i]))
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,34 @@
-from pkg_resources import get_distribution, DistributionNotFound
-
-from . import cli
-
 __project__ = 'cryptotvgen'
 __author__ = 'Ekawat (Ice) Homsirikamol and William Diehl'
 __package__ = 'cryptotvgen'
 
-try:
-    __version__ = get_distribution(__project__).version
-except DistributionNotFound:
-    __version__ = '(N/A - Local package)'
+import sys
+
+
+def _get_version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        # Python < 3.8
+        from importlib_metadata import version, PackageNotFoundError
+    try:
+        return version(__project__)
+    except PackageNotFoundError:
+        return '(N/A - Local package)'
+
+def __getattr__(name):
+    # `cli` and `__version__` are resolved on first use, so that importing
+    # the package does not load the generator or the package metadata.
+    if name == 'cli':
+        import importlib
+        return importlib.import_module('.cli', __name__)
+    if name == '__version__':
+        global __version__
+        __version__ = _get_version()
+        return __version__
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ (PEP 562)
+    from . import cli
+    __version__ = _get_version()
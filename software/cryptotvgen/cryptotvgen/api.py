@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+'''
+In-memory API: test vectors as Python records, without output files.
+
+Example (cocotb-style driver):
+
+    from cryptotvgen.api import make_opts, iter_vectors
+    from cryptotvgen.generator import block_bytes
+    from cryptotvgen.sweep import make_sweep
+
+    opts = make_opts(['--lib_path', 'ascon_ref/lib', '--aead', 'ascon128v12',
+                      '--block_size', '64', '--block_size_ad', '64'], io=(32, 32))
+    routine = make_sweep('0:4', 'edges:2', 'enc,dec', 'new', block_bytes(opts))
+    for tv in iter_vectors(opts, routine):
+        for word in tv.pdi:
+            await drive_pdi(word)
+        for word in tv.sdi:
+            await drive_sdi(word)
+        for word in tv.do:
+            assert await read_do() == word
+
+A routine is a list (or Sweep) of [NEW_KEY, DECRYPT, AD_LEN, PT_LEN, HASH]
+rows as in --gen_custom. Each record carries the raw fields of the test
+vector (hex strings) and the PDI, SDI and DO words (ints of the port
+widths of --io) exactly as the testbench reads them from the KAT files.
+
+asyncio testbenches use aiter_vectors instead, which computes the test
+vectors in an executor while the event loop keeps running:
+
+    async for tv in aiter_vectors(opts, routine, prefetch=4):
+        ...
+'''
+
+import threading
+from collections import deque, namedtuple
+
+from .options import get_parser, finalize_options
+from .generator import iter_dataset
+
+Vector = namedtuple('Vector', [
+    'msg_id', 'key_id', 'new_key', 'decrypt', 'hashop',
+    'key', 'npub', 'nsec_pt', 'nsec_ct', 'ad', 'pt', 'ct', 'tag', 'hash_tag',
+    'pdi', 'sdi', 'do'])
+
+
+def make_opts(args=(), **options):
+    '''
+    Options as parsed by cryptotvgen from the command line args, with
+    the keyword arguments overriding single options, e.g.
+    make_opts(['--aead', 'ascon128v12'], io=(16, 16), max_block_per_sgmt=2)
+    '''
+    opts = get_parser().parse_args(list(args))
+    for name, value in options.items():
+        if not hasattr(opts, name):
+            raise TypeError('Unknown cryptotvgen option {!r}'.format(name))
+        setattr(opts, name, value)
+    finalize_options(opts)
+    if opts.candidates_dir and not opts.lib_path:
+        opts.lib_path = opts.candidates_dir / 'lib'
+    return opts
+
+def words(txt, width):
+    ''' Port words (ints of width bits) of the rendered KAT text of a file '''
+    digits = width//4
+    result = []
+    for line in txt.splitlines():
+        if not line or line[0] == '#':
+            continue
+        _, _, data = line.partition(' = ')
+        data = data.strip()
+        result.extend(int(data[i:i + digits], 16)
+                      for i in range(0, len(data), digits))
+    return result
+
+def vector_record(tv):
+    ''' Vector record of a TestVector. Requires compute(). '''
+    opts = tv.opts
+    pdi_width, sdi_width = opts.io
+    rendered = dict(tv.render())
+    return Vector(
+        msg_id=tv.msg_id, key_id=tv.key_id, new_key=bool(tv.new_key),
+        decrypt=bool(tv.decrypt), hashop=bool(tv.hashop),
+        key=tv.key, npub=tv.npub, nsec_pt=tv.nsec_pt, nsec_ct=tv.nsec_ct,
+        ad=tv.ad, pt=tv.pt, ct=tv.ct, tag=tv.tag, hash_tag=tv.hash_tag,
+        pdi=words(rendered[opts.pdi_file], pdi_width),
+        sdi=words(rendered.get(opts.sdi_file, ''), sdi_width),
+        do=words(rendered[opts.do_file], pdi_width))
+
+def iter_vectors(opts, routine, start_msg_no=1, start_key_no=1, mode=0):
+    '''
+    Yield a Vector per row of routine. Vectors are generated lazily, so
+    routines of any length can be consumed.
+    '''
+    for tv in iter_dataset(opts, routine, start_msg_no, start_key_no, mode):
+        tv.compute()
+        yield vector_record(tv)
+
+async def aiter_vectors(opts, routine, start_msg_no=1, start_key_no=1, mode=0,
+                        prefetch=1, executor=None):
+    '''
+    Asynchronous iter_vectors. Each Vector is generated in executor (by
+    default a thread of its own) and at most prefetch Vectors (at least
+    one) are generated ahead of the consumer, so a slow consumer (e.g. a
+    simulation) limits the generation and memory stays bounded.
+    '''
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    loop = asyncio.get_running_loop()
+    vectors = iter_vectors(opts, routine, start_msg_no, start_key_no, mode)
+    lock = threading.Lock()
+
+    def step():
+        # The generator is not thread safe if executor has several workers
+        with lock:
+            return next(vectors, None)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=1)
+    pending = deque()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max(prefetch, 1):
+                pending.append(loop.run_in_executor(executor, step))
+            tv = await pending.popleft()
+            if tv is None:
+                exhausted = True
+                break
+            yield tv
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+cryptotvgen-bench: throughput of cryptotvgen itself.
+
+Every workload is run at each I/O width and timed per pipeline stage:
+    dataset  - random inputs and TestVector objects (includes ffi.dlopen)
+    crypto   - reference implementation calls through the FFI
+    verify   - decryption check of --verify_lib (AEAD only)
+    render   - PDI/DO/SDI text
+    file_io  - appending the rendered text to the output files
+    cc_hls   - CryptoCore HLS text (AEAD only)
+The startup time of the cryptotvgen command (interpreter, imports and
+`cryptotvgen -h`) is measured in separate processes.
+Results are written as JSON so they can be compared across releases.
+All other arguments are passed to cryptotvgen (e.g. --lib_path).
+'''
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from .options import get_parser
+from .generator import lenbytes, gen_dataset, gen_random, gen_test_combined, \
+    blanket_message_aead_test, determine_params, append_files
+
+WORKLOADS = ('combined', 'blanket', 'random')
+STAGES = ('dataset', 'crypto', 'verify', 'render', 'file_io', 'cc_hls')
+
+# Commands timed by the startup benchmark, in fresh interpreters
+STARTUP_COMMANDS = (
+    ('python', ['-c', 'pass']),
+    ('import', ['-c', 'import cryptotvgen.cli']),
+    ('help', ['-m', 'cryptotvgen.cli', '-h']),
+)
+
+# Used unless given on the command line
+DEFAULT_ARGS = ['--aead', 'ascon128v12', '--hash', 'asconhashv12',
+                '--block_size', '64', '--block_size_ad', '64',
+                '--message_digest_size', '256']
+
+
+def workload_dataset(opts, workload, random_count):
+    ''' Dataset of a workload '''
+    if workload == 'combined':
+        opts.gen_test_combined = (1, 33, 0)
+        return gen_test_combined(opts, 1, 1)[0]
+    if workload == 'blanket':
+        return gen_dataset(opts, blanket_message_aead_test(opts), 1, 1)[0]
+    opts.gen_random = random_count
+    return gen_random(opts, 1, 1)[0]
+
+def payload_bytes(tv):
+    return lenbytes(tv.ad) + lenbytes(tv.pt)
+
+def run_stages(opts, workload, random_count, dest):
+    '''
+    Run all stages of a workload once.
+    Returns ({stage: seconds}, {stage: bytes}, vectors)
+    '''
+    seconds = {}
+    nbytes = {}
+
+    start = time.perf_counter()
+    dataset = workload_dataset(opts, workload, random_count)
+    seconds['dataset'] = time.perf_counter() - start
+    nbytes['dataset'] = sum(payload_bytes(tv) for tv in dataset)
+    aead = [tv for tv in dataset if not tv.hashop]
+
+    verify_lib, opts.verify_lib = opts.verify_lib, False
+    start = time.perf_counter()
+    for tv in dataset:
+        tv.compute()
+    seconds['crypto'] = time.perf_counter() - start
+    nbytes['crypto'] = nbytes['dataset']
+    opts.verify_lib = verify_lib
+
+    start = time.perf_counter()
+    for tv in aead:
+        tv.verify()
+    seconds['verify'] = time.perf_counter() - start
+    nbytes['verify'] = sum(payload_bytes(tv) for tv in aead)
+
+    start = time.perf_counter()
+    rendered = [tv.render() for tv in dataset]
+    seconds['render'] = time.perf_counter() - start
+    nbytes['render'] = sum(len(txt) for out in rendered for _, txt in out)
+
+    start = time.perf_counter()
+    for out in rendered:
+        append_files(dest, out)
+    seconds['file_io'] = time.perf_counter() - start
+    nbytes['file_io'] = nbytes['render']
+
+    start = time.perf_counter()
+    rendered = [tv.render_cc_hls() for tv in aead]
+    seconds['cc_hls'] = time.perf_counter() - start
+    nbytes['cc_hls'] = sum(len(txt) for out in rendered for _, txt in out)
+    return seconds, nbytes, len(dataset)
+
+def bench_workload(opts, workload, io, args, dest):
+    ''' Best of args.repeat runs of a workload at one I/O width '''
+    opts.io = io
+    best = {}
+    for _ in range(args.repeat):
+        random.seed(args.seed)
+        for name in os.listdir(dest):
+            os.remove(os.path.join(dest, name))
+        seconds, nbytes, vectors = run_stages(opts, workload, args.random_count, dest)
+        for stage, t in seconds.items():
+            best[stage] = min(best.get(stage, t), t)
+    stages = {}
+    for stage in STAGES:
+        t = best[stage]
+        stages[stage] = {
+            'seconds': t,
+            'bytes': nbytes[stage],
+            'vectors_per_s': vectors/t if t > 0 else None,
+            'mb_per_s': nbytes[stage]/t/1e6 if t > 0 else None,
+        }
+    return {'workload': workload, 'io': list(io), 'vectors': vectors,
+            'stages': stages}
+
+def bench_startup(runs):
+    ''' Wall time of each STARTUP_COMMANDS entry over runs processes '''
+    startup = {}
+    for name, cmd in STARTUP_COMMANDS:
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + cmd, check=True,
+                           stdout=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+        startup[name] = {'min': min(times), 'median': statistics.median(times)}
+    return startup
+
+def print_startup(startup, f=sys.stdout):
+    f.write('{:10} {:>10} {:>11}\n'.format('Startup', 'Min [ms]', 'Median [ms]'))
+    for name, t in startup.items():
+        f.write('{:10} {:>10.1f} {:>11.1f}\n'.format(name, 1e3*t['min'], 1e3*t['median']))
+
+def print_table(results, f=sys.stdout):
+    f.write('{:10} {:>8} {:>8} {:8} {:>10} {:>12} {:>9}\n'.format(
+        'Workload', 'io', 'Vectors', 'Stage', 'Time [s]', 'Vectors/s', 'MB/s'))
+    for r in results:
+        for stage in STAGES:
+            s = r['stages'][stage]
+            f.write('{:10} {:>8} {:>8} {:8} {:>10.4f} {:>12} {:>9}\n'.format(
+                r['workload'], '{},{}'.format(*r['io']), r['vectors'], stage,
+                s['seconds'],
+                '{:.0f}'.format(s['vectors_per_s']) if s['vectors_per_s'] else '-',
+                '{:.2f}'.format(s['mb_per_s']) if s['mb_per_s'] else '-'))
+
+def get_bench_parser():
+    parser = argparse.ArgumentParser(
+        prog='cryptotvgen-bench', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent('''\
+            Example:
+                cryptotvgen-bench --lib_path ../ascon_ref/lib --output bench.json
+            '''))
+    parser.add_argument('--workloads', nargs='*', choices=WORKLOADS,
+                        default=list(WORKLOADS), help='Workloads to run.')
+    parser.add_argument('--io_widths', nargs='+', type=int, default=[8, 16, 32],
+                        metavar='W', help='PDI/SDI widths to run (SW = W).')
+    parser.add_argument('--random_count', type=int, default=1000, metavar='N',
+                        help='Number of test vectors of the random workload.')
+    parser.add_argument('--repeat', type=int, default=3, metavar='N',
+                        help='Runs per measurement, the fastest one is reported.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed of every run.')
+    parser.add_argument('--startup', type=int, default=20, metavar='N',
+                        help='Number of processes per startup measurement '
+                             '(0 to skip).')
+    parser.add_argument('--output', metavar='FILE',
+                        help='Write the JSON report to FILE and print a table. '
+                             'Default: JSON on stdout.')
+    return parser
+
+def run_bench(args=sys.argv[1:]):
+    bench_args, tvgen_args = get_bench_parser().parse_known_args(args)
+    dest = tempfile.mkdtemp(prefix='cryptotvgen-bench-')
+    try:
+        opts = get_parser().parse_args(DEFAULT_ARGS + tvgen_args + ['--dest', dest])
+        if opts.candidates_dir and not opts.lib_path:
+            opts.lib_path = os.path.join(opts.candidates_dir, 'lib')
+        determine_params(opts)
+        opts.msg_format = list(opts.msg_format)
+        results = []
+        for workload in bench_args.workloads:
+            for width in bench_args.io_widths:
+                results.append(bench_workload(opts, workload, (width, width),
+                                              bench_args, dest))
+    finally:
+        shutil.rmtree(dest, ignore_errors=True)
+    startup = bench_startup(bench_args.startup) if bench_args.startup > 0 else None
+
+    from . import __version__
+    report = {
+        'cryptotvgen': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'aead': opts.aead,
+        'hash': opts.hash,
+        'repeat': bench_args.repeat,
+        'seed': bench_args.seed,
+        'startup': startup,
+        'results': results,
+    }
+    if bench_args.output:
+        with open(bench_args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        if startup:
+            print_startup(startup)
+        print_table(results)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(run_bench(sys.argv[1:]))
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from .generator import gen_dataset, gen_hash, gen_random, gen_single, gen_test_combined, \
-         gen_test_routine, print_header, gen_benckmark_routine, gen_tv_and_write_files
-from .options import get_parser
-from .prepare_libs import prepare_libs
+# Only the option parser is imported at startup: the generator (cffi) and
+# prepare_libs (requests, tarfile, urllib) are imported by the run modes
+# needing them, so `cryptotvgen -h` and option errors stay fast.
+from .options import get_parser, finalize_options
+from .log import configure_logging
+import itertools
 import textwrap
 import os
 import sys
@@ -19,8 +21,18 @@ def run_cryptotvgen(args=sys.argv[1:]):
     # Parse options
     parser = get_parser()
     opts = parser.parse_args(args)
-    
+    if opts.server:
+        from .server import request
+        return request(opts.server, args, opts.dest, opts.in_band)
+    return run(opts, parser)
+
+def run(opts, parser):
+    ''' Run parsed options, also used by the workers of --serve '''
+    if opts.serve:
+        from .server import serve
+        return serve(opts)
     if opts.prepare_libs:
+        from .prepare_libs import prepare_libs
         prepare_libs(sc_version=opts.supercop_version, libs=opts.prepare_libs,
                      candidates_dir=opts.candidates_dir, lib_path=opts.lib_path)
         return 0
@@ -30,19 +42,17 @@ def run_cryptotvgen(args=sys.argv[1:]):
         error_txt = textwrap.dedent('''
 
                     Please specify at least one of the run modes:
-                        --prepare_libs, --gen_test_routine, --gen_random, --gen_custom, or --gen_single.
+                        --prepare_libs, --gen_test_routine, --gen_random, --gen_custom, --gen_single,
+                        --gen_coverage, --gen_sweep, or --serve.
 
                     ''')
         sys.exit(error_txt)
         
     # Additional error checking
-    opts.msg_format = list(opts.msg_format)
-    if (opts.offline):
-        opts.msg_format = ['len'] + opts.msg_format
-    if (opts.ciph_exp_noext and not opts.ciph_exp):
-        parser.error('Option --ciph_ext_noext requires --ciph_exp')
-    if (opts.add_partial and not opts.ciph_exp):
-        parser.error('Option --add_partial requires --ciph_exp')
+    try:
+        finalize_options(opts)
+    except ValueError as e:
+        parser.error(str(e))
 
     if not os.path.exists(opts.dest):
         try:
@@ -51,6 +61,27 @@ def run_cryptotvgen(args=sys.argv[1:]):
             if e.errno != errno.EEXIST:
                 raise
 
+    configure_logging(opts.log_level, opts.log_file)
+    if opts.profile:
+        from .generator import log
+        from .profiling import PROFILER, PROFILE_FILE
+        # Also time the logging calls of the generator
+        PROFILER.wrap(log, 'info', 'logging')
+        PROFILER.enable(cprofile=isinstance(opts.profile, str))
+        try:
+            return generate(opts)
+        finally:
+            total = PROFILER.disable()
+            PROFILER.write(opts.dest, total,
+                           opts.profile if isinstance(opts.profile, str) else None)
+            print('Profile written to {}'.format(os.path.join(opts.dest, PROFILE_FILE)))
+    return generate(opts)
+
+def generate(opts):
+    from .generator import gen_dataset, gen_hash, gen_random, gen_single, \
+        gen_test_combined, gen_test_routine, gen_benckmark_routine, \
+        gen_tv_and_write_files, gen_coverage, gen_sweep
+
     # Generate Input Test Vectors
     dataset = []
     msg_no = 1
@@ -77,12 +108,16 @@ def run_cryptotvgen(args=sys.argv[1:]):
         elif routine == 6:
             gen_benckmark_routine(opts)
             return 0
+        elif routine == 7:   # Control-path coverage
+            data = gen_coverage(opts, msg_no, key_no)
+        elif routine == 8:   # Size sweep (generated lazily)
+            data = gen_sweep(opts, msg_no, key_no)
 
-        dataset += data[0]
+        dataset.append(data[0])
         msg_no = data[1]+1
         key_no = data[2]+1
 
-    gen_tv_and_write_files(opts, dataset)
+    gen_tv_and_write_files(opts, itertools.chain.from_iterable(dataset), msg_no-1)
     print("Done! Please visit destination folder\n\t"
           "{}\n"
           "for generated files (pdi.txt, sdi.txt, and do.txt)".format(os.path.abspath(opts.dest)))
@@ -90,5 +125,5 @@ def run_cryptotvgen(args=sys.argv[1:]):
 
 if __name__ == '__main__':
     import sys
-    run_cryptotvgen(sys.argv[1:])
+    sys.exit(run_cryptotvgen(sys.argv[1:]))
 
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+'''
+Control-path coverage model.
+
+The classes follow the notation of `hardware/ascon_lwc/docs/cycles_*.py`:
+    Na, Nm : number of complete blocks of AD and message
+    Ina, Inm : 1 if the last block of AD and message is incomplete
+    Bla, Blm : number of bytes in the incomplete block
+Bla/Blm are further split on whether they end on an I/O word boundary, since
+the CryptoCore handles a partially valid last word separately.
+'''
+
+from itertools import product
+
+COVERAGE_FILE = 'coverage.txt'
+
+# Number of complete blocks: none, one, or more than one (loop taken)
+N_BINS = ('0', '1', '2+')
+# Last block: complete, incomplete ending on a word, incomplete mid-word
+TAIL_BINS = ('full', 'word', 'part')
+
+AEAD_OPS = ('enc', 'dec')
+KEY_POLICIES = ('new', 'reuse')
+
+# Cover groups, each one is a cross of the listed dimensions
+AEAD_GROUPS = (('op', 'key', 'ad'), ('op', 'key', 'msg'), ('op', 'ad', 'msg'))
+HASH_GROUPS = (('op', 'msg'), )
+
+
+def size_class(size, block_bytes, word_bytes):
+    ''' Get the (N, tail) class of a data size '''
+    n, bl = divmod(size, block_bytes)
+    nbin = N_BINS[min(n, 2)]
+    if bl == 0:
+        tail = 'full'
+    elif bl % word_bytes == 0:
+        tail = 'word'
+    else:
+        tail = 'part'
+    return (nbin, tail)
+
+def class_name(cls, prefix):
+    ''' Human readable name of a size class, e.g. Na=1,Ina=1(part) '''
+    nbin, tail = cls
+    if tail == 'full':
+        return 'N{p}={n},In{p}=0'.format(p=prefix, n=nbin)
+    return 'N{p}={n},In{p}=1({t})'.format(p=prefix, n=nbin, t=tail)
+
+def class_sizes(block_bytes, word_bytes):
+    '''
+    Reachable size classes together with the smallest size representing
+    each of them
+    '''
+    sizes = {}
+    for size in range(3*block_bytes):
+        sizes.setdefault(size_class(size, block_bytes, word_bytes), size)
+    return sizes
+
+
+class CoverageModel(object):
+    ''' Coverage points of the AEAD and hash control paths '''
+
+    def __init__(self, opts):
+        bsa = opts.block_size_ad if opts.block_size_ad != None else opts.block_size
+        bsh = opts.block_size_msg_digest if opts.block_size_msg_digest else opts.block_size
+        self.io = tuple(opts.io)
+        self.word_bytes = self.io[0]//8
+        self.ad_bytes = bsa//8
+        self.msg_bytes = opts.block_size//8
+        self.hash_bytes = bsh//8
+        self.aead = bool(opts.aead)
+        self.hash = bool(opts.hash)
+
+        self.ad_sizes = class_sizes(self.ad_bytes, self.word_bytes)
+        self.msg_sizes = class_sizes(self.msg_bytes, self.word_bytes)
+        self.hash_sizes = class_sizes(self.hash_bytes, self.word_bytes)
+
+        self.points = set()
+        if self.aead:
+            dims = {'op': AEAD_OPS, 'key': KEY_POLICIES,
+                    'ad': self.ad_sizes, 'msg': self.msg_sizes}
+            for group in AEAD_GROUPS:
+                for values in product(*[dims[d] for d in group]):
+                    self.points.add((group, values))
+        if self.hash:
+            dims = {'op': ('hash', ), 'msg': self.hash_sizes}
+            for group in HASH_GROUPS:
+                for values in product(*[dims[d] for d in group]):
+                    self.points.add((group, values))
+
+    def vector_points(self, tv):
+        '''
+        Coverage points hit by a routine entry
+        [NEW_KEY, DECRYPT, AD_LEN, PT_LEN, HASH]
+        '''
+        new_key, decrypt, ad_len, msg_len, hashop = tv
+        if hashop:
+            dims = {'op': 'hash',
+                    'msg': size_class(msg_len, self.hash_bytes, self.word_bytes)}
+            groups = HASH_GROUPS
+        else:
+            dims = {'op': 'dec' if decrypt else 'enc',
+                    'key': 'new' if new_key else 'reuse',
+                    'ad': size_class(ad_len, self.ad_bytes, self.word_bytes),
+                    'msg': size_class(msg_len, self.msg_bytes, self.word_bytes)}
+            groups = AEAD_GROUPS
+        return set((group, tuple(dims[d] for d in group)) for group in groups)
+
+    def candidates(self):
+        ''' One routine entry per reachable combination of classes '''
+        routine = []
+        if self.aead:
+            for op, key, ad, msg in product(AEAD_OPS, KEY_POLICIES,
+                                            sorted(self.ad_sizes.values()),
+                                            sorted(self.msg_sizes.values())):
+                routine.append([key == 'new', op == 'dec', ad, msg, False])
+        if self.hash:
+            for msg in sorted(self.hash_sizes.values()):
+                routine.append([False, False, 0, msg, True])
+        return routine
+
+    def select(self, candidates=None, cost=None, budget=None):
+        '''
+        Greedily pick routine entries until every coverage point is hit.
+        Returns the selected entries in order and the points each one added.
+
+        With a budget, cost (a function of a list of entries returning their
+        cycles) is used to pick the entries adding the most points per cycle
+        among those that fit in the remaining budget, until none fits. The
+        cheapest new-key AEAD entry is picked first, as the key-reuse entries
+        need a key loaded before them. Raises ValueError if no entry fits,
+        or if the AEAD entries have no new-key one.
+        '''
+        if candidates is None:
+            candidates = self.candidates()
+        uncovered = set(self.points)
+        selected = []
+        hits = [self.vector_points(tv) for tv in candidates]
+        if budget is not None:
+            cycles = cost(candidates)
+            remaining = budget
+            new_key = [i for i, tv in enumerate(candidates) if tv[0] and not tv[4]]
+            first = min(new_key, key=lambda i: (cycles[i], i)) if new_key else None
+            if first is not None and cycles[first] <= remaining:
+                remaining -= cycles[first]
+                selected.append(candidates[first])
+                uncovered -= hits[first]
+            keyed = bool(selected)
+
+            def rank(i):
+                if cycles[i] > remaining or not (keyed or candidates[i][0] or candidates[i][4]):
+                    return (-1, -i)
+                return (len(hits[i] & uncovered)/max(cycles[i], 1), -i)
+        else:
+            def rank(i):
+                return (len(hits[i] & uncovered),
+                        -(candidates[i][2] + candidates[i][3]),
+                        -i)
+        while uncovered:
+            best = max(range(len(candidates)), key=rank)
+            new = hits[best] & uncovered
+            if not new or rank(best)[0] < 0:
+                break
+            if budget is not None:
+                remaining -= cycles[best]
+            selected.append(candidates[best])
+            uncovered -= new
+        if budget is not None and not selected and self.points:
+            usable = [cycles[i] for i, tv in enumerate(candidates) if tv[0] or tv[4]]
+            raise ValueError('A cycle budget of {} fits no test vector, at least {} '
+                             'cycles are needed'.format(budget, min(usable or cycles)))
+
+        # The first vector of a dataset always loads a new key, so start with a
+        # new-key entry to keep the reuse points honest. Hash entries go last
+        # as a reused key must come from a preceding AEAD entry.
+        aead = [tv for tv in selected if not tv[4]]
+        if aead:
+            first_new = next((i for i, tv in enumerate(aead) if tv[0]), None)
+            if first_new is None:
+                raise ValueError('No new-key AEAD entry to load the key of the '
+                                 'key-reuse entries')
+            aead.insert(0, aead.pop(first_new))
+        # Points added by each entry in the emitted order
+        covered = set()
+        ordered = []
+        for tv in aead + [tv for tv in selected if tv[4]]:
+            new = (self.vector_points(tv) & self.points) - covered
+            covered |= new
+            ordered.append((tv, new))
+        return ordered
+
+    def report(self, selected, cycles=None, budget=None):
+        '''
+        Coverage report as text, with the expected simulated cycles of the
+        selected entries if given
+        '''
+        covered = set()
+        for _, new in selected:
+            covered |= new
+        txt  = '#'*79 + '\n'
+        txt += '# Control-path coverage\n'
+        txt += '#'*79 + '\n'
+        txt += '# io (W,SW)              - {}\n'.format(list(self.io))
+        txt += '# AD block (bytes)       - {}\n'.format(self.ad_bytes)
+        txt += '# Msg block (bytes)      - {}\n'.format(self.msg_bytes)
+        if self.hash:
+            txt += '# Hash block (bytes)     - {}\n'.format(self.hash_bytes)
+        txt += '# Vectors                - {}\n'.format(len(selected))
+        txt += '# Coverage               - {}/{} points\n'.format(
+            len(covered & self.points), len(self.points))
+        if cycles is not None:
+            txt += '# Predicted cycles       - {}\n'.format(sum(cycles))
+        if budget is not None:
+            txt += '# Cycle budget           - {}\n'.format(budget)
+        txt += '\n'
+
+        groups = [g for g in AEAD_GROUPS if self.aead] + \
+                 [g for g in HASH_GROUPS if self.hash]
+        for group in groups:
+            total = [p for p in self.points if p[0] == group]
+            hit = [p for p in total if p in covered]
+            txt += '{:22} : {:4}/{:4}\n'.format(' x '.join(group), len(hit), len(total))
+        txt += '\n'
+
+        for i, (tv, new) in enumerate(selected):
+            if tv[4]:
+                desc = 'hash     Hash Size = {: 4}'.format(tv[3])
+                cls = class_name(size_class(tv[3], self.hash_bytes, self.word_bytes), 'h')
+            else:
+                desc = '{} {:5} Ad Size = {: 4}, {} Size = {: 4}'.format(
+                    'dec' if tv[1] else 'enc', 'new' if tv[0] else 'reuse',
+                    tv[2], 'Ct' if tv[1] else 'Pt', tv[3])
+                cls = '{} {}'.format(
+                    class_name(size_class(tv[2], self.ad_bytes, self.word_bytes), 'a'),
+                    class_name(size_class(tv[3], self.msg_bytes, self.word_bytes), 'm'))
+            txt += '#{: 4} {} | {} | +{}'.format(i+1, desc, cls, len(new))
+            if cycles is not None:
+                txt += ' | {} cycles'.format(cycles[i])
+            txt += '\n'
+        return txt
@@ -7,24 +7,40 @@
 
 import binascii
 import cffi
+import copy
+import io
+import itertools
+import json
+import logging
 import math
+import multiprocessing
 import os
 import random
 import math
+import shutil
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from pkg_resources import get_distribution, DistributionNotFound
 from enum import Enum
 
-from .options import routines
-from .log import setup_logger
+from .options import routines, get_parser
+from .log import setup_logger, configure_logging
 from .prepare_libs import ctgen_get_supercop_dir
+from .coverage import CoverageModel, COVERAGE_FILE
+from .sweep import Sweep, make_sweep
+from .profiling import timed
+from .progress import Progress, new_progress, worker_init
+from .output import OutputFiles, make_fifos
+from .timing import ExpectedTiming, SimulationCost, load_cycle_model
+from .suite import load_suite, apply_suite_options, suite_jobs, is_cached, write_stamp
 
 
 __all__ = ['gen_random', 'gen_dataset', 'gen_test_routine',
-           'gen_single', 'print_header', 'gen_hash', 'gen_test_combined']
+           'gen_single', 'print_header', 'gen_hash', 'gen_test_combined',
+           'gen_coverage', 'gen_sweep', 'iter_dataset']
 
-from .__init__ import __version__
+from . import __version__
 
 
 ffi = cffi.FFI()
@@ -48,21 +64,23 @@ ffi.cdef('''
     int crypto_hash(unsigned char *out, const unsigned char *in, unsigned long long hlen);
     ''')
 
-log = setup_logger('cryptotvgen.log')
+log = setup_logger()
 
 HUMAN_READABLE_FILE = 'test_vectors.txt'
+HEADER_IGNORE_OPTS = {
+    'lib_path', 'lib_file', 'dest', 'pdi_file', 'sdi_file', 'do_file', 'candidates_dir', 'supercop_version',
+    'verify_lib', 'routines', 'verbose', 'mode', 'human_readable', 'jobs', 'profile',
+    'no_progress', 'log_level', 'log_file', 'serve', 'server', 'in_band', 'mkfifo', 'shards',
+    'cycle_model', 'cycle_budget', 'tb_stalls', 'tb_random_stall'} | set(routines)
+SHARD_MANIFEST = 'shards.json'
 HLS_CC_DI_FILE = 'cc_di.txt'
 HLS_CC_DO_FILE = 'cc_do.txt'
 
-def print_header(opts):
+def print_header(opts, out=None):
     '''
-    Print header file
+    Print header file, to the OutputFiles out if given
     '''
-    ignore_opts = {
-        'lib_path', 'lib_file', 'dest', 'pdi_file', 'sdi_file', 'do_file', 'candidates_dir', 'supercop_version',
-        'verify_lib', 'routines', 'verbose', 'mode', 'human_readable'} | set(routines)
-
-    sorted_vars = [ x for x in sorted(vars(opts)) if x not in ignore_opts ]
+    sorted_vars = [ x for x in sorted(vars(opts)) if x not in HEADER_IGNORE_OPTS ]
 
     txt = "# This file was auto-generated by cryptotvgen v{}\n" \
         .format(__version__)
@@ -81,22 +99,20 @@ def print_header(opts):
     txt += '#'*79 + '\n\n'
 
 
+    output = []
     for file_name in [opts.pdi_file, opts.sdi_file, opts.do_file]:
-        file_path = os.path.join(opts.dest,file_name)
-        with open(file_path, 'w', newline='') as f:
-            f.write('#'*79 + '\n')
-            f.write('# {}\n'.format(file_name))
-            f.write(txt)
+        output.append((file_name, '#'*79 + '\n' + '# {}\n'.format(file_name) + txt))
 
     if opts.cc_hls:
-        file_path = os.path.join(opts.dest,HLS_CC_DI_FILE)
-        with open(file_path, 'w', newline='') as f:
-            f.write('#DATA_FORMAT Data,Size,Type,Eoi,Eot,Partial\n')
-            f.write('#BEGIN\n\n')
-        file_path = os.path.join(opts.dest,HLS_CC_DO_FILE)
-        with open(file_path, 'w', newline='') as f:
-            f.write('#DATA_FORMAT Data,Size\n')
-            f.write('#BEGIN\n\n')
+        output.append((HLS_CC_DI_FILE,
+                       '#DATA_FORMAT Data,Size,Type,Eoi,Eot,Partial\n#BEGIN\n\n'))
+        output.append((HLS_CC_DO_FILE, '#DATA_FORMAT Data,Size\n#BEGIN\n\n'))
+
+    if out:
+        out.write(output)
+    else:
+        with OutputFiles(opts.dest) as out:
+            out.write(output)
 
     if opts.human_readable:
         file_path = os.path.join(opts.dest,HUMAN_READABLE_FILE)
@@ -313,6 +329,7 @@ def sgmt_hdr(f):
         return 'HDR = {}\n{}'.format(hexstr, f(*args, **kwargs))
     return wrapper
 
+@timed('build_sgmt')
 @sgmt_info
 @sgmt_hdr
 def build_sgmt(data, sgt, ofile, opts, io_info, flags):
@@ -346,6 +363,33 @@ def build_status(iowidth):
     txt += 'STT = {}\n'.format(hexstr)
     return txt
 
+# {path: (modification time, library)}, a rebuilt library is reloaded
+_libs = {}
+
+@timed('dlopen')
+def dlopen(cffi_path):
+    mtime = os.stat(cffi_path).st_mtime_ns
+    loaded = _libs.get(cffi_path)
+    if loaded and loaded[0] == mtime:
+        return loaded[1]
+    if loaded:
+        ffi.dlclose(loaded[1])
+    lib = ffi.dlopen(cffi_path)
+    _libs[cffi_path] = (mtime, lib)
+    return lib
+
+@timed('file_io')
+def append_files(dest, output):
+    '''
+    Append rendered [(file name, text), ...] to the files in dest.
+    Returns the number of characters written.
+    '''
+    nbytes = 0
+    for file_name, txt in output:
+        with open(os.path.join(dest, file_name), 'a', newline='') as f:
+            nbytes += f.write(txt)
+    return nbytes
+
 def get_cffi_path(opts, hashop):
     if opts.lib_path:
         lib_path = Path(opts.lib_path)
@@ -380,7 +424,7 @@ class TestVector(object):
 
         self.hashop = hashop
         cffi_path = get_cffi_path(opts, hashop)
-        self.lib = ffi.dlopen(cffi_path)
+        self.lib = dlopen(cffi_path)
 
         self.key_id = 0 if hashop else key_id
         self.opts = opts
@@ -402,6 +446,7 @@ class TestVector(object):
         self.hash_tag = ''
         self.hash_tag_size = self.opts.message_digest_size/8
 
+    @timed('aead_encrypt')
     def aead_encrypt(self):
         ''' Compute aead algorithm '''
         pt_len  = lenbytes(self.pt)
@@ -440,6 +485,7 @@ class TestVector(object):
 
         return (nsec_ct, ct, tag, int(partial))
 
+    @timed('crypto_hash')
     def crypto_hash(self):
         ''' Compute aead algorithm '''
         pt_len  = lenbytes(self.pt)
@@ -464,6 +510,7 @@ class TestVector(object):
         ct  = output[0:ct_len]
         return (ct)
 
+    @timed('aead_decrypt')
     def aead_decrypt(self):
         ''' Compute aead algorithm '''
         ns_len = int(self.opts.nsec_size/8)
@@ -541,44 +588,58 @@ class TestVector(object):
                 return False
         return True
 
-    def gen_tv(self):
-        ''' Generate test vector files based on provided options '''
+    def compute(self):
+        ''' Run the reference implementation (and verify it if requested) '''
         if self.hashop:
             self.hash_tag = self.crypto_hash()
             self.partial = int(self.partial)
 
-            log.info("== Hash")
-            log.info("Msg = {}".format(self.pt))
-            log.info("Md = {}".format(self.hash_tag))
+            if log.isEnabledFor(logging.INFO):
+                log.info("== Hash")
+                log.info("Msg = %s", self.pt)
+                log.info("Md = %s", self.hash_tag)
         else:
             (self.nsec_ct, self.ct, self.tag, self.partial) = self.aead_encrypt()
             self.partial = int(self.partial)
             # Check for mismatching decrypted values and tag
-            log.info("== AEAD Encrypt")
-            log.info("Key = {}".format(self.key))
-            log.info("Nonce = {}".format(self.npub))
-            log.info("PT = {}".format(self.pt))
-            log.info("AD = {}".format(self.ad))
-            log.info("CT = {}{}".format(self.ct, self.tag))
+            if log.isEnabledFor(logging.INFO):
+                log.info("== AEAD Encrypt")
+                log.info("Key = %s", self.key)
+                log.info("Nonce = %s", self.npub)
+                log.info("PT = %s", self.pt)
+                log.info("AD = %s", self.ad)
+                log.info("CT = %s%s", self.ct, self.tag)
 
             if (self.opts.verify_lib):
-                if (self.opts.verbose):
-                    print(" ====================== ")
-                    print(" == Decryption Check == ")
-                    print(" ====================== ")
-                (auth_result, nsec_pt, pt) = self.aead_decrypt()
-                log.info("== AEAD Decrypt")
-                log.info("Auth result = {}".format(auth_result))
-                log.info("Key = {}".format(self.key))
-                log.info("Nonce = {}".format(self.npub))
-                log.info("PT = {}".format(pt))
-                log.info("AD = {}".format(self.ad))
-                log.info("CT = {}{}".format(self.ct, self.tag))
-
-                assert nsec_pt == self.nsec_pt
-                assert pt == self.pt
-                assert auth_result == 0
-
+                self.verify()
+
+    def verify(self):
+        ''' Decrypt the computed ciphertext and check it against the inputs '''
+        if (self.opts.verbose):
+            print(" ====================== ")
+            print(" == Decryption Check == ")
+            print(" ====================== ")
+        (auth_result, nsec_pt, pt) = self.aead_decrypt()
+        if log.isEnabledFor(logging.INFO):
+            log.info("== AEAD Decrypt")
+            log.info("Auth result = %s", auth_result)
+            log.info("Key = %s", self.key)
+            log.info("Nonce = %s", self.npub)
+            log.info("PT = %s", pt)
+            log.info("AD = %s", self.ad)
+            log.info("CT = %s%s", self.ct, self.tag)
+
+        assert nsec_pt == self.nsec_pt
+        assert pt == self.pt
+        assert auth_result == 0
+
+    @timed('render')
+    def render(self):
+        '''
+        Render the test vector as a list of (file name, text) for the PDI,
+        DO and (if a new key is loaded) SDI files. Requires compute().
+        '''
+        output = []
         (iow, iosw)  = self.opts.io
         io_info = (iow, self.opts.max_io_per_line)
 
@@ -587,9 +648,7 @@ class TestVector(object):
         # PDI and DO file
         for ofile, file_name in enumerate([self.opts.pdi_file,
                                            self.opts.do_file]):
-            # Open file
-            file_path = os.path.join(self.opts.dest, file_name)
-            f = open(file_path, 'a', newline='')
+            parts = []
 
             # Write Header
             txt = get_test_vector_info(self.msg_id,
@@ -600,14 +659,14 @@ class TestVector(object):
                                        self.decrypt,
                                        self.hashop,
                                        int(self.hash_tag_size))
-            f.write('{}'.format(txt))
+            parts.append(txt)
 
             if (not ofile):
                 # Write New key
                 if self.new_key:
                     txt = build_instr(iow, Opcode.actkey,
                                       self.msg_id, self.key_id)
-                    f.write('{}'.format(txt))
+                    parts.append(txt)
 
             # Instruction
             if self.hashop:
@@ -620,7 +679,7 @@ class TestVector(object):
             #opcode = Opcode.decrypt if self.decrypt else Opcode.encrypt
             txt = build_instr(iow, opcode, self.msg_id, self.key_id, ofile)
 
-            f.write('{}'.format(txt))
+            parts.append(txt)
 
             # Write Segment
             msg_format = get_msg_format(self.opts.msg_format,
@@ -705,29 +764,27 @@ class TestVector(object):
                     txt += build_sgmt(d, sgt, ofile,
                                       self.opts, io_info, flags)
 
-                    f.write('{}'.format(txt))
+                    parts.append(txt)
 
             if (ofile):
                 # Write success
                 txt = build_status(iow)
-                f.write('{}'.format(txt))
+                parts.append(txt)
 
-            f.write('\n')
-            f.close()
+            parts.append('\n')
+            output.append((file_name, ''.join(parts)))
 
 
         # ==========
         # SDI file
         # ==========
         if (not self.new_key):
-            return
+            return output
 
         io_info = (iosw, self.opts.max_io_per_line)
         flags = (0, 1, 1, 1)
         sgt = 'key'
 
-        file_path = os.path.join(self.opts.dest, self.opts.sdi_file)
-        f = open(file_path, 'a', newline='')
         # Instruction
         txt  = '#### MsgID={: 3}, KeyID={: 3}\n'.format(self.msg_id,
                                                         self.key_id)
@@ -736,8 +793,18 @@ class TestVector(object):
         data = self.get_data(sgt)
         txt += build_sgmt(data, sgt, 0,
                           self.opts, io_info, flags)
-        f.write('{}\n'.format(txt))
-        f.close()
+        output.append((self.opts.sdi_file, '{}\n'.format(txt)))
+        return output
+
+    def gen_tv(self, out=None):
+        '''
+        Generate test vector files based on provided options, written to
+        the OutputFiles out if given
+        '''
+        self.compute()
+        if out:
+            return out.write(self.render())
+        return append_files(self.opts.dest, self.render())
 
 
     def cc_pad(self, data, padmode, sgttype):
@@ -835,14 +902,16 @@ class TestVector(object):
             return
 
 
-    def gen_cc_hls(self):
-        if not self.opts.cc_hls:
-            return
+    @timed('render_cc_hls')
+    def render_cc_hls(self):
+        '''
+        Render the CryptoCore HLS test vector as a list of (file name, text)
+        for the DI and DO files. Requires compute().
+        '''
         # ==========
         # DI file
         # ==========
-        file_path = os.path.join(self.opts.dest, HLS_CC_DI_FILE)
-        f = open(file_path, 'a', newline='')
+        f = io.StringIO()
         decrypt = 1 if self.decrypt else 0
         new_key = 1 if self.new_key else 0
         f.write('#NEW\n\tMessage Number #{}\n{}\n'.format(self.msg_id, decrypt))
@@ -857,22 +926,30 @@ class TestVector(object):
             self.wr_cc_hls_segment(f, data, eoi, sgt)
 
         f.write("#END\n\n")
-        f.close()
+        output = [(HLS_CC_DI_FILE, f.getvalue())]
 
         # ==========
         # DO file
         # ==========
-        file_path = os.path.join(self.opts.dest, HLS_CC_DO_FILE)
-        f = open(file_path, 'a', newline='')
+        f = io.StringIO()
         f.write('#NEW\n\tMessage Number #{}\n'.format(self.msg_id))
         msg_format = get_msg_format(self.opts.msg_format,1,self.decrypt, self.hashop)
         for i, sgt in enumerate(msg_format):
             data = self.get_data(sgt)
             self.wr_cc_hls_segment(f, data, eoi, sgt, True)
         f.write("#END\n\n")
-        f.close()
+        output.append((HLS_CC_DO_FILE, f.getvalue()))
+        return output
+
+    def gen_cc_hls(self, out=None):
+        if not self.opts.cc_hls:
+            return 0
+        if out:
+            return out.write(self.render_cc_hls())
+        return append_files(self.opts.dest, self.render_cc_hls())
 
 
+    @timed('human_readable')
     def gen_nist_tv(self):
         if not self.opts.human_readable:
             return
@@ -901,6 +978,7 @@ class TestVector(object):
 # ======================
 # Construct a data set
 # ======================
+@timed('gen_data')
 def gen_data(bytes: int, mode=0, init='06') -> str:
     """ Generate random data """
     if (bytes == 0):
@@ -913,27 +991,24 @@ def gen_data(bytes: int, mode=0, init='06') -> str:
             data = ''.join('{0:02X}'.format((j+init)%256) for j in range(bytes))
             return data
 
-def gen_dataset(opts, routine, start_msg_no, start_key_no, mode=0):
+def iter_dataset(opts, routine, start_msg_no, start_key_no, mode=0):
     '''
-    Generate random dataset based on the specified routine with the following
-    format: [[NEW_KEY(Boolean), Encryption/Decryption(Boolean,
-              AD_SIZE, DATA_SIZE],
-              ...,
-            ]
+    Lazily generate the dataset of a routine (see gen_dataset). Only the
+    previous test vector is kept, so routines of any length (e.g. a Sweep)
+    can be streamed to the output files.
     '''
-    dataset = []
     key = ''
     npub = ''
     nsec = ''
     ad = ''
     new_key = 0
     key_id = start_key_no-1
+    prev = None
 
     def get_running_value(size):
         a = ['{:02X}'.format(int(i % 256)) for i in range(0,int(size))]
         return "".join(a)
 
-    # print(routine)
     for i, tv in enumerate(routine):
         hashop = tv[4]
 
@@ -966,25 +1041,48 @@ def gen_dataset(opts, routine, start_msg_no, start_key_no, mode=0):
             data = gen_data(tv[3],          mode, 'FF')
 
         if new_key == 0 and not hashop:
-            key = dataset[i-1].key
+            key = prev.key
             #! Automatically use old value for decryption
             #! if the same key is used for the same ad and plaintext size
-            if (decrypt and not dataset[i-1].decrypt
-                and tv[2] == lenbytes(dataset[i-1].ad)
-                and tv[3] == lenbytes(dataset[i-1].pt)):
-                npub = dataset[i-1].npub
-                nsec = dataset[i-1].nsec_pt
-                ad   = dataset[i-1].ad
-                data = dataset[i-1].pt
+            if (decrypt and not prev.decrypt
+                and tv[2] == lenbytes(prev.ad)
+                and tv[3] == lenbytes(prev.pt)):
+                npub = prev.npub
+                nsec = prev.nsec_pt
+                ad   = prev.ad
+                data = prev.pt
 
         key_id = key_id + new_key
         if key_id < 0:
             key_id = 0
 
-        dataset.append(TestVector(opts, i+start_msg_no, key_id,
-                                  new_key, decrypt,
-                                  key, npub, nsec, ad, data, hashop))
-    return dataset, i+start_msg_no, key_id
+        prev = TestVector(opts, i+start_msg_no, key_id,
+                          new_key, decrypt,
+                          key, npub, nsec, ad, data, hashop)
+        yield prev
+
+def dataset_span(routine, start_msg_no, start_key_no):
+    '''
+    Last message and key number used by a routine, without generating it
+    '''
+    key_id = start_key_no-1
+    for i, tv in enumerate(routine):
+        if not tv[4]:
+            key_id = key_id + (1 if i == 0 else tv[0])
+        if key_id < 0:
+            key_id = 0
+    return len(routine)-1+start_msg_no, key_id
+
+def gen_dataset(opts, routine, start_msg_no, start_key_no, mode=0):
+    '''
+    Generate random dataset based on the specified routine with the following
+    format: [[NEW_KEY(Boolean), Encryption/Decryption(Boolean,
+              AD_SIZE, DATA_SIZE],
+              ...,
+            ]
+    '''
+    dataset = list(iter_dataset(opts, routine, start_msg_no, start_key_no, mode))
+    return (dataset,) + dataset_span(routine, start_msg_no, start_key_no)
 
 def gen_single(opts, start_msg_no, start_key_no, index):
     if (opts.verbose):
@@ -1023,39 +1121,11 @@ def gen_test_combined(opts, start_msg_no, key_no):
     bsa, bsd = int(bsa/8), int(bsd/8)
     (start, stop, mode) = opts.gen_test_combined
 
-    routine =  [[True ,     False,      0,         0        , False],
-                [False,     True,       0,         0        , False],
-                [False,     True,       0,         0        , True],
-                [True ,     False,      1,         0        , False],
-                [False,     True,       1,         0        , False],
-                [False,     True,       0,         1        , True],
-                [True ,     False,      0,         1        , False],
-                [False,     True,       0,         1        , False],
-                [False,     True,       0,         2        , True],
-                [True ,     False,      1,         1        , False],
-                [False,     True,       1,         1        , False],
-                [False,     True,       0,         3        , True],
-                [True ,     False,      2,         2        , False],
-                [False,     True,       2,         2        , False],
-                [False,     True,       0,         4        , True],
-                [True ,     False,      bsa-1,     bsd-1    , False],
-                [False,     True,       bsa-1,     bsd-1    , False],
-                [False,     True,       0,         bsd-1    , True],
-                [True ,     False,      bsa,       bsd      , False],
-                [False,     True,       bsa,       bsd      , False],
-                [False,     True,       0,         bsd+1    , True],
-                [True ,     False,      bsa+1,     bsd+1    , False],
-                [False,     True,       bsa+1,     bsd+1    , False],
-                [False,     True,       0,         bsd+2    , True],
-                [True ,     False,      bsa*2,     bsd*2    , False],
-                [False,     True,       bsa*2,     bsd*2    , False],
-                [False,     True,       0,         bsd*2    , True],
-                [True ,     False,      bsa*2+1,   bsd*2+1  , False],
-                [False,     True,       bsa*2+1,   bsd*2+1  , False],
-                [False,     True,       0,         bsd*2+1  , True],
-                [True ,     False,      bsa*3,     bsd*3    , False],
-                [False,     True,       bsa*3,     bsd*3    , False],
-                [False,     True,       0    ,     bsd*3    , True]]
+    # Encryption, decryption with the same key and hash for every size point
+    routine = Sweep(ad=      [0, 1, 0, 1, 2, bsa-1, bsa,   bsa+1, bsa*2, bsa*2+1, bsa*3],
+                    msg=     [0, 0, 1, 1, 2, bsd-1, bsd,   bsd+1, bsd*2, bsd*2+1, bsd*3],
+                    hash_msg=[0, 1, 2, 3, 4, bsd-1, bsd+1, bsd+2, bsd*2, bsd*2+1, bsd*3],
+                    ops=('enc', 'dec', 'hash'), key='point', zipped=True)
 
     return gen_dataset(opts, routine[start-1:stop],
                        start_msg_no, key_no, mode)
@@ -1063,32 +1133,12 @@ def gen_test_combined(opts, start_msg_no, key_no):
 def gen_hash(opts, start_msg_no):
     if (opts.verbose):
         print('gen_hash')
-    bsa = opts.block_size_ad if opts.block_size_ad != None else opts.block_size
-    bsd = opts.block_size
-    bsa, bsd = int(bsa/8), int(bsd/8)
+    bsd = int(opts.block_size/8)
     (start, stop, mode) = opts.gen_hash
 
-    routine =  [[False,     False,      0,         0        , True],
-                [False,     False,      0,         1        , True],
-                [False,    False,       0,         2        , True],
-                [False,     False,      0,         3        , True],
-                [False,    False,       0,         4        , True],
-                [False,     False,      0,         5        , True],
-                [False,    False,       0,         6        , True],
-                [False,     False,      0,         7        , True],
-                [False,    False,       0,         bsd-2    , True],
-                [False,     False,      0,         bsd-1    , True],
-                [False,    False,       0,         bsd      , True],
-                [False,     False,      0,         bsd+1    , True],
-                [False,    False,       0,         bsd+2    , True],
-                [False,     False,      0,         bsd*2    , True],
-                [False,    False,       0,         bsd*2+1  , True],
-                [False,     False,      0,         bsd*3    , True],
-                [False,    False,       0,         bsd*3+1  , True],
-                [False,     False,      0,         bsd*4    , True],
-                [False,    False,       0,         bsd*4+1  , True],
-                [False,     False,      0,         bsd*5    , True],
-                [False,    False,       0,         bsd*5+1  , True]]
+    routine = Sweep(msg=list(range(8)) + list(range(bsd-2, bsd+3)) +
+                        [bsd*k + d for k in range(2, 6) for d in (0, 1)],
+                    ops=('hash', ))
 
     return gen_dataset(opts, routine[start-1:stop],
                        start_msg_no, 0, mode)
@@ -1100,50 +1150,169 @@ def gen_test_routine(opts, start_msg_no, start_key_no):
     bsd = opts.block_size
     bsa, bsd = int(bsa/8), int(bsd/8)
     (start, stop, mode) = opts.gen_test_routine
-    routine =  [[True ,     False,      0,         0        , False],
-                [False,     True,       0,         0        , False],
-                [True ,     False,      1,         0        , False],
-                [False,     True,       1,         0        , False],
-                [True ,     False,      0,         1        , False],
-                [False,     True,       0,         1        , False],
-                [True ,     False,      1,         1        , False],
-                [False,     True,       1,         1        , False],
-                [True ,     False,      bsa,       bsd      , False],
-                [False,     True,       bsa,       bsd      , False],
-                [True ,     False,      bsa-1,     bsd-1    , False],
-                [False,     True,       bsa-1,     bsd-1    , False],
-                [True ,     False,      bsa+1,     bsd+1    , False],
-                [False,     True,       bsa+1,     bsd+1    , False],
-                [True ,     False,      bsa*2,     bsd*2    , False],
-                [False,     True,       bsa*2,     bsd*2    , False],
-                [True ,     False,      bsa*3,     bsd*3    , False],
-                [False,     True,       bsa*3,     bsd*3    , False],
-                [True ,     False,      bsa*4,     bsd*4    , False],
-                [False,     True,       bsa*4,     bsd*4    , False],
-                [True ,     False,      bsa*5,     bsd*5    , False],
-                [False,     True,       bsa*5,     bsd*5    , False]]
+    routine = Sweep(ad= [0, 1, 0, 1, bsa, bsa-1, bsa+1, bsa*2, bsa*3, bsa*4, bsa*5],
+                    msg=[0, 0, 1, 1, bsd, bsd-1, bsd+1, bsd*2, bsd*3, bsd*4, bsd*5],
+                    ops=('enc', 'dec'), key='point', zipped=True)
     return gen_dataset(opts, routine[start-1:stop],
                        start_msg_no, start_key_no, mode)
 
-def gen_tv_and_write_files(opts, dataset):
+def gen_coverage(opts, start_msg_no, start_key_no):
+    if (opts.verbose):
+        print('gen_coverage')
+    model = CoverageModel(opts)
+    budget = getattr(opts, 'cycle_budget', None)
+    cost = None
+    if getattr(opts, 'cycle_model', None):
+        try:
+            cost = SimulationCost(load_cycle_model(*opts.cycle_model), opts)
+        except (ValueError, KeyError, ImportError) as e:
+            sys.exit('Cannot load the cycle model: {}'.format(e))
+    elif budget is not None:
+        sys.exit('--cycle_budget requires --cycle_model')
+    try:
+        selected = model.select(cost=cost, budget=budget)
+    except ValueError as e:
+        sys.exit(str(e))
+    cycles = cost([tv for tv, _ in selected]) if cost else None
+    report = model.report(selected, cycles, budget)
+    with open(os.path.join(opts.dest, COVERAGE_FILE), 'w', newline='') as f:
+        f.write(report)
+    covered = set().union(*[new for _, new in selected])
+    print('Coverage: {}/{} control-path points with {} test vectors ({})'.format(
+        len(covered), len(model.points), len(selected), COVERAGE_FILE))
+    if cycles is not None:
+        print('Predicted simulation: {} cycles{}'.format(
+            sum(cycles), '' if budget is None else ' (budget {})'.format(budget)))
+    return gen_dataset(opts, [tv for tv, _ in selected],
+                       start_msg_no, start_key_no, opts.gen_coverage)
+
+def block_bytes(opts):
+    ''' AD, message and hash block sizes in bytes '''
+    bsa = opts.block_size_ad if opts.block_size_ad != None else opts.block_size
+    bsh = opts.block_size_msg_digest if opts.block_size_msg_digest else opts.block_size
+    return bsa//8, opts.block_size//8, bsh//8
+
+def gen_sweep(opts, start_msg_no, start_key_no):
+    '''
+    Sweep of AD and message sizes (see sweep.parse_axis). The dataset is
+    returned as a generator, so it is streamed to the output files.
+    '''
+    if (opts.verbose):
+        print('gen_sweep')
+    (ad_spec, msg_spec, ops, key, mode) = opts.gen_sweep
+    routine = make_sweep(ad_spec, msg_spec, ops, key, block_bytes(opts))
+    if (opts.verbose):
+        print('{} test vectors'.format(len(routine)))
+    return (iter_dataset(opts, routine, start_msg_no, start_key_no, mode),) + \
+        dataset_span(routine, start_msg_no, start_key_no)
+
+def gen_tv_and_write_files(opts, dataset, total=None, progress=None):
     '''This utility function takes the dataset and generates the test vectors and
-    writes then to the appropriate files
+    writes then to the appropriate files. total is the number of test vectors
+    (if known) for the progress report.
     '''
     if not os.path.exists(opts.dest):
         os.makedirs(opts.dest, exist_ok = True)
 
-    print_header(opts)
-    for tv in dataset:
-        tv.gen_tv()
-        tv.gen_nist_tv()
-        tv.gen_cc_hls()
+    if getattr(opts, 'shards', None):
+        return gen_shards(opts, dataset, total, progress)
 
-    # Add EOF tag
-    for file_name in [opts.pdi_file, opts.do_file, opts.sdi_file]:
-        file_path = os.path.join(opts.dest, file_name)
-        with open(file_path, 'a') as f:
-            f.write('###EOF\n')
+    if opts.mkfifo:
+        make_fifos(opts.dest, [opts.pdi_file, opts.sdi_file, opts.do_file])
 
+    timing = None
+    if getattr(opts, 'cycle_model', None):
+        try:
+            timing = ExpectedTiming(opts.dest, load_cycle_model(*opts.cycle_model))
+        except (ValueError, KeyError, ImportError) as e:
+            sys.exit('Cannot load the cycle model: {}'.format(e))
+
+    own_progress = progress is None
+    if own_progress:
+        progress = new_progress(opts, total, 'Generating')
+    try:
+        # Files are kept open for the whole run, named pipes are streamed
+        with OutputFiles(opts.dest) as out:
+            print_header(opts, out)
+            for tv in dataset:
+                nbytes = tv.gen_tv(out)
+                tv.gen_nist_tv()
+                nbytes += tv.gen_cc_hls(out)
+                if timing:
+                    timing.add(tv)
+                progress.update(1, nbytes)
+
+            # Add EOF tag
+            out.write([(file_name, '###EOF\n')
+                       for file_name in [opts.pdi_file, opts.do_file, opts.sdi_file]])
+    finally:
+        if timing:
+            timing.close()
+        if own_progress:
+            progress.close()
+
+
+def shard_sizes(total, shards):
+    ''' Sizes of min(shards, total) contiguous shards differing by at most one '''
+    shards = min(shards, total)
+    base, extra = divmod(total, shards) if shards else (0, 0)
+    return [base + 1 if i < extra else base for i in range(shards)]
+
+def gen_shards(opts, dataset, total=None, progress=None):
+    '''
+    Write the dataset as opts.shards self-contained KAT sets in
+    opts.dest/shard_<i>, and a manifest (SHARD_MANIFEST) in opts.dest.
+    Test vectors keep their global MsgID and KeyID. The first AEAD test
+    vector of a shard always loads its key, so every SDI file is valid on
+    its own.
+    '''
+    if total is None:
+        dataset = list(dataset)
+        total = len(dataset)
+    dataset = iter(dataset)
+    sizes = shard_sizes(total, opts.shards)
+    width = len(str(max(len(sizes) - 1, 0)))
+
+    own_progress = progress is None
+    if own_progress:
+        progress = new_progress(opts, total, 'Generating')
+
+    try:
+        manifest = []
+        for i, size in enumerate(sizes):
+            shard_opts = copy.copy(opts)
+            shard_opts.shards = None
+            shard_opts.dest = os.path.join(opts.dest, 'shard_{:0{w}}'.format(i, w=width))
+            info = {'dest': os.path.relpath(shard_opts.dest, opts.dest), 'vectors': size,
+                    'first_msg_id': None, 'last_msg_id': None, 'key_ids': [],
+                    'key_reloaded': False}
+
+            def vectors():
+                key_loaded = False
+                for tv in itertools.islice(dataset, size):
+                    tv.opts = shard_opts
+                    if not tv.hashop:
+                        if not key_loaded and not tv.new_key:
+                            tv.new_key = 1
+                            info['key_reloaded'] = True
+                        key_loaded = True
+                        if tv.key_id not in info['key_ids']:
+                            info['key_ids'].append(tv.key_id)
+                    if info['first_msg_id'] is None:
+                        info['first_msg_id'] = tv.msg_id
+                    info['last_msg_id'] = tv.msg_id
+                    yield tv
+
+            gen_tv_and_write_files(shard_opts, vectors(), size, progress)
+            manifest.append(info)
+
+        with open(os.path.join(opts.dest, SHARD_MANIFEST), 'w') as f:
+            json.dump({'vectors': total,
+                       'files': [opts.pdi_file, opts.sdi_file, opts.do_file],
+                       'shards': manifest}, f, indent=2)
+    finally:
+        if own_progress:
+            progress.close()
 
 def determine_params(opts):
     '''This untility function will read in the parameters of the reference
@@ -1178,154 +1347,186 @@ def determine_params(opts):
                 opts.message_digest_size = 8 * int(line.split()[-1])
 
 def blanket_message_hash_test(block_size_msg_digest):
-    routine = []
-    for hash_size in range(4*block_size_msg_digest//8):
-        routine.append([False, False, False, hash_size, True])
-    return routine
+    return Sweep(msg=range(4*block_size_msg_digest//8), ops=('hash', ))
 
 def basic_hash_sizes(block_size_msg_digest):
-    routine =  [[False, False, 0,                          0, True],
-                [False, False, 0, 5*block_size_msg_digest//8, True],
-                [False, False, 0, 4*block_size_msg_digest//8, True],
-                [False, False, 0,                       1536, True],
-                [False, False, 0,                         64, True],
-                [False, False, 0,                         16, True],]
-    return routine
+    return Sweep(msg=[0, 5*block_size_msg_digest//8, 4*block_size_msg_digest//8,
+                      1536, 64, 16],
+                 ops=('hash', ))
 
 def blanket_message_aead_test(opts):
-    routine = []
-    for ad_size in range(2*opts.block_size_ad//8):
-        for mess_size in range(2*opts.block_size//8):
-            routine.append([True, False, ad_size, mess_size,False])
-    return routine
+    return Sweep(ad=range(2*opts.block_size_ad//8), msg=range(2*opts.block_size//8),
+                 ops=('enc', ), key='new')
 
 def basic_aead_sizes(new_key, enc_dec, block_size_ad, block_size_message):
-    routine =  [[new_key,     enc_dec,  5*block_size_ad//8,                          0, False],
-                [new_key,     enc_dec,  4*block_size_ad//8,                          0, False],
-                [new_key,     enc_dec,                1536,                          0, False],
-                [new_key,     enc_dec,                  64,                          0, False],
-                [new_key,     enc_dec,                  16,                          0, False],
-                [new_key,     enc_dec,                   0,    5*block_size_message//8, False],
-                [new_key,     enc_dec,                   0,    4*block_size_message//8, False],
-                [new_key,     enc_dec,                   0,                       1536, False],
-                [new_key,     enc_dec,                   0,                         64, False],
-                [new_key,     enc_dec,                   0,                         16, False],
-                [new_key,     enc_dec,  5*block_size_ad//8,    5*block_size_message//8, False],
-                [new_key,     enc_dec,  4*block_size_ad//8,    4*block_size_message//8, False],
-                [new_key,     enc_dec,                1536,                       1536, False],
-                [new_key,     enc_dec,                  64,                         64, False],
-                [new_key,     enc_dec,                  16,                         16, False]]
-    return routine
+    ad_sizes  = [5*block_size_ad//8, 4*block_size_ad//8, 1536, 64, 16]
+    msg_sizes = [5*block_size_message//8, 4*block_size_message//8, 1536, 64, 16]
+    return Sweep(ad= ad_sizes + [0]*5 + ad_sizes,
+                 msg=[0]*5 + msg_sizes + msg_sizes,
+                 ops=('dec' if enc_dec else 'enc', ),
+                 key='new' if new_key else 'reuse', zipped=True)
 
 
-def gen_benckmark_routine(opts):
-    if (opts.verbose):
-        print("gen_benckmark_routine")
-    if not opts.aead or not opts.block_size or not opts.block_size_ad:
-        sys.exit("--aead algorithm & --block_size & --block_size_ad must be specified")
-    if opts.hash and not opts.block_size_msg_digest:
-        sys.exit("If --hash algorithm is desired --block_size_msg_digest is required")
-    log.debug(f"original options \n{opts}\n")
-
-    # Update parameters based on api.h
-    determine_params(opts)
-    orig_dest=opts.dest
+def benchmark_jobs(opts):
+    '''
+    Output directories of --gen_benchmark as a list of (name, routine)
+    '''
+    bsa, bsd = opts.block_size_ad//8, opts.block_size//8
+    jobs = []
     if opts.hash:
-        data = gen_dataset(opts, blanket_message_hash_test(opts.block_size_msg_digest), 1, 1)
-        opts.dest = os.path.join(orig_dest, 'blanket_hash_test')
-        gen_tv_and_write_files(opts, data[0])
-        print(f'Generated: {os.path.abspath(opts.dest)}')
-
-        data = gen_dataset(opts, basic_hash_sizes(opts.block_size_msg_digest), 1, 1)
-        opts.dest = os.path.join(orig_dest, 'basic_hash_sizes')
-        gen_tv_and_write_files(opts, data[0])
-        print(f'Generated: {os.path.abspath(opts.dest)}')
-
-    # Power measure runs
-    data = gen_dataset(opts, [[True, False, 0, 16, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_0_16')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 16, 0, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_16_0')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 16, 16, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_16_16')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-
-    data = gen_dataset(opts, [[True, False, 0, 64, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_0_64')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 64, 0, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_64_0')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 64, 64, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_64_64')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-
-    data = gen_dataset(opts, [[True, False, 0, 1536, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_0_1536')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 1536, 0, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_1536_0')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 1536, 1536, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_1536_1536')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-
-    data = gen_dataset(opts, [[True, False, 0, 4*opts.block_size//8, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_0_4x')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 4*opts.block_size_ad//8, 0, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_4x_0')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 4*opts.block_size_ad//8, 4*opts.block_size//8, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_4x_4x')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-
-    data = gen_dataset(opts, [[True, False, 0, 5*opts.block_size//8, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_0_5x')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 5*opts.block_size_ad//8, 0, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_5x_0')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-    data = gen_dataset(opts, [[True, False, 5*opts.block_size_ad//8, 5*opts.block_size//8, False]], 1, 1)
-    opts.dest = os.path.join(orig_dest, 'pow_5x_5x')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
-
-    data = gen_dataset(opts, blanket_message_aead_test(opts), 1, 1)
-    opts.dest = os.path.join(orig_dest, 'kats_for_verification')
-    gen_tv_and_write_files(opts, data[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
+        jobs.append(('blanket_hash_test', blanket_message_hash_test(opts.block_size_msg_digest)))
+        jobs.append(('basic_hash_sizes', basic_hash_sizes(opts.block_size_msg_digest)))
+
+    # Power measure runs: one message of AD only, message only and both
+    for tag, ad, msg in (('16', 16, 16), ('64', 64, 64), ('1536', 1536, 1536),
+                         ('4x', 4*bsa, 4*bsd), ('5x', 5*bsa, 5*bsd)):
+        jobs.append(('pow_0_{}'.format(tag), [[True, False, 0, msg, False]]))
+        jobs.append(('pow_{}_0'.format(tag), [[True, False, ad, 0, False]]))
+        jobs.append(('pow_{0}_{0}'.format(tag), [[True, False, ad, msg, False]]))
+
+    jobs.append(('kats_for_verification', blanket_message_aead_test(opts)))
 
     # Ensure new key
     routine_new_key = [[True, False, 0,0, False]]
     routine_new_key += basic_aead_sizes(True, False, opts.block_size_ad, opts.block_size)
     routine_new_key += basic_aead_sizes(True, True, opts.block_size_ad, opts.block_size)
-    data_enc = gen_dataset(opts, routine_new_key, 1, 1)
-    opts.dest = os.path.join(orig_dest, 'generic_aead_sizes_new_key')
-    gen_tv_and_write_files(opts, data_enc[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
+    jobs.append(('generic_aead_sizes_new_key', routine_new_key))
 
     # Ensure at least one new key
     routine_reuse_key = [[True, False, 0,0, False]]
     routine_reuse_key += basic_aead_sizes(False, False, opts.block_size_ad, opts.block_size)
     routine_reuse_key += basic_aead_sizes(False, True, opts.block_size_ad, opts.block_size)
-    data_enc = gen_dataset(opts, routine_reuse_key, 1, 1)
-    opts.dest = os.path.join(orig_dest, 'generic_aead_sizes_reuse_key')
-    gen_tv_and_write_files(opts, data_enc[0])
-    print(f'Generated: {os.path.abspath(opts.dest)}')
+    jobs.append(('generic_aead_sizes_reuse_key', routine_reuse_key))
+    return jobs
+
+def run_benchmark_job(opts, routine, seed, progress=None):
+    '''
+    Generate one benchmark directory (opts.dest). Runs in a worker process,
+    opts is a private copy.
+    '''
+    random.seed(seed)
+    start = time.perf_counter()
+    data = gen_dataset(opts, routine, 1, 1)
+    gen_tv_and_write_files(opts, data[0], len(data[0]), progress)
+    return len(data[0]), time.perf_counter() - start
+
+def init_benchmark_worker(progress_queue, log_level, log_file):
+    worker_init(progress_queue)
+    configure_logging(log_level, log_file)
+
+def run_benchmark_jobs(opts, jobs):
+    '''
+    Run (name, routine, digest) jobs into opts.dest/name using opts.jobs
+    worker processes. Directories with an identical routine are generated
+    once and copied. Jobs with a digest are skipped if their directory was
+    generated with the same digest (see suite.py).
+    Returns {name: (vectors, seconds, note)}.
+    '''
+    unique = {}
+    for name, routine, _ in jobs:
+        key = tuple(tuple(int(v) for v in tv) for tv in routine)
+        unique.setdefault(key, []).append(name)
+    # Seeds are drawn up front so runs are reproducible for a seeded parent
+    by_name = {name: (routine, digest) for name, routine, digest in jobs}
+    work = [(names, by_name[names[0]][0], random.getrandbits(64))
+            for names in unique.values()]
+
+    def dest(name):
+        return os.path.join(opts.dest, name)
+
+    def cached(name):
+        digest = by_name[name][1]
+        return digest is not None and is_cached(dest(name), digest)
+
+    def job_opts(name):
+        job = copy.copy(opts)
+        job.dest = dest(name)
+        return job
+
+    summary = {}
+    todo = []
+    for names, routine, seed in work:
+        if all(cached(name) for name in names):
+            for name in names:
+                summary[name] = (len(routine), 0.0, 'cached')
+        else:
+            todo.append((names, routine, seed))
+
+    results = {}
+    progress = new_progress(opts, sum(len(routine) for _, routine, _ in todo),
+                            'gen_benchmark')
+    workers = opts.jobs if opts.jobs else os.cpu_count()
+    if workers == 1 or len(todo) <= 1:
+        for names, routine, seed in todo:
+            results[names[0]] = run_benchmark_job(job_opts(names[0]), routine, seed,
+                                                  progress)
+        progress.close()
+    else:
+        # Workers report their progress through a queue
+        queue = None
+        if isinstance(progress, Progress):
+            queue = multiprocessing.Queue()
+            progress.listen(queue)
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_benchmark_worker,
+                                 initargs=(queue, opts.log_level, opts.log_file)) as executor:
+            futures = {executor.submit(run_benchmark_job, job_opts(names[0]), routine, seed):
+                       names[0] for names, routine, seed in todo}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        progress.close(queue)
+
+    for names, _, _ in todo:
+        vectors, elapsed = results[names[0]]
+        summary[names[0]] = (vectors, elapsed, None)
+        for name in names[1:]:
+            start = time.perf_counter()
+            shutil.copytree(dest(names[0]), dest(name), dirs_exist_ok=True)
+            summary[name] = (vectors, time.perf_counter() - start,
+                             'copy of {}'.format(names[0]))
+        for name in names:
+            if by_name[name][1] is not None:
+                write_stamp(dest(name), by_name[name][1])
+    return summary
+
+def print_benchmark_summary(opts, jobs, summary, elapsed):
+    print('{:32} {:>8} {:>10}'.format('Directory', 'Vectors', 'Time [s]'))
+    for name, _, _ in jobs:
+        vectors, seconds, note = summary[name]
+        note = ' ({})'.format(note) if note else ''
+        print('{:32} {:>8} {:>10.2f}{}'.format(name, vectors, seconds, note))
+    print('{:32} {:>8} {:>10.2f}'.format(
+        'Total', sum(v[0] for v in summary.values()), elapsed))
+    for name, _, _ in jobs:
+        print(f'Generated: {os.path.abspath(os.path.join(opts.dest, name))}')
+
+def gen_benckmark_routine(opts):
+    if (opts.verbose):
+        print("gen_benckmark_routine")
+    suite = None
+    if isinstance(opts.gen_benchmark, str):
+        try:
+            suite = load_suite(opts.gen_benchmark)
+            apply_suite_options(opts, get_parser(), suite, opts.gen_benchmark)
+        except (OSError, ValueError, ImportError) as e:
+            sys.exit(f"--gen_benchmark: {e}")
+        if opts.block_size_ad is None:
+            opts.block_size_ad = opts.block_size
+    if not opts.aead or not opts.block_size or not opts.block_size_ad:
+        sys.exit("--aead algorithm & --block_size & --block_size_ad must be specified")
+    if opts.hash and not opts.block_size_msg_digest:
+        sys.exit("If --hash algorithm is desired --block_size_msg_digest is required")
+    log.debug("original options \n%s\n", opts)
+
+    # Update parameters based on api.h
+    determine_params(opts)
+    start = time.perf_counter()
+    if suite:
+        try:
+            jobs = suite_jobs(suite, opts, block_bytes(opts), __version__,
+                              HEADER_IGNORE_OPTS)
+        except ValueError as e:
+            sys.exit(f"--gen_benchmark: {e}")
+    else:
+        jobs = [(name, routine, None) for name, routine in benchmark_jobs(opts)]
+    summary = run_benchmark_jobs(opts, jobs)
+    print_benchmark_summary(opts, jobs, summary, time.perf_counter() - start)
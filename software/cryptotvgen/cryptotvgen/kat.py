@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+cryptotvgen-kat: streaming reader and validator of KAT files.
+
+Reads the pdi.txt, sdi.txt and do.txt files written by cryptotvgen without
+a simulator. The files are memory-mapped and split into chunks at test
+vector boundaries, and the chunks are parsed by worker processes:
+    - INS, HDR, DAT and STT lines are tokenized into test vectors (from one
+      `#### MsgID=` comment block to the next);
+    - segment headers are decoded (type, Partial, EOI, EOT, Last, length);
+    - every word is checked against the port width (--io, by default the
+      one in the file header), the DAT words of each segment against its
+      length, and the padding of the last word against zero;
+    - the instructions and segment types of each test vector are checked
+      against its file, and the Last flag against its last segment;
+    - the MsgIDs of pdi.txt and do.txt must match, and the key loads of
+      sdi.txt the key activations of pdi.txt.
+'''
+
+import argparse
+import json
+import mmap
+import os
+import re
+import sys
+import textwrap
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .generator import Opcode, Segment, Status, txt_opcode
+
+KAT_FILES = (('pdi', 'pdi.txt'), ('sdi', 'sdi.txt'), ('do', 'do.txt'))
+# Chunks are at least this long (bytes), smaller files are parsed at once
+CHUNK_SIZE = 16 << 20
+HEADER_BITS = 32
+
+# Segment types of each operation, in the input and output files
+PDI_SEGMENTS = {
+    Opcode.encrypt.value: {s.value for s in (
+        Segment.npub, Segment.ad, Segment.npub_ad, Segment.ad_npub, Segment.pt,
+        Segment.nsec_pt, Segment.len)},
+    Opcode.decrypt.value: {s.value for s in (
+        Segment.npub, Segment.ad, Segment.npub_ad, Segment.ad_npub, Segment.ct,
+        Segment.ct_tag, Segment.tag, Segment.nsec_ct, Segment.len)},
+    Opcode.hash.value: {Segment.hash.value},
+}
+DO_SEGMENTS = {
+    Opcode.encrypt.value: {s.value for s in (
+        Segment.ct, Segment.ct_tag, Segment.tag, Segment.nsec_ct)},
+    Opcode.decrypt.value: {s.value for s in (Segment.pt, Segment.nsec_pt)},
+    Opcode.hash.value: {Segment.hash_tag.value},
+}
+OPERATIONS = set(PDI_SEGMENTS)
+ACTKEY = Opcode.actkey.value
+LOADKEY = Opcode.loadkey.value
+STATUSES = (Status.success.value, Status.failure.value)
+# Opcodes of the titles of the comment blocks (`#### Hash`)
+TITLES = {txt.encode(): op.value for op, txt in txt_opcode.items()}
+
+# Lines other than comments (titles of comment blocks excepted) and empty lines
+_LINE = re.compile(rb'^(?:#### |###EOF|[^#\r\n]).*', re.M)
+_IDS = re.compile(rb'MsgID=\s*(\d+), KeyID=\s*(\d+)')
+_MSG_ID = re.compile(rb'^#### MsgID=\s*(\d+), KeyID=\s*(\d+)', re.M)
+_PARAMETER = re.compile(rb'^# (\w+)(?: \(W,SW\))?\s+- (.*)$', re.M)
+# io of the header: [32, 32] (CLI), (32, 32) (defaults) ...
+_IO = re.compile(r'^\D*(\d+)\D+(\d+)\D*$')
+
+Header = namedtuple('Header', 'type partial eoi eot last length')
+
+
+def decode_header(word):
+    ''' Header of the first 32 bits of an HDR word (hex string) '''
+    value = int(word[:HEADER_BITS//4], 16)
+    return Header(value >> 28, (value >> 27) & 1, (value >> 26) & 1,
+                  (value >> 25) & 1, (value >> 24) & 1, value & 0xFFFF)
+
+
+class Vector(object):
+    '''
+    Test vector of a KAT file: its MsgID and KeyID (None if there is no
+    `#### MsgID=` line), its byte range [start, end) and first line, the
+    opcode of the title of its comment block, the opcodes of its
+    instructions, its segments as (Header, bytes), its status and the
+    errors found while parsing.
+    '''
+    __slots__ = ('msg_id', 'key_id', 'start', 'end', 'line', 'title', 'instructions',
+                 'segments', 'status', 'errors')
+
+    def __init__(self, start, line):
+        self.msg_id = None
+        self.key_id = None
+        self.start = start
+        self.end = start
+        self.line = line
+        self.title = None
+        self.instructions = []
+        self.segments = []
+        self.status = None
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+    @property
+    def operation(self):
+        ''' Opcode of the operation (encrypt, decrypt or hash), if known '''
+        for opcode in reversed(self.instructions):
+            if opcode in OPERATIONS:
+                return opcode
+        return self.title
+
+    def data(self, *types):
+        ''' Data of the segments of the given types '''
+        return b''.join(data for header, data in self.segments if header.type in types)
+
+
+def iter_vectors(buf, start=0, end=None, width=32, line=1):
+    '''
+    Test vectors of buf[start:end] (bytes or mmap of a KAT file with
+    width-bit words). line is the line number at start.
+    '''
+    data = buf[start:len(buf) if end is None else end]
+    digits = width//4
+    header_digits = -(-HEADER_BITS//width)*digits
+    word_bytes = width//8
+    vec = None
+    # Segment waiting for DAT lines: [data, padded length, length]
+    pending = None
+    # End of the previous title line, consecutive ones make one block
+    title_end = None
+    # Line numbers are counted up to the current line when needed
+    counted, counted_line = 0, line
+
+    def finish(vec, pending, pos):
+        if pending and len(pending[0]) < pending[1]:
+            vec.error(vec.line, 'segment of {} bytes has {} bytes of data'.format(
+                pending[2], len(pending[0])))
+        vec.end = start + pos
+        return vec
+
+    # Comments and empty lines are skipped by the regular expression
+    for match in _LINE.finditer(data):
+        pos = match.start()
+        counted_line += data.count(b'\n', counted, pos)
+        counted, line = pos, counted_line
+        text = match.group().rstrip()
+        if text.startswith(b'###EOF'):
+            break
+        if text.startswith(b'#### '):
+            if title_end != pos - 1:
+                if vec is not None:
+                    yield finish(vec, pending, pos)
+                vec, pending = Vector(start + pos, line), None
+            title_end = match.end()
+            ids = _IDS.search(text)
+            if ids:
+                vec.msg_id, vec.key_id = int(ids.group(1)), int(ids.group(2))
+            else:
+                vec.title = TITLES.get(text[5:])
+            continue
+        if vec is None:
+            vec = Vector(start + pos, line)
+        kind, word = text[:6], text[6:].strip()
+        try:
+            int(word, 16)
+            valid = len(word) % digits == 0
+        except ValueError:
+            valid = False
+        if kind not in (b'INS = ', b'HDR = ', b'DAT = ', b'STT = '):
+            vec.error(line, 'unknown line {!r}'.format(text[:20].decode('latin-1')))
+        elif not valid:
+            vec.error(line, '{} is not a sequence of {}-bit words'.format(
+                word[:20].decode('latin-1'), width))
+        elif kind == b'DAT = ':
+            if pending is None:
+                vec.error(line, 'DAT without a segment header')
+            else:
+                pending[0] += bytes.fromhex(word.decode())
+                if len(pending[0]) >= pending[1]:
+                    segment, padded, length = pending
+                    if len(segment) > padded:
+                        vec.error(line, 'segment of {} bytes has {} bytes of data'.format(
+                            length, len(segment)))
+                    elif any(segment[length:]):
+                        vec.error(line, 'non-zero padding')
+                    vec.segments[-1] = (vec.segments[-1][0], bytes(segment[:length]))
+                    pending = None
+        else:
+            if pending is not None:
+                vec.error(line, 'segment of {} bytes has {} bytes of data'.format(
+                    pending[2], len(pending[0])))
+                pending = None
+            if kind == b'INS = ':
+                if len(word) != digits:
+                    vec.error(line, 'instruction is not one word')
+                vec.instructions.append(int(word[:1], 16))
+            elif kind == b'STT = ':
+                if len(word) != digits:
+                    vec.error(line, 'status is not one word')
+                vec.status = int(word[:1], 16)
+            elif len(word) != header_digits:
+                vec.error(line, 'segment header of {} digits'.format(len(word)))
+            else:
+                header = decode_header(word)
+                vec.segments.append((header, b''))
+                if header.length:
+                    pending = [bytearray(), -(-header.length//word_bytes)*word_bytes,
+                               header.length]
+    else:
+        pos = len(data)
+    if vec is not None:
+        yield finish(vec, pending, pos)
+
+
+def check_vector(kind, vec):
+    '''
+    Errors of the instructions, segment types, Last flags and status of a
+    test vector of a pdi, sdi or do file, as (line, message)
+    '''
+    errors = []
+
+    def error(message):
+        errors.append((vec.line, message))
+
+    if kind == 'pdi':
+        ops = [op for op in vec.instructions if op != ACTKEY]
+        if len(ops) != 1 or ops[0] not in OPERATIONS:
+            error('instructions {} instead of one operation'.format(vec.instructions))
+        elif vec.instructions[-1] != ops[0]:
+            error('key activation after the operation')
+        allowed = PDI_SEGMENTS.get(ops[0] if ops else None, ())
+    elif kind == 'sdi':
+        if vec.instructions != [LOADKEY]:
+            error('instructions {} instead of a key load'.format(vec.instructions))
+        allowed = {Segment.key.value}
+    else:
+        if vec.instructions:
+            error('instructions in the output')
+        if vec.status not in STATUSES:
+            error('no status' if vec.status is None else 'status {:X}'.format(vec.status))
+        allowed = DO_SEGMENTS.get(vec.operation, ())
+    if kind != 'do' and vec.status is not None:
+        error('status in the input')
+
+    for i, (header, _) in enumerate(vec.segments):
+        if header.type not in allowed:
+            error('segment type {} in {}'.format(header.type, kind))
+        if header.last != (i == len(vec.segments) - 1):
+            error('segment {} has Last={}'.format(i + 1, header.last))
+    return errors
+
+
+def chunks(path, size):
+    '''
+    (start, end, lines before start) of chunks of about size bytes, split
+    before the comment blocks starting test vectors
+    '''
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [(0, 0, 0)]
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bounds, lines = [(0, 0)], 0
+            while True:
+                start = mm.find(b'\n\n#### ', bounds[-1][0] + size)
+                if start < 0:
+                    break
+                start += 2
+                lines += mm[bounds[-1][0]:start].count(b'\n')
+                bounds.append((start, lines))
+            total = len(mm)
+    ends = [b[0] for b in bounds[1:]] + [total]
+    return [(start, end, lines) for (start, lines), end in zip(bounds, ends)]
+
+def read_parameters(path):
+    ''' {name: value} of the parameters in the header of a KAT file (strings) '''
+    with open(path, 'rb') as f:
+        head = f.read(1 << 14)
+    return {name.decode(): value.decode().strip() for name, value in _PARAMETER.findall(head)}
+
+def read_io(path):
+    ''' (W, SW) in the header of a KAT file, or None '''
+    match = _IO.match(read_parameters(path).get('io', ''))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+def index_vectors(buf):
+    '''
+    (start, MsgID, KeyID) of the test vectors of a KAT file (bytes or mmap),
+    found by their `#### MsgID=` lines
+    '''
+    index = []
+    for match in _MSG_ID.finditer(buf):
+        pos = match.start()
+        # The comment block may start with a title line
+        block = buf.rfind(b'\n\n', max(pos - 80, 0), pos)
+        start = block + 2 if block >= 0 and buf.find(b'\n', block + 2, pos) == pos - 1 else pos
+        index.append((start, int(match.group(1)), int(match.group(2))))
+    return index
+
+def scan_chunk(path, kind, width, start, end, line, max_errors):
+    '''
+    Parse and check a chunk of a KAT file. Returns its statistics, MsgIDs
+    (in order), and first errors (line, MsgID, message)
+    '''
+    stats = {'vectors': 0, 'instructions': 0, 'segments': 0, 'data_bytes': 0,
+             'key_activations': 0, 'failures': 0, 'errors': 0}
+    msg_ids, errors = [], []
+    with open(path, 'rb') as f:
+        if end == start:
+            return stats, msg_ids, errors
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for vec in iter_vectors(mm, start, end, width, line + 1):
+                stats['vectors'] += 1
+                stats['instructions'] += len(vec.instructions)
+                stats['segments'] += len(vec.segments)
+                stats['data_bytes'] += sum(h.length for h, _ in vec.segments)
+                stats['key_activations'] += vec.instructions.count(ACTKEY)
+                stats['failures'] += vec.status == STATUSES[1]
+                msg_ids.append(vec.msg_id)
+                found = sorted(vec.errors + check_vector(kind, vec))
+                stats['errors'] += len(found)
+                errors.extend((l, vec.msg_id, m) for l, m in found[:max_errors - len(errors)])
+    return stats, msg_ids, errors
+
+def scan_file(path, kind, width, chunk_size=CHUNK_SIZE, max_errors=20,
+              executor=None):
+    ''' Statistics, MsgIDs and first errors of a KAT file '''
+    begin = time.perf_counter()
+    parts = chunks(path, chunk_size)
+    args = [(path, kind, width, s, e, l, max_errors) for s, e, l in parts]
+    if executor and len(parts) > 1:
+        results = list(executor.map(scan_chunk, *zip(*args)))
+    else:
+        results = [scan_chunk(*a) for a in args]
+    stats = {k: sum(r[0][k] for r in results) for k in results[0][0]}
+    msg_ids = [i for r in results for i in r[1]]
+    errors = [e for r in results for e in r[2]][:max_errors]
+    stats['bytes'] = parts[-1][1]
+    stats['chunks'] = len(parts)
+    stats['seconds'] = time.perf_counter() - begin
+    return stats, msg_ids, errors
+
+def kat_paths(path):
+    ''' {kind: path} of the KAT files of a directory, or of a single file '''
+    if os.path.isdir(path):
+        return {kind: os.path.join(path, name) for kind, name in KAT_FILES
+                if os.path.exists(os.path.join(path, name))}
+    name = os.path.basename(path)
+    for kind, _ in KAT_FILES:
+        if name.startswith(kind):
+            return {kind: path}
+    raise ValueError('Cannot tell the kind of {} (pdi, sdi or do)'.format(path))
+
+
+def get_kat_parser():
+    parser = argparse.ArgumentParser(
+        prog='cryptotvgen-kat', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent('''\
+            Example:
+                cryptotvgen-kat hardware/ascon_lwc/KAT/*
+                cryptotvgen-kat big/pdi.txt --io 32 32 --jobs 8
+            '''))
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help='KAT directories, or pdi/sdi/do files.')
+    parser.add_argument('--io', nargs=2, type=int, default=None,
+                        metavar=('PUBLIC_PORTS_WIDTH', 'SECRET_PORT_WIDTH'),
+                        help='Size of PDI/DO and SDI port in bits. '
+                             'Default: the io of the file header.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), metavar='N',
+                        help='Worker processes (default: %(default)s).')
+    parser.add_argument('--chunk_size', type=int, default=CHUNK_SIZE >> 20, metavar='MB',
+                        help='Minimum size of the chunks of a file (default: %(default)s).')
+    parser.add_argument('--max_errors', type=int, default=20, metavar='N',
+                        help='Errors listed per file (default: %(default)s).')
+    parser.add_argument('--json', metavar='FILE',
+                        help='Write the statistics and errors to FILE.')
+    return parser
+
+def run_kat(args=sys.argv[1:]):
+    args = get_kat_parser().parse_args(args)
+    report, status = {}, 0
+    begin = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.jobs) if args.jobs > 1 else None
+    try:
+        for path in args.paths:
+            try:
+                files = kat_paths(path)
+            except ValueError as e:
+                sys.exit(str(e))
+            results = {}
+            for kind, file_path in files.items():
+                io = args.io or read_io(file_path) or (32, 32)
+                width = io[1] if kind == 'sdi' else io[0]
+                stats, msg_ids, errors = scan_file(
+                    file_path, kind, width, args.chunk_size << 20,
+                    args.max_errors, executor)
+                results[kind] = (stats, msg_ids, errors)
+                print('{}: {} vectors, {} segments, {} data bytes, {} errors '
+                      '({} chunks, {:.1f} MB/s, {:.0f} vectors/s)'.format(
+                          file_path, stats['vectors'], stats['segments'],
+                          stats['data_bytes'], stats['errors'], stats['chunks'],
+                          stats['bytes']/1e6/max(stats['seconds'], 1e-9),
+                          stats['vectors']/max(stats['seconds'], 1e-9)))
+                for line, msg_id, message in errors:
+                    print('    line {} (MsgID {}): {}'.format(line, msg_id, message))
+
+            # Consistency between the files of a directory
+            mismatch = []
+            if 'pdi' in results and 'do' in results and results['pdi'][1] != results['do'][1]:
+                mismatch.append('the MsgIDs of pdi.txt and do.txt differ')
+            if 'pdi' in results and 'sdi' in results and \
+                    results['pdi'][0]['key_activations'] != results['sdi'][0]['vectors']:
+                mismatch.append('{} key activations in pdi.txt and {} key loads in sdi.txt'
+                                .format(results['pdi'][0]['key_activations'],
+                                        results['sdi'][0]['vectors']))
+            for message in mismatch:
+                print('{}: {}'.format(path, message))
+            status |= bool(mismatch) or any(r[0]['errors'] for r in results.values())
+            report[path] = {
+                'files': {kind: dict(r[0], errors_found=[list(e) for e in r[2]])
+                          for kind, r in results.items()},
+                'mismatch': mismatch,
+            }
+    finally:
+        if executor:
+            executor.shutdown()
+
+    seconds = time.perf_counter() - begin
+    nbytes = sum(f['bytes'] for r in report.values() for f in r['files'].values())
+    print('{:.1f} MB in {:.2f} s ({:.1f} MB/s)'.format(nbytes/1e6, seconds,
+                                                       nbytes/1e6/max(seconds, 1e-9)))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'paths': report, 'bytes': nbytes, 'seconds': seconds}, f, indent=2)
+    return int(status)
+
+if __name__ == '__main__':
+    sys.exit(run_kat(sys.argv[1:]))
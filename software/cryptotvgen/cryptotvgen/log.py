@@ -1,30 +1,78 @@
 # -*- coding: utf-8 -*-
 
+import atexit
 import logging
+import os
+import queue
 
-def setup_logger(log_filename):
+LOG_FILE = 'cryptotvgen.log'
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+def setup_logger(log_filename=LOG_FILE):
     '''
-    Setup logging infrastructure
+    Get the logger of cryptotvgen. No handler is attached until
+    configure_logging() is called, so importing the package neither
+    creates a log file nor formats any message.
 
     Reference Source: https://realpython.com/python-logging/
     '''
-    #logging.basicConfig(level=logging.DEBUG)
-    
-    # Create a custom logger
     logger = logging.getLogger(__name__)
-    
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+    return logger
 
-    # Create handlers
-    # All messages goes to a log file
-    i_handler = logging.FileHandler(log_filename)
-    i_handler.setLevel(logging.INFO)
+def configure_logging(level='WARNING', log_filename=LOG_FILE):
+    '''
+    Send messages of the given level and above to log_filename.
 
-    # Create formatters and add it to handlers
-    format = '%(asctime)s - %(levelname)s - %(message)s'
-    formatter = logging.Formatter(format)
-    i_handler.setFormatter(formatter)
+    Records are passed through a QueueHandler; formatting and writing is
+    done by a QueueListener thread. The file is only created once the
+    first record is written. Messages below the level are dropped before
+    they are formatted (use %-style arguments, or isEnabledFor() around
+    expensive ones).
+    '''
+    # Imported here, logging.handlers is slow to import (socket, pickle, ...)
+    import logging.handlers
 
-    # Add handlers to the logger
-    logger.addHandler(i_handler)
+    class _QueueHandler(logging.handlers.QueueHandler):
+        ''' Leave formatting to the listener thread, records stay in-process '''
+        def prepare(self, record):
+            return record
 
+    global _listener
+    stop_logging()
+    logger = logging.getLogger(__name__)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(getattr(logging, level))
+    logger.propagate = False
+
+    file_handler = logging.FileHandler(log_filename, delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    records = queue.SimpleQueue()
+    logger.addHandler(_QueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, file_handler)
+    _listener.start()
     return logger
+
+def stop_logging():
+    ''' Flush queued records and close the log file '''
+    global _listener
+    if _listener:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+def _after_fork():
+    # The listener thread does not exist in a forked child
+    global _listener
+    _listener = None
+
+atexit.register(stop_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -16,6 +16,10 @@ import os
 from enum import Enum
 import pathlib
 
+from .sweep import parse_axis, parse_ops, KEY_POLICIES
+from .log import LOG_FILE, LOG_LEVELS
+from .server import SERVER_SOCKET
+
 class AlgorithmClass(Enum):
     AEAD = 0
     HASH = 1
@@ -52,7 +56,8 @@ class ValidateMsgFormat(argparse.Action):
 
 
 routines = ('gen_random', 'gen_custom', 'gen_test_routine', 'gen_single',
-            'gen_hash', 'gen_test_combined', 'gen_benchmark', 'prepare_libs')
+            'gen_hash', 'gen_test_combined', 'gen_benchmark', 'gen_coverage',
+            'gen_sweep', 'prepare_libs')
 
 class ValidateGenRandom(argparse.Action):
     ''' Validate gen_random option '''
@@ -267,6 +272,49 @@ class ValidateGenBenchmarkRoutine(argparse.Action):
         except AttributeError:
             routine = [routines.index(self.dest), ]
         setattr(args, 'routines', routine)
+        setattr(args, self.dest, values if values else True)
+
+class ValidateGenCoverage(argparse.Action):
+    ''' Validate gen_coverage option '''
+    def __call__(self, parser, args, values, option_string=None):
+        if (values not in [0, 1, 2]):
+            raise argparse.ArgumentError(
+                self, 'Valid MODE is [0, 1, 2]. (MODE={})'.format(values))
+        try:
+            routine = getattr(args, 'routines')
+            routine.append(routines.index(self.dest))
+        except AttributeError:
+            routine = [routines.index(self.dest), ]
+        setattr(args, 'routines', routine)
+        setattr(args, self.dest, values)
+
+class ValidateGenSweep(argparse.Action):
+    ''' Validate gen_sweep option '''
+    def __call__(self, parser, args, values, option_string=None):
+        ad, msg, ops, key, mode = values
+        try:
+            parse_axis(ad, 1)
+            parse_axis(msg, 1)
+            parse_ops(ops)
+        except ValueError as e:
+            raise argparse.ArgumentError(self, str(e))
+        if (key not in KEY_POLICIES):
+            raise argparse.ArgumentError(
+                self, 'Valid KEY is [{}]. (KEY={})'.format(', '.join(KEY_POLICIES), key))
+        try:
+            mode = int(mode)
+        except ValueError:
+            mode = None
+        if (mode not in [0, 1, 2]):
+            raise argparse.ArgumentError(
+                self, 'Valid MODE is [0, 1, 2]. (MODE={})'.format(values[4]))
+        try:
+            routine = getattr(args, 'routines')
+            routine.append(routines.index(self.dest))
+        except AttributeError:
+            routine = [routines.index(self.dest), ]
+        setattr(args, 'routines', routine)
+        setattr(args, self.dest, [ad, msg, ops, key, mode])
 
 class InvalidateArgument(argparse.Action):
     def __call__(self, parser, args, values, option_string=None):
@@ -292,6 +340,21 @@ class CustomFormatter(argparse.ArgumentDefaultsHelpFormatter,
                         help += ' (default: %(default)s)'
         return help
 
+def finalize_options(opts):
+    '''
+    Derived options and checks across options, applied after parsing.
+    Raises ValueError for invalid combinations.
+    '''
+    opts.msg_format = list(opts.msg_format)
+    if (opts.offline):
+        opts.msg_format = ['len'] + opts.msg_format
+    if (opts.ciph_exp_noext and not opts.ciph_exp):
+        raise ValueError('Option --ciph_ext_noext requires --ciph_exp')
+    if (opts.add_partial and not opts.ciph_exp):
+        raise ValueError('Option --add_partial requires --ciph_exp')
+    if (opts.shards is not None and opts.shards < 1):
+        raise ValueError('Option --shards requires at least 1 shard')
+
 # ============================================================================
 # Argument parsing
 # ============================================================================
@@ -392,6 +455,15 @@ def get_parser():
             (default: %(default)s)\
             See also `--supercop_version`''')
     )
+    test.add_argument(
+        '--serve', nargs='?', const=SERVER_SOCKET, default=None, metavar='SOCKET',
+        help=textwrap.dedent('''\
+            Run a generation server on the UNIX socket SOCKET
+            (default: {}) until interrupted.
+            It keeps --jobs worker processes with the reference libraries
+            loaded; --lib_path, --aead and --hash given here are loaded up
+            front. Invocations with `--server` are run by the server.
+            '''.format(SERVER_SOCKET)))
     test.add_argument(
         '--supercop_version', default='latest',
         help=textwrap.dedent('''\
@@ -400,7 +472,8 @@ def get_parser():
             to automatically determine the latest available version from the SUPERCOP website.''')
     )
     test.add_argument(
-        '--gen_benchmark', default=False, action=ValidateGenBenchmarkRoutine, nargs=0,
+        '--gen_benchmark', default=False, action=ValidateGenBenchmarkRoutine, nargs='?',
+        metavar='SUITE',
         help=textwrap.dedent('''\
             This mode generates several the following sets of test vectors
             1) generic_aead_sizes_new_key: encryption and decryption of the following sizes
@@ -424,6 +497,26 @@ def get_parser():
 
             Optional arguments --hash and --block_size_msg_digest allow for the generation
             of the hash test vectors
+
+            The directories are generated in parallel (see --jobs). Directories
+            with identical sizes (e.g. pow_0_4x and pow_0_64 for a 128-bit block)
+            are generated once and copied. A timing summary is printed at the end.
+
+            SUITE optionally replaces the sets above with the directories defined
+            in a TOML or JSON suite file, e.g. hardware/ascon_lwc/benchmark_v1.toml.
+            A suite can read --aead and --io from the [lwc] block of an LWC core
+            description (lwc = "ascon_v1.toml") and set further options in an
+            [options] table; options given on the command line take precedence.
+            Every [[entry]] is a directory:
+                name    - directory name
+                ad, msg - sizes, same format as AD and MSG of --gen_sweep
+                ops     - enc, dec and/or hash (default enc)
+                key     - new, reuse or point (default new)
+                zipped  - pair AD and message sizes instead of crossing them
+                repeat  - number of repetitions (default 1)
+                sweeps  - list of tables with the fields above, concatenated
+            Defaults of these fields can be set in a [defaults] table.
+            Directories that are up to date (same entry and options) are skipped.
         '''))
     test.add_argument(
         '--gen_custom_mode', type=int, default=0, choices=range(3),
@@ -657,6 +750,88 @@ def get_parser():
 
             Generates test 5 with MODE=1.
             '''))
+    test.add_argument(
+        '--gen_coverage', type=int, default=None, metavar='MODE',
+        action=ValidateGenCoverage,
+        help=textwrap.dedent('''\
+            This mode generates the smallest set of test vectors (picked
+            greedily) that exercises every control path class of the
+            CryptoCore, then stops.
+            The classes use the notation of the cycle formulas in
+            hardware/ascon_lwc/docs/cycles_*.py:
+                Na/Nm  - number of complete AD/message blocks (0, 1, 2+)
+                Ina/Inm - last AD/message block is incomplete
+                Bla/Blm - the incomplete block ends on a word boundary
+                          of the PDI port (--io) or within a word
+            The AEAD classes are crossed with the operation (encryption,
+            decryption) and key reuse (new key, reused key), and the AD
+            classes are crossed with the message classes. Hash classes
+            (based on --block_size_msg_digest if given) are added when
+            --hash is specified.
+
+            A coverage report is written to coverage.txt in --dest.
+
+            MODE determines the test vector generation mode, where
+                0 = All random data
+                1 = Fixed test values.
+                2 = Same as option 1, except each input is now a running
+                    value (each subsequent byte is a previous byte
+                    incremented by 1).
+
+            Example:
+
+            --gen_coverage 0
+            '''))
+    test.add_argument(
+        '--gen_sweep', nargs=5, default=None,
+        metavar=('AD', 'MSG', 'OPS', 'KEY', 'MODE'),
+        action=ValidateGenSweep,
+        help=textwrap.dedent('''\
+            This mode generates a sweep over AD sizes (AD) and message
+            sizes (MSG). Every (AD, MSG) pair is generated for each of the
+            operations in OPS.
+            Test vectors are generated and written one at a time, so
+            sweeps over hundreds of blocks do not need to fit in memory.
+
+            AD and MSG are comma separated lists of sizes in bytes, where
+            each item is one of
+                N               - a single size
+                Nx              - N blocks, e.g. 4x
+                START:STOP      - START to STOP-1
+                START:STOP:STEP - START to STOP-1 in steps of STEP
+                edges:N         - 0, 1 and k*block-1, k*block, k*block+1
+                                  for k = 1..N, where block is the block
+                                  size of AD (--block_size_ad) or of the
+                                  message (--block_size)
+                edges:N:STEP    - same as edges:N, for every STEP-th k
+            OPS is a comma separated list of enc, dec and hash. Hash
+            test vectors use the MSG sizes (with --block_size_msg_digest
+            as the block size if OPS only contains hash).
+            KEY is the key policy for AEAD test vectors
+                new   = A new key for every test vector
+                reuse = Reuse the previous key
+                point = A new key for the first operation of each
+                        (AD, MSG) pair
+            MODE determines the test vector generation mode, where
+                0 = All random data
+                1 = Fixed test values.
+                2 = Same as option 1, except each input is now a running
+                    value (each subsequent byte is a previous byte
+                    incremented by 1).
+
+            Example:
+
+            --gen_sweep 0:64 0:64 enc,dec point 0
+
+            Generates every combination of AD and message sizes up
+            to 63 bytes, each encrypted and decrypted with one key.
+
+            --gen_sweep edges:100:10 edges:100 enc new 0
+
+            Generates sizes around every 10th AD block boundary crossed
+            with sizes around each of the first 100 message block
+            boundaries.
+            '''))
     test.add_argument(
         '--gen_single', nargs=6,
         metavar=('MODE', 'KEY', 'NPUB','NSEC','AD','PT'),
@@ -699,6 +874,57 @@ def get_parser():
         version="%(prog)s 1.0")
     optops.add_argument('-v', '--verbose', default=False, action='store_true',
         help=('Verbose for script debugging purposes.'))
+    optops.add_argument(
+        '--profile', nargs='?', const=True, default=False, metavar='PSTATS_FILE',
+        help=textwrap.dedent('''\
+            Print the time spent per generation stage (dlopen, aead_encrypt,
+            crypto_hash, aead_decrypt, build_sgmt, render, logging,
+            file_io, ...) with call counts and cumulative wall and CPU
+            time, and write it to profile.json in --dest.
+            Stages nest, e.g. build_sgmt is part of render.
+            If PSTATS_FILE is given, the run is also profiled with cProfile
+            and the statistics are saved to PSTATS_FILE in --dest
+            (python -m pstats <PSTATS_FILE>).
+            Worker processes of --gen_benchmark are not profiled, use --jobs 1.
+            '''))
+    optops.add_argument(
+        '--log_level', default='WARNING', type=str.upper,
+        choices=LOG_LEVELS,
+        help=textwrap.dedent('''\
+            Level of messages written to --log_file. INFO logs the
+            inputs and outputs of every reference implementation call
+            (slow for large runs).
+            '''))
+    optops.add_argument(
+        '--log_file', default=LOG_FILE, metavar='FILE',
+        help='Log file, only created when a message is logged.')
+    optops.add_argument(
+        '--no_progress', default=False, action='store_true',
+        help=textwrap.dedent('''\
+            Do not report progress (vectors done, bytes written, vectors/s
+            and ETA). On a terminal the progress line is updated in place,
+            otherwise a line is printed every 10 seconds.
+            '''))
+    optops.add_argument(
+        '--server', nargs='?', const=SERVER_SOCKET, default=None, metavar='SOCKET',
+        help=textwrap.dedent('''\
+            Send this command line to the server started with `--serve`
+            on SOCKET instead of generating locally. Relative paths are
+            relative to the current directory.
+            '''))
+    optops.add_argument(
+        '--in_band', default=False, action='store_true',
+        help=textwrap.dedent('''\
+            With --server: the server returns the generated files, which
+            are written to --dest by this process.
+            '''))
+    optops.add_argument(
+        '--jobs', type=int, default=None, metavar='N',
+        help=textwrap.dedent('''\
+            Number of worker processes used by --gen_benchmark and --serve.
+            Defaults to the number of CPUs. Use 1 to generate the
+            directories one after another.
+            '''))
 
     impops = parser.add_argument_group(
         '', 'Algorithm and implementation specific options::')
@@ -887,6 +1113,25 @@ def get_parser():
     tvops.add_argument(
         '--dest', metavar='PATH_TO_DEST', default='.',
         help='Destination folder where the files should be written to.')
+    tvops.add_argument(
+        '--shards', type=int, default=None, metavar='N',
+        help=textwrap.dedent('''\
+            Split the test vectors into N self-contained KAT sets
+            (PATH_TO_DEST/shard_<i>/) that can be simulated in parallel,
+            and list them in PATH_TO_DEST/shards.json. MsgIDs and KeyIDs
+            stay global; the first AEAD test vector of each shard
+            always loads its key.
+            '''))
+    tvops.add_argument(
+        '--mkfifo', default=False, action='store_true',
+        help=textwrap.dedent('''\
+            Create the PDI, SDI and DO files as named pipes (FIFOs) and
+            stream the test vectors to them while they are generated, so
+            a simulation reading them can start immediately and nothing
+            is stored on disk. Output files that already are named pipes
+            are always streamed. The run ends once the reader has
+            consumed all files.
+            '''))
     tvops.add_argument(
         '--human_readable', default=False, action='store_true',
         help=textwrap.dedent('''\
@@ -906,6 +1151,36 @@ def get_parser():
             TAG      = HEXSTR    # if AEAD
             HASH_TAG = HEXSTR    # if hash
             '''))
+    tvops.add_argument(
+        '--cycle_model', nargs=2, default=None, metavar=('MODEL_PY', 'VARIANT'),
+        help=textwrap.dedent('''\
+            Run each test vector through the cycle model of VARIANT
+            defined in the Python file MODEL_PY, and write the expected
+            cycles per MsgID to expected_timing.csv, to compare with the
+            timing.txt of the testbench (G_TEST_MODE = 4). For Ascon:
+            --cycle_model hardware/ascon_lwc/cycle_model.py v1
+            '''))
+    tvops.add_argument(
+        '--cycle_budget', type=int, default=None, metavar='CYCLES',
+        help=textwrap.dedent('''\
+            With --gen_coverage and --cycle_model, pick the test vectors
+            adding the most coverage points per expected simulated cycle
+            until no other one fits in CYCLES, starting with the
+            cheapest new-key AEAD test vector. The expected cycles of
+            each test vector and their total are written to coverage.txt.
+            Fails if no test vector fits in CYCLES.
+            '''))
+    tvops.add_argument(
+        '--tb_stalls', nargs=3, type=int, default=None,
+        metavar=('PDI', 'SDI', 'DO'),
+        help=textwrap.dedent('''\
+            G_PDI_STALLS, G_SDI_STALLS and G_DO_STALLS of the testbench,
+            added before each word to the expected simulated cycles of
+            --cycle_budget (leave out for G_TEST_MODE 0 and 4).
+            '''))
+    tvops.add_argument(
+        '--tb_random_stall', default=False, action='store_true',
+        help='G_RANDOM_STALL of the testbench (see --tb_stalls).')
 
     ccops = parser.add_argument_group(
         '', '[Experimental] CryptoCore options::')
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+'''
+Output files of a generation run.
+
+The files are opened once and kept open until the end of the run. Files
+that are named pipes (see --mkfifo) are streamed: each one is written by
+its own thread, so a reader (e.g. the GHDL testbench reading pdi.txt,
+sdi.txt and do.txt with textio) can consume the test vectors while they
+are generated, and a reader blocking on one file never stalls the others.
+At most FIFO_CHUNKS chunks (test vectors) are queued per pipe: past that,
+write() blocks until the reader catches up, so generation runs in lock-step
+with the simulation and its memory stays bounded. The testbench reads
+sdi.txt on key activations and do.txt a test vector or two behind pdi.txt,
+so the bound never stalls a pipe the reader waits on.
+'''
+
+import os
+import queue
+import stat
+import sys
+import threading
+
+from .profiling import timed
+
+# Chunks queued per named pipe before write() blocks
+FIFO_CHUNKS = 4096
+
+
+def is_fifo(path):
+    try:
+        return stat.S_ISFIFO(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+def make_fifos(dest, file_names):
+    ''' Replace dest/file_name by a named pipe (unless it already is one) '''
+    for file_name in file_names:
+        path = os.path.join(dest, file_name)
+        if is_fifo(path):
+            continue
+        if os.path.lexists(path):
+            os.remove(path)
+        os.mkfifo(path)
+
+
+class _FifoWriter(object):
+    '''
+    Thread writing the chunks queued by write() to a named pipe, write()
+    blocking while maxsize chunks are queued
+    '''
+    def __init__(self, path, maxsize=FIFO_CHUNKS):
+        self.path = path
+        self.chunks = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        done = False
+        try:
+            # Blocks until the reader opens the pipe
+            with open(self.path, 'w', newline='') as f:
+                while True:
+                    txt = self.chunks.get()
+                    if txt is None:
+                        done = True
+                        break
+                    f.write(txt)
+                    f.flush()
+        except OSError as e:
+            # e.g. BrokenPipeError: the reader stopped early (a failed simulation)
+            self.error = e
+            while not done and self.chunks.get() is not None:
+                pass
+
+    def write(self, txt):
+        self.chunks.put(txt)
+        return len(txt)
+
+    def finish(self):
+        ''' Let the thread close the pipe once all chunks are written '''
+        self.chunks.put(None)
+
+    def close(self):
+        self.finish()
+        self.thread.join()
+        if isinstance(self.error, BrokenPipeError):
+            sys.stderr.write('Reader of {} closed the pipe before the end of the '
+                             'test vectors\n'.format(self.path))
+        elif self.error:
+            sys.stderr.write('Writing {} failed: {}\n'.format(self.path, self.error))
+
+
+class OutputFiles(object):
+    '''
+    Output files in dest, truncated when first written and kept open until
+    close().
+    '''
+    def __init__(self, dest):
+        self.dest = dest
+        self.files = {}
+
+    def open(self, file_name):
+        path = os.path.join(self.dest, file_name)
+        if is_fifo(path):
+            f = _FifoWriter(path)
+        else:
+            f = open(path, 'w', newline='')
+        self.files[file_name] = f
+        return f
+
+    @timed('file_io')
+    def write(self, output):
+        '''
+        Write rendered [(file name, text), ...]. Returns the number of
+        characters written.
+        '''
+        nbytes = 0
+        for file_name, txt in output:
+            f = self.files.get(file_name)
+            if f is None:
+                f = self.open(file_name)
+            nbytes += f.write(txt)
+        return nbytes
+
+    def close(self):
+        ''' Close all files, waiting for the readers of named pipes '''
+        # Readers may consume the pipes in any order
+        for f in self.files.values():
+            if isinstance(f, _FifoWriter):
+                f.finish()
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
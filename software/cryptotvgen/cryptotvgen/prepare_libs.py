@@ -2,13 +2,10 @@ import os
 import sys
 import logging
 import re
-import tarfile
-import urllib.request
 import tempfile
 import pathlib
 import shutil
 import subprocess
-import requests
 
 try:
     import importlib.resources as pkg_resources
@@ -33,6 +30,7 @@ def get_latest_supercop_version_url(sc_version):
     sc_page_url = sc_base_url + 'supercop.html'
 
     if sc_version == 'latest':
+        import requests
         response = requests.get(sc_page_url)
         
         print(f'Trying to determine the latest version of SUPERCOP from {sc_page_url}...')
@@ -111,6 +109,8 @@ def prepare_libs(sc_version, libs, candidates_dir, lib_path):
             f.write(mk_content)
 
     def get_sc_tar(sc_version):
+        import tarfile
+        import urllib.request
         sc_version, sc_url = get_latest_supercop_version_url(sc_version)
         
         sc_filename = f'supercop-{sc_version}.tar.xz'
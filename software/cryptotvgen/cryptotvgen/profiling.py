@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+'''
+Stage instrumentation for --profile.
+
+Functions decorated with @timed('stage') add their call count and
+cumulative wall and CPU time to the stage. Stages nest, e.g. build_sgmt
+is part of render. When profiling is disabled the decorator only costs
+one attribute lookup per call.
+'''
+
+import cProfile
+import functools
+import json
+import os
+import time
+
+PROFILE_FILE = 'profile.json'
+
+
+class Profiler(object):
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}
+        self.cprofile = None
+        self.start = None
+
+    def enable(self, cprofile=False):
+        self.enabled = True
+        self.stages = {}
+        self.start = (time.perf_counter(), time.process_time())
+        if cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def disable(self):
+        if self.cprofile:
+            self.cprofile.disable()
+        self.enabled = False
+        return (time.perf_counter() - self.start[0],
+                time.process_time() - self.start[1])
+
+    def add(self, stage, wall, cpu):
+        entry = self.stages.setdefault(stage, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += wall
+        entry[2] += cpu
+
+    def wrap(self, obj, name, stage):
+        ''' Time calls of obj.name (e.g. a logger method) as stage '''
+        setattr(obj, name, timed(stage)(getattr(obj, name)))
+
+    def report(self, total):
+        ''' Stage breakdown as a dict '''
+        return {
+            'total': {'wall': total[0], 'cpu': total[1]},
+            'stages': {stage: {'calls': calls, 'wall': wall, 'cpu': cpu}
+                       for stage, (calls, wall, cpu) in sorted(self.stages.items())},
+        }
+
+    def write(self, dest, total, pstats_file=None):
+        ''' Print the breakdown and write it (and the pstats dump) to dest '''
+        report = self.report(total)
+        print('{:16} {:>9} {:>10} {:>10} {:>7} {:>10}'.format(
+            'Stage', 'Calls', 'Wall [s]', 'CPU [s]', 'Wall %', 'us/call'))
+        for stage, s in sorted(report['stages'].items(),
+                               key=lambda x: -x[1]['wall']):
+            print('{:16} {:>9} {:>10.4f} {:>10.4f} {:>6.1f}% {:>10.1f}'.format(
+                stage, s['calls'], s['wall'], s['cpu'],
+                100*s['wall']/total[0] if total[0] else 0,
+                1e6*s['wall']/s['calls']))
+        print('{:16} {:>9} {:>10.4f} {:>10.4f}'.format('Total', '', *total))
+
+        with open(os.path.join(dest, PROFILE_FILE), 'w') as f:
+            json.dump(report, f, indent=2)
+        if self.cprofile and pstats_file:
+            self.cprofile.dump_stats(os.path.join(dest, pstats_file))
+        return report
+
+
+PROFILER = Profiler()
+
+
+def timed(stage):
+    ''' Decorator adding the calls of a function to a profiling stage '''
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return f(*args, **kwargs)
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                PROFILER.add(stage, time.perf_counter() - wall,
+                             time.process_time() - cpu)
+        return wrapper
+    return decorator
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+'''
+Progress of long generation runs: vectors done, bytes written, vectors/s
+and ETA.
+
+On a terminal the status line is redrawn at most every TTY_INTERVAL
+seconds; otherwise a full line is printed every LOG_INTERVAL seconds.
+Worker processes report to the parent through a queue (see worker_init
+and Progress.listen), their updates are batched every REMOTE_INTERVAL.
+'''
+
+import sys
+import threading
+import time
+
+TTY_INTERVAL = 0.2
+LOG_INTERVAL = 10.0
+REMOTE_INTERVAL = 0.5
+# Nothing is drawn for runs shorter than this
+TTY_DELAY = 0.5
+
+# Queue of the parent process, set in worker processes
+_worker_queue = None
+
+
+def worker_init(queue):
+    ''' Initializer of worker processes reporting to a parent Progress '''
+    global _worker_queue
+    _worker_queue = queue
+
+def fmt_bytes(n):
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if n < 1000 or unit == 'GB':
+            return '{:.1f} {}'.format(n, unit) if unit != 'B' else '{} B'.format(n)
+        n /= 1000
+
+def fmt_time(seconds):
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return '{}:{:02}:{:02}'.format(h, m, s)
+
+
+class NullProgress(object):
+    ''' Progress that reports nothing (--no_progress) '''
+    def update(self, vectors=1, nbytes=0):
+        pass
+
+    def close(self, queue=None):
+        pass
+
+
+class RemoteProgress(object):
+    ''' Progress of a worker process, forwarded to the parent in batches '''
+    def __init__(self, queue):
+        self.queue = queue
+        self.vectors = 0
+        self.nbytes = 0
+        self.last = time.monotonic()
+
+    def update(self, vectors=1, nbytes=0):
+        self.vectors += vectors
+        self.nbytes += nbytes
+        now = time.monotonic()
+        if now - self.last >= REMOTE_INTERVAL:
+            self.flush()
+            self.last = now
+
+    def flush(self):
+        if self.vectors or self.nbytes:
+            self.queue.put((self.vectors, self.nbytes))
+            self.vectors = self.nbytes = 0
+
+    def close(self):
+        self.flush()
+
+
+class Progress(object):
+    ''' Thread safe progress with a bounded update rate '''
+    def __init__(self, total=None, label='Progress', stream=None):
+        self.total = total
+        self.label = label
+        self.stream = stream if stream else sys.stdout
+        try:
+            self.tty = self.stream.isatty()
+        except AttributeError:
+            self.tty = False
+        self.interval = TTY_INTERVAL if self.tty else LOG_INTERVAL
+        self.vectors = 0
+        self.nbytes = 0
+        self.start = time.monotonic()
+        self.last = self.start
+        self.shown = False
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def update(self, vectors=1, nbytes=0):
+        with self.lock:
+            self.vectors += vectors
+            self.nbytes += nbytes
+            now = time.monotonic()
+            if now - self.last >= self.interval and \
+                    (not self.tty or now - self.start >= TTY_DELAY):
+                self.last = now
+                self.show(now)
+
+    def status(self, now):
+        elapsed = now - self.start
+        rate = self.vectors/elapsed if elapsed > 0 else 0
+        txt = '{}: {}'.format(self.label, self.vectors)
+        if self.total:
+            txt += '/{} vectors ({:.1f}%)'.format(self.total, 100*self.vectors/self.total)
+        else:
+            txt += ' vectors'
+        txt += ', {}, {:.0f} vectors/s'.format(fmt_bytes(self.nbytes), rate)
+        if self.total and rate > 0 and self.vectors < self.total:
+            txt += ', ETA {}'.format(fmt_time((self.total - self.vectors)/rate))
+        else:
+            txt += ', elapsed {}'.format(fmt_time(elapsed))
+        return txt
+
+    def show(self, now, end=''):
+        if self.tty:
+            self.stream.write('\r\033[K' + self.status(now) + end)
+        else:
+            self.stream.write(self.status(now) + '\n')
+        self.stream.flush()
+        self.shown = True
+
+    def listen(self, queue):
+        ''' Collect updates of worker processes (see worker_init) from queue '''
+        def run():
+            while True:
+                item = queue.get()
+                if item is None:
+                    break
+                self.update(*item)
+        self.listener = threading.Thread(target=run, daemon=True)
+        self.listener.start()
+
+    def close(self, queue=None):
+        ''' Stop listening on queue (if any) and print the final status '''
+        if self.listener:
+            queue.put(None)
+            self.listener.join()
+        with self.lock:
+            if self.shown:
+                self.show(time.monotonic(), end='\n' if self.tty else '')
+
+
+def new_progress(opts, total=None, label='Progress'):
+    '''
+    Progress for a generation step: forwarded to the parent in worker
+    processes, disabled by --no_progress
+    '''
+    if _worker_queue is not None:
+        return RemoteProgress(_worker_queue)
+    if getattr(opts, 'no_progress', False):
+        return NullProgress()
+    return Progress(total, label)
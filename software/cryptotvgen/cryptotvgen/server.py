@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+'''
+Generation server for --serve and --server.
+
+`cryptotvgen --serve [SOCKET]` keeps a pool of worker processes with the
+generator (cffi) imported and the reference libraries loaded, and accepts
+requests on a local UNIX socket. `cryptotvgen --server [SOCKET] <options>`
+sends its command line to the server instead of generating locally, so
+each invocation only pays for Python startup and option parsing.
+
+The protocol is one JSON object per line in each direction:
+
+    request:  {"args": [...], "cwd": "...", "in_band": false}
+    response: {"status": 0, "stdout": "...", "stderr": "...",
+               "files": {"relative/path": "text", ...}}
+
+Requests run in the client's working directory. With "in_band" the
+output files are not written by the server but returned in "files", and
+the client writes them below its --dest.
+'''
+
+import json
+import os
+import pathlib
+import sys
+
+# This module is imported for SERVER_SOCKET by the option parser, other
+# modules are imported by the functions using them to keep startup fast.
+
+SERVER_SOCKET = str(pathlib.Path.home() / '.cryptotvgen' / 'serve.sock')
+
+
+def recv_message(f):
+    line = f.readline()
+    if not line:
+        raise ConnectionError('connection closed')
+    return json.loads(line)
+
+def send_message(f, message):
+    f.write(json.dumps(message).encode() + b'\n')
+    f.flush()
+
+def read_tree(top):
+    ''' {relative path: text} of all files below top '''
+    files = {}
+    for root, _, names in os.walk(top):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, newline='') as f:
+                files[os.path.relpath(path, top)] = f.read()
+    return files
+
+def write_tree(top, files):
+    for rel, txt in files.items():
+        path = os.path.join(top, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', newline='') as f:
+            f.write(txt)
+
+
+# ============================================================================
+# Worker processes
+# ============================================================================
+def worker_warm(opts):
+    ''' Initializer of the worker pool: import the generator, load libraries '''
+    from . import generator
+    for hashop, name in ((False, opts.aead), (True, opts.hash)):
+        if name:
+            generator.dlopen(generator.get_cffi_path(opts, hashop))
+
+def run_request(args, cwd, in_band):
+    ''' Run one command line in a worker. Returns the response message. '''
+    import contextlib
+    import io
+    import random
+    import shutil
+    import tempfile
+    from .cli import run
+    from .options import get_parser
+
+    out, err = io.StringIO(), io.StringIO()
+    files = None
+    status = 0
+    tmp_dest = tempfile.mkdtemp(prefix='cryptotvgen-serve-') if in_band else None
+    try:
+        os.chdir(cwd)
+        # Workers are forked with the same random state
+        random.seed()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            try:
+                parser = get_parser()
+                opts = parser.parse_args(args)
+                opts.server = None
+                opts.serve = None
+                opts.no_progress = True
+                if in_band:
+                    dest, opts.dest = os.path.abspath(opts.dest), tmp_dest
+                status = run(opts, parser) or 0
+            except SystemExit as e:
+                if isinstance(e.code, str):
+                    err.write(e.code + '\n')
+                    status = 1
+                else:
+                    status = e.code or 0
+            except Exception as e:
+                err.write('{}: {}\n'.format(type(e).__name__, e))
+                status = 1
+        if in_band:
+            files = read_tree(tmp_dest)
+    finally:
+        if in_band:
+            shutil.rmtree(tmp_dest, ignore_errors=True)
+    stdout = out.getvalue()
+    if files is not None:
+        stdout = stdout.replace(tmp_dest, dest)
+    return {'status': status, 'stdout': stdout, 'stderr': err.getvalue(),
+            'files': files}
+
+
+# ============================================================================
+# Server
+# ============================================================================
+def make_server(path, pool):
+    ''' Threading UNIX socket server passing each request to pool '''
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = recv_message(self.rfile)
+                future = pool.submit(run_request, request['args'], request['cwd'],
+                                     bool(request.get('in_band')))
+                send_message(self.wfile, future.result())
+            except (ConnectionError, BrokenPipeError):
+                pass
+            except Exception as e:
+                try:
+                    send_message(self.wfile, {'status': 1, 'stdout': '',
+                                              'stderr': 'cryptotvgen server: {}\n'.format(e)})
+                except OSError:
+                    pass
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    return Server(path, Handler)
+
+def serve(opts):
+    '''
+    Serve generation requests on the UNIX socket opts.serve with opts.jobs
+    worker processes until interrupted (SIGINT/SIGTERM).
+    '''
+    import signal
+    import socket
+    from concurrent.futures import ProcessPoolExecutor
+    # Checks the library paths, and workers are forked with it imported
+    from .generator import get_cffi_path
+
+    path = opts.serve
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        with socket.socket(socket.AF_UNIX) as s:
+            try:
+                s.connect(path)
+                sys.exit('A cryptotvgen server is already running on {}'.format(path))
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Stale socket of a server that did not exit cleanly
+                os.unlink(path)
+
+    for hashop, name in ((False, opts.aead), (True, opts.hash)):
+        if name:
+            get_cffi_path(opts, hashop)
+
+    workers = opts.jobs if opts.jobs else os.cpu_count()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with ProcessPoolExecutor(max_workers=workers, initializer=worker_warm,
+                             initargs=(opts,)) as pool:
+        server = make_server(path, pool)
+        print('cryptotvgen server listening on {} with {} workers'.format(path, workers))
+        sys.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.unlink(path)
+    return 0
+
+
+# ============================================================================
+# Client
+# ============================================================================
+def request(path, args, dest, in_band=False):
+    '''
+    Run the command line args on the server at path, print its output and
+    return its exit status. With in_band the output files are written to
+    dest by the client.
+    '''
+    import socket
+    try:
+        with socket.socket(socket.AF_UNIX) as s:
+            s.connect(path)
+            f = s.makefile('rwb')
+            send_message(f, {'args': list(args), 'cwd': os.getcwd(), 'in_band': in_band})
+            response = recv_message(f)
+    except (ConnectionRefusedError, FileNotFoundError):
+        sys.exit('No cryptotvgen server on {} (start one with `cryptotvgen --serve`)'
+                 .format(path))
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    if response.get('files'):
+        write_tree(dest, response['files'])
+    return response['status']
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+'''
+Benchmark suite definitions for --gen_benchmark.
+
+A suite is a TOML or JSON file:
+
+    lwc = "ascon_v1.toml"      # optional, [lwc] block of an LWC core
+                               # description (relative to the suite file)
+    [options]                  # optional, cryptotvgen options
+    block_size = 64
+
+    [defaults]                 # optional, defaults of all entries
+    key = "new"
+
+    [[entry]]                  # one output directory
+    name = "pow_0_4x"
+    ad = 0                     # size specification, see sweep.parse_axis
+    msg = "4x"
+    ops = "enc"                # enc, dec and/or hash
+    key = "new"                # new, reuse or point
+    zipped = false             # pair the AD and message sizes
+    repeat = 1                 # number of repetitions of the sweeps
+    sweeps = [...]             # optional, list of tables with the fields
+                               # above, concatenated in order
+
+Options from the [lwc] block and the [options] table are only applied if
+they were not given on the command line.
+'''
+
+import hashlib
+import json
+import os
+
+from .sweep import Concat, make_sweep
+
+SUITE_STAMP = '.suite_stamp'
+
+ENTRY_FIELDS = ('ad', 'msg', 'ops', 'key', 'zipped', 'repeat')
+ENTRY_DEFAULTS = {'ad': 0, 'msg': 0, 'ops': 'enc', 'key': 'new',
+                  'zipped': False, 'repeat': 1}
+
+# [lwc] keys of the LWC core description and the matching options
+LWC_OPTIONS = (('aead.algorithm', 'aead'),
+               ('hash.algorithm', 'hash'))
+
+
+def load_toml(path):
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            tomllib = None
+    if tomllib:
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    try:
+        import toml
+    except ImportError:
+        raise ImportError('Reading {} requires Python 3.11, tomli or toml. '
+                          'Use a JSON suite instead.'.format(path))
+    with open(path, 'r') as f:
+        return toml.load(f)
+
+def load_suite(path):
+    ''' Load a TOML or JSON suite file '''
+    if str(path).endswith('.json'):
+        with open(path, 'r') as f:
+            suite = json.load(f)
+    else:
+        suite = load_toml(path)
+    names = [e.get('name') for e in suite.get('entry', [])]
+    if not names:
+        raise ValueError('{}: no [[entry]] defined'.format(path))
+    if None in names or len(set(names)) != len(names):
+        raise ValueError('{}: every entry needs a unique name'.format(path))
+    return suite
+
+def lookup(table, dotted):
+    for key in dotted.split('.'):
+        if not isinstance(table, dict) or key not in table:
+            return None
+        table = table[key]
+    return table
+
+def suite_options(suite, path):
+    ''' Options defined by a suite, [options] overrides [lwc] '''
+    values = {}
+    if 'lwc' in suite:
+        lwc_path = os.path.join(os.path.dirname(os.path.abspath(path)), suite['lwc'])
+        lwc = load_toml(lwc_path).get('lwc', {})
+        for key, dest in LWC_OPTIONS:
+            value = lookup(lwc, key)
+            if value is not None:
+                values[dest] = value
+        pdi = lookup(lwc, 'ports.pdi.bit_width')
+        sdi = lookup(lwc, 'ports.sdi.bit_width')
+        if pdi is not None and sdi is not None:
+            values['io'] = [pdi, sdi]
+    values.update(suite.get('options', {}))
+    return values
+
+def apply_suite_options(opts, parser, suite, path):
+    ''' Apply suite options that are still at their parser default '''
+    for dest, value in suite_options(suite, path).items():
+        if not hasattr(opts, dest):
+            raise ValueError('{}: unknown option {!r}'.format(path, dest))
+        default = parser.get_default(dest)
+        current = getattr(opts, dest)
+        if current == default or (dest == 'io' and tuple(current) == tuple(default)):
+            setattr(opts, dest, list(value) if dest == 'io' else value)
+
+def entry_routine(entry, defaults, block_bytes):
+    ''' Lazy routine of a suite entry '''
+    base = dict(ENTRY_DEFAULTS)
+    base.update({k: v for k, v in defaults.items() if k in ENTRY_FIELDS})
+    base.update({k: v for k, v in entry.items() if k in ENTRY_FIELDS})
+    sweeps = []
+    for part in entry.get('sweeps', [{}]):
+        fields = dict(base)
+        fields.update(part)
+        ad, msg = (','.join(str(v) for v in x) if isinstance(x, list) else str(x)
+                   for x in (fields['ad'], fields['msg']))
+        ops = fields['ops'] if isinstance(fields['ops'], str) else ','.join(fields['ops'])
+        sweeps.append(make_sweep(ad, msg, ops, fields['key'], block_bytes,
+                                 fields['zipped']))
+    return Concat(sweeps*int(base['repeat']))
+
+def entry_digest(entry, defaults, opts, version, ignore):
+    '''
+    Digest of everything that determines the output of an entry, used to
+    skip entries whose directory is already up to date
+    '''
+    used = {k: v for k, v in sorted(vars(opts).items()) if k not in ignore}
+    blob = json.dumps({'entry': entry, 'defaults': defaults, 'opts': used,
+                       'version': version}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+def suite_jobs(suite, opts, block_bytes, version, ignore):
+    ''' (name, routine, digest) of every suite entry '''
+    defaults = suite.get('defaults', {})
+    return [(entry['name'], entry_routine(entry, defaults, block_bytes),
+             entry_digest(entry, defaults, opts, version, ignore))
+            for entry in suite['entry']]
+
+def is_cached(dest, digest):
+    try:
+        with open(os.path.join(dest, SUITE_STAMP), 'r') as f:
+            return f.read().strip() == digest
+    except OSError:
+        return False
+
+def write_stamp(dest, digest):
+    with open(os.path.join(dest, SUITE_STAMP), 'w') as f:
+        f.write(digest + '\n')
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+'''
+Declarative size sweeps.
+
+A sweep crosses (or zips) AD sizes and message sizes with a list of
+operations and a key policy. Entries are produced lazily in the routine
+format used by gen_dataset:
+    [NEW_KEY, DECRYPT, AD_LEN, PT_LEN, HASH]
+so a sweep over hundreds of blocks never holds the full cross product.
+'''
+
+from bisect import bisect_right
+
+OPS = ('enc', 'dec', 'hash')
+KEY_POLICIES = ('new', 'reuse', 'point')
+
+
+class BlockEdges(object):
+    '''
+    Sizes around block boundaries: k*block_bytes+d for k in
+    range(0, max_blocks+1, step) and d in deltas (negative sizes are skipped)
+    '''
+    def __init__(self, block_bytes, max_blocks, step=1, deltas=(-1, 0, 1)):
+        self.block_bytes = block_bytes
+        self.deltas = tuple(deltas)
+        self.ks = range(0, max_blocks+1, step)
+        self.head = tuple(d for d in self.deltas if d >= 0)
+
+    def __len__(self):
+        return len(self.head) + (len(self.ks)-1)*len(self.deltas)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i < len(self.head):
+            return self.head[i]
+        k, d = divmod(i-len(self.head), len(self.deltas))
+        return self.ks[k+1]*self.block_bytes + self.deltas[d]
+
+    def __repr__(self):
+        return 'BlockEdges({}, {}, {}, {})'.format(
+            self.block_bytes, self.ks.stop-1, self.ks.step, self.deltas)
+
+
+class Concat(object):
+    ''' Lazy concatenation of sequences '''
+    def __init__(self, seqs):
+        self.seqs = [s for s in seqs if len(s) > 0]
+        self.offsets = [0]
+        for s in self.seqs:
+            self.offsets.append(self.offsets[-1] + len(s))
+
+    def __len__(self):
+        return self.offsets[-1]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        j = bisect_right(self.offsets, i) - 1
+        return self.seqs[j][i-self.offsets[j]]
+
+    def __repr__(self):
+        return 'Concat({!r})'.format(self.seqs)
+
+
+def parse_axis(spec, block_bytes):
+    '''
+    Parse a size axis specification. Items are separated by commas:
+        N               a single size
+        Nx              N blocks (N*block_bytes)
+        START:STOP      range(START, STOP)
+        START:STOP:STEP range(START, STOP, STEP)
+                        (START and STOP may be given in blocks, e.g. 0:4x)
+        edges:N         sizes around the first N block boundaries
+                        (k*block-1, k*block, k*block+1)
+        edges:N:STEP    same, only every STEP-th block boundary
+    '''
+    def size(field):
+        if field.endswith('x'):
+            return int(field[:-1])*block_bytes
+        return int(field)
+
+    seqs = []
+    for item in str(spec).split(','):
+        item = item.strip()
+        fields = item.split(':')
+        try:
+            if fields[0] == 'edges':
+                if len(fields) not in (2, 3):
+                    raise ValueError
+                seqs.append(BlockEdges(block_bytes, *[int(f) for f in fields[1:]]))
+            elif len(fields) == 1:
+                seqs.append((size(item), ))
+            elif len(fields) in (2, 3):
+                seqs.append(range(size(fields[0]), size(fields[1]), *[int(f) for f in fields[2:]]))
+            else:
+                raise ValueError
+        except (ValueError, TypeError):
+            raise ValueError('Invalid size specification {!r}'.format(item))
+    if any(s < 0 for seq in seqs if len(seq) > 0 for s in (seq[0], seq[-1])):
+        raise ValueError('Negative size in {!r}'.format(spec))
+    return seqs[0] if len(seqs) == 1 else Concat(seqs)
+
+def parse_ops(spec):
+    ''' Parse a comma separated list of operations '''
+    ops = tuple(op.strip().lower() for op in spec.split(','))
+    for op in ops:
+        if op not in OPS:
+            raise ValueError('Invalid operation {!r}, valid: {}'.format(op, ', '.join(OPS)))
+    return ops
+
+
+class Sweep(object):
+    '''
+    Sweep of AD sizes x message sizes x operations.
+
+    ad, msg   - sequences of sizes in bytes (range, list, BlockEdges, ...)
+    ops       - operations applied to every size point, in order
+                ('enc', 'dec', 'hash')
+    key       - 'new': every AEAD entry uses a new key,
+                'reuse': the key of the previous entry is reused,
+                'point': a new key for the first AEAD entry of every point
+    hash_msg  - optional separate sizes for the hash entries
+    zipped    - pair ad[i] with msg[i] (and hash_msg[i]) instead of
+                crossing them. Single element axes are broadcast.
+    '''
+    def __init__(self, ad=(0, ), msg=(0, ), ops=('enc', ), key='new',
+                 hash_msg=None, zipped=False):
+        if key not in KEY_POLICIES:
+            raise ValueError('Invalid key policy {!r}, valid: {}'.format(
+                key, ', '.join(KEY_POLICIES)))
+        self.ad = ad
+        self.msg = msg
+        self.ops = tuple(ops)
+        self.key = key
+        self.hash_msg = hash_msg
+        self.zipped = zipped
+        aead_ops = [i for i, op in enumerate(self.ops) if op != 'hash']
+        self.first_aead_op = aead_ops[0] if aead_ops else None
+
+        if zipped:
+            axes = [a for a in (ad, msg, hash_msg) if a is not None]
+            self.points = max(len(a) for a in axes)
+            for a in axes:
+                if len(a) not in (1, self.points):
+                    raise ValueError('Zipped axes must have the same length')
+        else:
+            if hash_msg is not None and len(hash_msg) != len(ad)*len(msg):
+                raise ValueError('hash_msg must have one size per (ad, msg) point')
+            self.points = len(ad)*len(msg)
+
+    def __len__(self):
+        return self.points*len(self.ops)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return SweepSlice(self, *i.indices(len(self)))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        point, o = divmod(i, len(self.ops))
+        if self.zipped:
+            ad = self.ad[point if len(self.ad) > 1 else 0]
+            msg = self.msg[point if len(self.msg) > 1 else 0]
+        else:
+            a, m = divmod(point, len(self.msg))
+            ad, msg = self.ad[a], self.msg[m]
+        op = self.ops[o]
+        if op == 'hash':
+            if self.hash_msg is not None:
+                msg = self.hash_msg[point if len(self.hash_msg) > 1 else 0]
+            return [False, False, 0, msg, True]
+        if self.key == 'new':
+            new_key = True
+        elif self.key == 'reuse':
+            new_key = False
+        else:
+            new_key = o == self.first_aead_op
+        return [new_key, op == 'dec', ad, msg, False]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def chunks(self, n):
+        ''' Split the sweep into n contiguous slices (e.g. one per worker) '''
+        size = len(self)
+        bounds = [size*i//n for i in range(n+1)]
+        return [SweepSlice(self, bounds[i], bounds[i+1])
+                for i in range(n) if bounds[i] < bounds[i+1]]
+
+    def __repr__(self):
+        return 'Sweep(ad={!r}, msg={!r}, ops={!r}, key={!r}, zipped={!r})'.format(
+            self.ad, self.msg, self.ops, self.key, self.zipped)
+
+
+class SweepSlice(object):
+    ''' A lazily evaluated (strided) slice of a Sweep '''
+    def __init__(self, sweep, start, stop, step=1):
+        self.sweep = sweep
+        self.indices = range(start, stop, step)
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            r = self.indices[i]
+            return SweepSlice(self.sweep, r.start, r.stop, r.step)
+        return self.sweep[self.indices[i]]
+
+    def __iter__(self):
+        for i in self.indices:
+            yield self.sweep[i]
+
+
+def make_sweep(ad, msg, ops, key, block_bytes, zipped=False):
+    '''
+    Build a Sweep from axis specifications (see parse_axis) and a comma
+    separated list of operations. block_bytes is (AD, message, hash) block
+    size in bytes; the hash block size is used for the message axis if
+    all operations are hash.
+    '''
+    ops = parse_ops(ops)
+    bsa, bsd, bsh = block_bytes
+    if all(op == 'hash' for op in ops):
+        bsd = bsh
+    return Sweep(ad=parse_axis(ad, bsa), msg=parse_axis(msg, bsd),
+                 ops=ops, key=key, zipped=zipped)
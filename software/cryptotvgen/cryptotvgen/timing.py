@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+'''
+Expected timing of the test vectors (--cycle_model).
+
+A cycle model is a Python file defining load_model(variant), which returns
+an object with a method
+
+    cycles(ad_len, msg_len, decrypt, hashop)
+
+taking sequences of AD and message lengths (in bytes) and of operation
+flags, and returning the expected cycles of each test vector. The cycle
+model of the Ascon variants is hardware/ascon_lwc/cycle_model.py.
+
+The expected cycles are written to TIMING_FILE, one row per MsgID, as the
+testbench writes its measurements (G_TEST_MODE = 4) to timing.txt.
+
+SimulationCost adds the stalls of the testbench in the other test modes,
+to plan the test vectors of a simulation budget (--cycle_budget).
+'''
+
+import importlib.util
+import math
+import os
+
+from .profiling import timed
+
+TIMING_FILE = 'expected_timing.csv'
+TIMING_COLUMNS = ('msg_id', 'key_id', 'operation', 'new_key', 'ad_len', 'msg_len', 'cycles')
+# Test vectors evaluated by the model at once
+CHUNK = 4096
+
+_models = {}
+
+
+def load_cycle_model(path, variant):
+    ''' Model of variant in the cycle model file path '''
+    key = (os.path.abspath(path), variant)
+    if key not in _models:
+        spec = importlib.util.spec_from_file_location('cryptotvgen_cycle_model', path)
+        if spec is None or not os.path.isfile(path):
+            raise ValueError('Cycle model {} not found'.format(path))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if not hasattr(module, 'load_model'):
+            raise ValueError('Cycle model {} does not define load_model()'.format(path))
+        _models[key] = module.load_model(variant)
+    return _models[key]
+
+def operation(tv):
+    if tv.hashop:
+        return 'hash'
+    return 'dec' if tv.decrypt else 'enc'
+
+
+class ExpectedTiming(object):
+    '''
+    Writer of TIMING_FILE in dest. Test vectors are added as they are
+    generated and evaluated by the model in chunks of CHUNK.
+    '''
+    def __init__(self, dest, model):
+        self.model = model
+        self.rows = []
+        self.f = open(os.path.join(dest, TIMING_FILE), 'w', newline='')
+        self.f.write(','.join(TIMING_COLUMNS) + '\n')
+
+    def add(self, tv):
+        # Lengths in bytes of the hex strings; the hash message is pt
+        self.rows.append((tv.msg_id, tv.key_id, operation(tv), int(bool(tv.new_key)),
+                          len(tv.ad)//2, len(tv.pt)//2))
+        if len(self.rows) >= CHUNK:
+            self.flush()
+
+    @timed('cycle_model')
+    def flush(self):
+        if not self.rows:
+            return
+        ad_len = [row[4] for row in self.rows]
+        msg_len = [row[5] for row in self.rows]
+        decrypt = [row[2] == 'dec' for row in self.rows]
+        hashop = [row[2] == 'hash' for row in self.rows]
+        cycles = self.model.cycles(ad_len, msg_len, decrypt, hashop)
+        self.f.write(''.join('{},{},{},{},{},{},{}\n'.format(*row, int(c))
+                             for row, c in zip(self.rows, cycles)))
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stall_cycles(stalls, random_stall):
+    ''' Expected stall cycles before each word of a port (get_stalls of LWC_TB) '''
+    if random_stall and stalls:
+        # No stall half of the time, else 1..stalls cycles
+        return (1 + stalls)/4
+    return stalls
+
+class SimulationCost(object):
+    '''
+    Expected simulated cycles of routine entries
+    [NEW_KEY, DECRYPT, AD_LEN, PT_LEN, HASH]: the cycles of the model plus
+    the stalls of LWC_TB (--tb_stalls, --tb_random_stall) before each
+    word of the PDI, SDI and DO ports. Stalls are counted as if they never
+    overlapped the processing, so the estimate is an upper bound.
+    '''
+    def __init__(self, model, opts):
+        self.model = model
+        self.w, self.sw = (width//8 for width in opts.io)
+        self.key = opts.key_size//8
+        self.npub = opts.npub_size//8
+        self.tag = opts.tag_size//8
+        self.digest = opts.message_digest_size//8
+        stalls = opts.tb_stalls if opts.tb_stalls else (0, 0, 0)
+        self.stalls = [stall_cycles(s, opts.tb_random_stall) for s in stalls]
+
+    def words(self, entry):
+        '''
+        (PDI, SDI, DO) words of an entry: instructions, segment headers and
+        data (segments split by --max_block_per_sgmt are not counted)
+        '''
+        new_key, decrypt, ad_len, msg_len, hashop = entry
+
+        def segment(size, width):
+            return 1 + -(-size//width)
+
+        if hashop:
+            return (1 + segment(msg_len, self.w), 0, segment(self.digest, self.w) + 1)
+        pdi = bool(new_key) + 1 + segment(self.npub, self.w) + segment(ad_len, self.w) \
+            + segment(msg_len, self.w) + (segment(self.tag, self.w) if decrypt else 0)
+        sdi = 1 + segment(self.key, self.sw) if new_key else 0
+        do = segment(msg_len, self.w) + (0 if decrypt else segment(self.tag, self.w)) + 1
+        return pdi, sdi, do
+
+    @timed('cycle_model')
+    def __call__(self, entries):
+        ''' Expected simulated cycles of each entry '''
+        if not entries:
+            return []
+        cycles = self.model.cycles([e[2] for e in entries], [e[3] for e in entries],
+                                   [bool(e[1]) for e in entries], [bool(e[4]) for e in entries])
+        return [int(c) + int(math.ceil(sum(n*s for n, s in zip(self.words(e), self.stalls))))
+                for e, c in zip(entries, cycles)]
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+cryptotvgen-tlm: transaction-level model of the LWC PreProcessor and
+PostProcessor.
+
+The test vectors of pdi.txt and sdi.txt are run through a model of the
+LWC wrapper (hardware/ascon_lwc/src_rtl/LWC/PreProcessor.vhd and
+PostProcessor.vhd), with the reference implementations of --aead and
+--hash as the CryptoCore:
+    - an Activate Key instruction loads the next key of sdi.txt;
+    - the segments of an operation are gathered by type, and the
+      Plaintext/Ciphertext headers are relayed to the PostProcessor;
+    - each relayed header is output as a Ciphertext (encryption) or
+      Plaintext (decryption) header of the same length and EOT, with
+      Last = EOT for decryption, followed by its data; encryptions end
+      with a Tag segment, hashes output one Hash_Tag segment;
+    - a Success status ends the output, Failure if the tag is invalid.
+The expected output is compared with do.txt, test vector by test vector,
+and the differences are reported by MsgID. Chunks of test vectors are
+modeled by worker processes.
+
+The parameters (--aead, --hash, --io, --tag_size, --message_digest_size)
+default to the ones in the header of pdi.txt.
+'''
+
+import argparse
+import mmap
+import os
+import re
+import sys
+import textwrap
+import time
+from types import SimpleNamespace
+
+from .generator import Opcode, Segment, Status, ffi, dlopen, get_cffi_path
+from .kat import Header, iter_vectors, index_vectors, read_io, read_parameters
+
+ACTKEY, ENCRYPT, DECRYPT, HASH = (op.value for op in (
+    Opcode.actkey, Opcode.encrypt, Opcode.decrypt, Opcode.hash))
+NPUB, AD, PT, CT, TAG, HASH_MSG, HASH_TAG = (s.value for s in (
+    Segment.npub, Segment.ad, Segment.pt, Segment.ct, Segment.tag, Segment.hash,
+    Segment.hash_tag))
+SUCCESS, FAILURE = Status.success.value, Status.failure.value
+# Input segments gathered by the model
+INPUT_SEGMENTS = (NPUB, AD, PT, CT, TAG, HASH_MSG)
+# Test vectors per chunk, at least
+CHUNK_VECTORS = 20000
+
+_ACTKEY = re.compile(rb'^INS = ' + '{:X}'.format(ACTKEY).encode(), re.M)
+
+
+class Backend(object):
+    ''' Reference implementations of --aead and --hash, as in cryptotvgen '''
+    def __init__(self, opts):
+        self.aead = dlopen(get_cffi_path(opts, False)) if opts.aead else None
+        self.hash = dlopen(get_cffi_path(opts, True)) if opts.hash else None
+        self.tag_bytes = opts.tag_size//8
+        self.digest_bytes = opts.message_digest_size//8
+
+    def encrypt(self, key, npub, ad, pt):
+        ''' Ciphertext and tag '''
+        c = ffi.new('unsigned char[]', len(pt) + self.tag_bytes + 64)
+        clen = ffi.new('unsigned long long *')
+        self.aead.crypto_aead_encrypt(c, clen, pt, len(pt), ad, len(ad), ffi.NULL, npub, key)
+        out = ffi.buffer(c, clen[0])[:]
+        return out[:len(pt)], out[len(pt):]
+
+    def decrypt(self, key, npub, ad, ct, tag):
+        ''' Plaintext and whether the tag is valid '''
+        m = ffi.new('unsigned char[]', len(ct) + 64)
+        mlen = ffi.new('unsigned long long *')
+        result = self.aead.crypto_aead_decrypt(m, mlen, ffi.NULL, ct + tag, len(ct) + len(tag),
+                                               ad, len(ad), npub, key)
+        return ffi.buffer(m, len(ct))[:], result == 0
+
+    def digest(self, msg):
+        out = ffi.new('unsigned char[]', self.digest_bytes + 64)
+        self.hash.crypto_hash(out, msg, len(msg))
+        return ffi.buffer(out, self.digest_bytes)[:]
+
+
+class LWC(object):
+    '''
+    Model of the LWC wrapper. keys are the keys of sdi.txt, in the order
+    they are loaded.
+    '''
+    def __init__(self, backend, keys):
+        self.backend = backend
+        self.keys = iter(keys)
+        self.key = None
+
+    def run(self, vec):
+        '''
+        Expected output of a test vector of pdi.txt: (segments, status), the
+        segments as (Header, bytes)
+        '''
+        operation = None
+        for opcode in vec.instructions:
+            if opcode == ACTKEY:
+                self.key = next(self.keys, None)
+                if self.key is None:
+                    raise ValueError('no key left in sdi.txt')
+            else:
+                operation = opcode
+        data = {t: b'' for t in INPUT_SEGMENTS}
+        relayed = []
+        for header, segment in vec.segments:
+            if header.type not in data:
+                raise ValueError('segment type {} not modeled'.format(header.type))
+            data[header.type] += segment
+            if header.type in (PT, CT):
+                relayed.append(header)
+
+        backend = self.backend
+        if operation == HASH:
+            digest = backend.digest(data[HASH_MSG])
+            return [(Header(HASH_TAG, 0, 0, 1, 1, len(digest)), digest)], SUCCESS
+        if self.key is None:
+            raise ValueError('no active key')
+        decrypt = operation == DECRYPT
+        if decrypt:
+            out, valid = backend.decrypt(self.key, data[NPUB], data[AD], data[CT], data[TAG])
+            out_type = PT
+        elif operation == ENCRYPT:
+            out, tag = backend.encrypt(self.key, data[NPUB], data[AD], data[PT])
+            valid, out_type = True, CT
+        else:
+            raise ValueError('no operation')
+
+        segments, pos = [], 0
+        for header in relayed:
+            last = header.eot if decrypt else 0
+            segments.append((Header(out_type, 0, 0, header.eot, last, header.length),
+                             out[pos:pos + header.length]))
+            pos += header.length
+        if not decrypt:
+            segments.append((Header(TAG, 0, 0, 1, 1, len(tag)), tag))
+        return segments, SUCCESS if valid else FAILURE
+
+
+def diff(expected, vec):
+    ''' Differences between the expected output and a test vector of do.txt '''
+    segments, status = expected
+    found = []
+    if len(segments) != len(vec.segments):
+        found.append('{} segments instead of {}'.format(len(vec.segments), len(segments)))
+    for i, ((header, data), (out_header, out_data)) in enumerate(zip(segments, vec.segments)):
+        if header != out_header:
+            found.append('segment {} header {} instead of {}'.format(
+                i + 1, tuple(out_header), tuple(header)))
+        elif data != out_data:
+            byte = next(n for n, (a, b) in enumerate(zip(data, out_data)) if a != b)
+            found.append('segment {} data differs from byte {}'.format(i + 1, byte))
+    if status != vec.status:
+        found.append('status {} instead of {}'.format(
+            'none' if vec.status is None else '{:X}'.format(vec.status), '{:X}'.format(status)))
+    return found
+
+def model_chunk(opts, paths, io, pdi_range, do_range, do_line, keys, max_errors):
+    '''
+    Model the test vectors of pdi_range (start and end offsets in pdi.txt)
+    and compare them with do_range of do.txt (starting at line do_line).
+    keys are the keys loaded by the chunk. Returns the number of test
+    vectors and the first differences (MsgID, line of do.txt, message).
+    '''
+    model = LWC(Backend(opts), keys)
+    vectors, count, differences = 0, 0, []
+    with open(paths['pdi'], 'rb') as fp, open(paths['do'], 'rb') as fd, \
+            mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as pdi, \
+            mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as do:
+        outputs = iter_vectors(do, *do_range, width=io[0], line=do_line)
+        for vec in iter_vectors(pdi, *pdi_range, width=io[0]):
+            vectors += 1
+            out = next(outputs, None)
+            if out is None:
+                found, line = ['missing in do.txt'], None
+            elif out.msg_id != vec.msg_id:
+                found, line = ['do.txt has MsgID {}'.format(out.msg_id)], out.line
+            else:
+                try:
+                    found = diff(model.run(vec), out)
+                except ValueError as e:
+                    found = ['cannot model: {}'.format(e)]
+                found = [m for _, m in vec.errors + out.errors] + found
+                line = out.line
+            count += bool(found)
+            differences.extend((vec.msg_id, line, m) for m in found
+                               if len(differences) < max_errors)
+    return vectors, count, differences
+
+def model_kat(opts, paths, io, jobs=1, max_errors=20, executor=None):
+    '''
+    Model pdi.txt and sdi.txt, and compare with do.txt. Returns the
+    number of test vectors, the number of differing ones and the first
+    differences.
+    '''
+    with open(paths['sdi'], 'rb') as f:
+        keys = [vec.data(Segment.key.value) for vec in iter_vectors(f.read(), width=io[1])]
+    with open(paths['pdi'], 'rb') as fp, open(paths['do'], 'rb') as fd, \
+            mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as pdi, \
+            mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as do:
+        pdi_index = [i[0] for i in index_vectors(pdi)] + [len(pdi)]
+        do_index = [i[0] for i in index_vectors(do)]
+        if len(do_index) != len(pdi_index) - 1:
+            return len(pdi_index) - 1, None, [(None, None, '{} test vectors in pdi.txt and {} '
+                                               'in do.txt'.format(len(pdi_index) - 1,
+                                                                  len(do_index)))]
+        do_index.append(len(do))
+        # Chunks of test vectors, with the keys loaded since the start
+        size = max(CHUNK_VECTORS, -(-len(do_index)//max(jobs, 1)))
+        args, loaded, line = [], 0, do[:do_index[0]].count(b'\n') + 1
+        for first in range(0, len(pdi_index) - 1, size):
+            last = min(first + size, len(pdi_index) - 1)
+            start, end = pdi_index[first], pdi_index[last]
+            activations = len(_ACTKEY.findall(pdi[start:end]))
+            do_range = (do_index[first], do_index[last])
+            args.append((opts, paths, io, (start, end), do_range, line,
+                         keys[loaded:loaded + activations], max_errors))
+            loaded += activations
+            line += do[do_range[0]:do_range[1]].count(b'\n')
+    if executor and len(args) > 1:
+        results = list(executor.map(model_chunk, *zip(*args)))
+    else:
+        results = [model_chunk(*a) for a in args]
+    vectors = sum(r[0] for r in results)
+    count = sum(r[1] for r in results)
+    return vectors, count, [d for r in results for d in r[2]][:max_errors]
+
+
+def get_tlm_parser():
+    parser = argparse.ArgumentParser(
+        prog='cryptotvgen-tlm', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=textwrap.dedent('''\
+            Example:
+                cryptotvgen-tlm hardware/ascon_lwc/KAT/* --lib_path software/ascon_ref/lib
+            '''))
+    parser.add_argument('paths', nargs='+', metavar='DIR',
+                        help='KAT directories (pdi.txt, sdi.txt and do.txt).')
+    parser.add_argument('--lib_path', help='Reference libraries, as for cryptotvgen.')
+    parser.add_argument('--candidates_dir', help='As for cryptotvgen.')
+    parser.add_argument('--aead', help='AEAD algorithm.')
+    parser.add_argument('--hash', help='Hash algorithm.')
+    parser.add_argument('--io', nargs=2, type=int,
+                        metavar=('PUBLIC_PORTS_WIDTH', 'SECRET_PORT_WIDTH'),
+                        help='Size of PDI/DO and SDI port in bits.')
+    parser.add_argument('--tag_size', type=int, metavar='BITS',
+                        help='Size of authentication tag in bits.')
+    parser.add_argument('--message_digest_size', type=int, metavar='BITS',
+                        help='Size of message digest (hash_tag) in bits.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), metavar='N',
+                        help='Worker processes (default: %(default)s).')
+    parser.add_argument('--max_errors', type=int, default=20, metavar='N',
+                        help='Differences listed per directory (default: %(default)s).')
+    return parser
+
+def run_tlm(args=sys.argv[1:]):
+    args = get_tlm_parser().parse_args(args)
+    status = 0
+    executor = None
+    if args.jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=args.jobs)
+    try:
+        for path in args.paths:
+            paths = {kind: os.path.join(path, kind + '.txt') for kind in ('pdi', 'sdi', 'do')}
+            missing = [p for p in paths.values() if not os.path.exists(p)]
+            if missing:
+                sys.exit('{} not found'.format(', '.join(missing)))
+            header = read_parameters(paths['pdi'])
+
+            def parameter(name, convert=str):
+                value = getattr(args, name)
+                if value is None and header.get(name, 'None') != 'None':
+                    value = convert(header[name])
+                return value
+
+            opts = SimpleNamespace(
+                lib_path=args.lib_path, candidates_dir=args.candidates_dir,
+                aead=parameter('aead'), hash=parameter('hash'),
+                tag_size=parameter('tag_size', int) or 128,
+                message_digest_size=parameter('message_digest_size', int) or 256)
+            io = args.io or read_io(paths['pdi']) or (32, 32)
+
+            begin = time.perf_counter()
+            vectors, count, differences = model_kat(opts, paths, io, args.jobs,
+                                                    args.max_errors, executor)
+            seconds = time.perf_counter() - begin
+            print('{}: {} test vectors, {} differ from do.txt ({:.2f} s, {:.0f} vectors/s)'.format(
+                path, vectors, 'all' if count is None else count, seconds,
+                vectors/max(seconds, 1e-9)))
+            for msg_id, line, message in differences:
+                print('    MsgID {}{}: {}'.format(
+                    msg_id, '' if line is None else ' (do.txt line {})'.format(line), message))
+            status |= bool(differences)
+    finally:
+        if executor:
+            executor.shutdown()
+    return int(status)
+
+if __name__ == '__main__':
+    sys.exit(run_tlm(sys.argv[1:]))
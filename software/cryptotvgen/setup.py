@@ -75,7 +75,8 @@ setup(
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=[
         "cffi>=1.14.1",
-        "importlib_resources;python_version<'3.7'"
+        "importlib_resources;python_version<'3.7'",
+        "importlib_metadata;python_version<'3.8'"
     ],
 
     # List additional groups of dependencies here (e.g. development
@@ -84,6 +85,8 @@ setup(
     # $ pip install -e .[dev,test]
     extras_require={
         'dev': [],
+        # TOML benchmark suites (--gen_benchmark SUITE) on Python < 3.11
+        'toml': ["tomli;python_version<'3.11'"],
         # 'test': ['nose'],
     },
     
@@ -95,7 +98,10 @@ setup(
     # pip to create the appropriate form of executable for the target platform.
     entry_points={
         'console_scripts': [
-            'cryptotvgen=cryptotvgen:cli.run_cryptotvgen',
+            'cryptotvgen=cryptotvgen.cli:run_cryptotvgen',
+            'cryptotvgen-bench=cryptotvgen.bench:run_bench',
+            'cryptotvgen-kat=cryptotvgen.kat:run_kat',
+            'cryptotvgen-tlm=cryptotvgen.tlm:run_tlm',
         ],
     }
 )